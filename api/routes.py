@@ -4,12 +4,14 @@ Routes de l'API REST
 
 import asyncio
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Literal, Optional
 from datetime import datetime
 
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from pydantic import BaseModel, Field
 
+from core.llm_gateway import llm_call_class
+from core.usage import usage_ledger
 from core.specialized_agents import (
     SPECIALIZED_AGENTS, 
     get_best_agent, 
@@ -32,6 +34,9 @@ class TaskRequest(BaseModel):
     autonomous: bool = Field(True, description="Mode autonome activé")
     model: Optional[str] = Field(None, description="Modèle à utiliser")
     agent_id: Optional[str] = Field(None, description="ID de l'agent spécialisé (soshie, cassie, seomi, dexter, buddy, emmie, penn) - auto si null")
+    profile: Optional[str] = Field(None, description="Profil d'exécution (direct, light, full, loop) - auto si null")
+    priority: Optional[Literal["critical", "background"]] = Field(None, description="Priorité des appels LLM (critical, background) - critical si null")
+    tenant: Optional[str] = Field(None, description="Identifiant du client (partage équitable des appels LLM)")
 
 
 class TaskResponse(BaseModel):
@@ -50,6 +55,7 @@ class TaskStatusResponse(BaseModel):
     updated_at: str
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
+    usage: Optional[Dict[str, Any]] = None
 
 
 class AgentStatusResponse(BaseModel):
@@ -66,6 +72,7 @@ class ThinkRequest(BaseModel):
     """Requête de réflexion"""
     prompt: str = Field(..., description="Prompt pour faire réfléchir l'agent")
     context: Optional[Dict[str, Any]] = Field(None, description="Contexte additionnel")
+    tenant: Optional[str] = Field(None, description="Identifiant du client (partage équitable des appels LLM)")
 
 
 @router.get("/")
@@ -80,7 +87,8 @@ async def root():
             "/api/tasks",
             "/api/tasks/{task_id}",
             "/api/think",
-            "/api/memory"
+            "/api/memory",
+            "/api/usage"
         ]
     }
 
@@ -178,9 +186,11 @@ async def execute_task_background(agent, task_id: str, request: TaskRequest):
         task_store[task_id]["updated_at"] = datetime.now().isoformat()
         
         # Exécuter la tâche
-        result = await agent.run_task(request.description, request.context)
+        with llm_call_class(request.priority or "critical", tenant=request.tenant):
+            result = await agent.run_task(request.description, request.context, profile=request.profile)
         
         # Mettre à jour le store
+        task_store[task_id]["usage"] = result.get("usage")
         if result["success"]:
             task_store[task_id]["status"] = "completed"
             task_store[task_id]["result"] = result
@@ -204,9 +214,13 @@ async def execute_task_background_specialized(specialized_agent, task_id: str, r
         task_store[task_id]["updated_at"] = datetime.now().isoformat()
         
         # Exécuter la tâche avec l'agent spécialisé
-        result = await specialized_agent.execute_task(request.description, request.context)
+        with llm_call_class(request.priority or "critical", tenant=request.tenant):
+            result = await specialized_agent.execute_task(
+                request.description, request.context, profile=request.profile
+            )
         
         # Mettre à jour le store
+        task_store[task_id]["usage"] = result.get("usage")
         if result["success"]:
             task_store[task_id]["status"] = "completed"
             task_store[task_id]["result"] = result
@@ -238,7 +252,8 @@ async def get_task_status(task_id: str):
         created_at=task["created_at"],
         updated_at=task["updated_at"],
         result=task.get("result"),
-        error=task.get("error")
+        error=task.get("error"),
+        usage=task.get("usage")
     )
 
 
@@ -251,6 +266,12 @@ async def list_tasks():
     }
 
 
+@router.get("/usage")
+async def get_usage():
+    """Usage LLM cumulé (tokens, latence, coût) par agent, client, modèle et type d'appel"""
+    return usage_ledger.snapshot()
+
+
 @router.post("/think")
 async def think(request: ThinkRequest):
     """Fait réfléchir l'agent sur un prompt"""
@@ -272,7 +293,9 @@ async def think(request: ThinkRequest):
         agent = active_agents[agent_id]
     
     try:
-        response = await agent.think(request.prompt, request.context)
+        # Priorité maximale: un utilisateur attend la réponse
+        with llm_call_class("interactive", tenant=request.tenant):
+            response = await agent.think(request.prompt, request.context)
         
         return {
             "success": True,
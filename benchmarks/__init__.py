@@ -0,0 +1,3 @@
+"""
+Benchmarks du pipeline de l'agent (python -m benchmarks.run)
+"""
@@ -0,0 +1,496 @@
+"""
+Test de charge de l'API sans déploiement: l'application FastAPI de main.py
+est appelée en processus (transport ASGI httpx) ou via un vrai uvicorn sur
+localhost, avec le LLM factice (benchmarks.stub_llm)
+
+Usage (depuis la racine du dépôt):
+    python -m benchmarks.load_test [--scenario mixed] [--concurrency 1,10,50,100]
+                                   [--duration 10] [--uvicorn] [--agent-pool]
+                                   [--output charge.json]
+
+Chaque palier de concurrence est mesuré pendant --duration secondes:
+latence p50/p95/p99 et taux d'erreur par endpoint, retard de la boucle
+d'événements du serveur et issue des tâches créées (les tâches échouées
+comptent comme erreurs). Un palier dont des tâches sont refusées est en
+échec (code de sortie 1).
+
+Par défaut l'application est testée telle quelle: toutes les tâches
+passent par active_agents["default"], qui refuse une tâche tant qu'il en
+exécute une autre. --agent-pool donne à chaque tâche son propre agent
+(sélection de l'agent spécialisé modifiée, signalée dans le rapport).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+import httpx
+
+from .stub_llm import StubLLM
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = ("completed", "failed")
+
+# Erreur d'une tâche refusée par un agent déjà occupé (SintraAgent.run_task)
+REJECTED_ERROR = "déjà en cours d'exécution"
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    ordered = sorted(values)
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 2)
+
+    return {"p50_ms": at(0.5), "p95_ms": at(0.95), "p99_ms": at(0.99), "max_ms": round(ordered[-1] * 1000, 2)}
+
+
+class LoopLagMonitor:
+    """
+    Retard de la boucle d'événements: écart entre le réveil prévu d'un
+    sleep(interval) et le réveil effectif
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._running = False
+
+    async def run(self):
+        self._running = True
+        while self._running:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    def stop(self):
+        self._running = False
+
+    def reset(self) -> List[float]:
+        lags, self.lags = self.lags, []
+        return lags
+
+
+class StageStats:
+    """
+    Mesures d'un palier: latences et erreurs par endpoint, tâches créées
+    """
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.task_ids: List[str] = []
+
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        label: str,
+        method: str,
+        url: str,
+        **kwargs
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Requête chronométrée; toute réponse non 2xx ou exception compte comme erreur
+        """
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            logger.debug(f"{label}: {type(e).__name__}: {str(e)}")
+            response = None
+        self.latencies[label].append(time.perf_counter() - started)
+
+        if response is None or response.status_code >= 400:
+            self.errors[label] += 1
+            return None
+        return response.json()
+
+    def report(self, elapsed: float, tasks: int = 0, failed_tasks: int = 0) -> Dict[str, Any]:
+        """
+        error_rate compte les erreurs HTTP et les tâches échouées (sur
+        requêtes + tâches créées); http_error_rate les seules erreurs HTTP
+        """
+        endpoints = {}
+        total = errors = 0
+        for label, latencies in self.latencies.items():
+            total += len(latencies)
+            errors += self.errors[label]
+            endpoints[label] = {
+                "requests": len(latencies),
+                "errors": self.errors[label],
+                "error_rate": round(self.errors[label] / len(latencies), 4),
+                **_percentiles(latencies)
+            }
+        return {
+            "requests": total,
+            "requests_per_s": round(total / elapsed, 2),
+            "error_rate": round((errors + failed_tasks) / (total + tasks), 4) if total + tasks else 0.0,
+            "http_error_rate": round(errors / total, 4) if total else 0.0,
+            "endpoints": endpoints
+        }
+
+
+# Scénarios: une itération d'un client virtuel
+
+async def scenario_tasks(client: httpx.AsyncClient, stats: StageStats, config: argparse.Namespace, deadline: float):
+    """
+    Création de tâches en rafale
+    """
+    created = await stats.request(client, "POST /api/tasks", "POST", "/api/tasks", json=_task_payload(config))
+    if created:
+        stats.task_ids.append(created["task_id"])
+
+
+async def scenario_poll(client: httpx.AsyncClient, stats: StageStats, config: argparse.Namespace, deadline: float):
+    """
+    Création d'une tâche puis suivi de son statut jusqu'à la fin
+    """
+    created = await stats.request(client, "POST /api/tasks", "POST", "/api/tasks", json=_task_payload(config))
+    if not created:
+        return
+    stats.task_ids.append(created["task_id"])
+
+    while time.perf_counter() < deadline:
+        status = await stats.request(
+            client, "GET /api/tasks/{id}", "GET", f"/api/tasks/{created['task_id']}"
+        )
+        if status and status["status"] in FINAL_STATUSES:
+            return
+        await asyncio.sleep(config.poll_interval)
+
+
+async def scenario_agents(client: httpx.AsyncClient, stats: StageStats, config: argparse.Namespace, deadline: float):
+    """
+    Liste des agents spécialisés
+    """
+    await stats.request(client, "GET /api/agents", "GET", "/api/agents")
+
+
+async def scenario_mixed(client: httpx.AsyncClient, stats: StageStats, config: argparse.Namespace, deadline: float):
+    """
+    Suivi de tâches (70%) et liste des agents (30%)
+    """
+    if config.random.random() < 0.3:
+        await scenario_agents(client, stats, config, deadline)
+    else:
+        await scenario_poll(client, stats, config, deadline)
+
+
+SCENARIOS: Dict[str, Callable[..., Awaitable[None]]] = {
+    "tasks": scenario_tasks,
+    "poll": scenario_poll,
+    "agents": scenario_agents,
+    "mixed": scenario_mixed
+}
+
+
+def _task_payload(config: argparse.Namespace) -> Dict[str, Any]:
+    config.task_counter += 1
+    return {
+        "description": f"Rédige une étude de marché détaillée sur le secteur {config.task_counter}",
+        "profile": config.profile
+    }
+
+
+def detached_responses(app, pending: Set[asyncio.Task]):
+    """
+    L'appel ASGI se termine dès la réponse envoyée, comme sur un vrai
+    serveur: le transport httpx attendrait sinon la fin des BackgroundTasks
+    (exécution complète de la tâche) avant de rendre la réponse
+    """
+    async def wrapper(scope, receive, send):
+        if scope["type"] != "http":
+            return await app(scope, receive, send)
+
+        sent = asyncio.Event()
+
+        async def tracking_send(message):
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                sent.set()
+
+        task = asyncio.ensure_future(app(scope, receive, tracking_send))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        waiter = asyncio.ensure_future(sent.wait())
+        try:
+            await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+        if task.done():
+            task.result()
+
+    return wrapper
+
+
+class UvicornThread:
+    """
+    Serveur uvicorn sur localhost, dans un thread et une boucle d'événements dédiés
+    """
+
+    def __init__(self, app, port: int):
+        import uvicorn
+
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    def _serve(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.server.serve())
+
+    async def start(self):
+        self._thread.start()
+        while not self.server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError("Échec du démarrage d'uvicorn")
+            await asyncio.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+class AgentPool:
+    """
+    Agents branchés sur le LLM factice, un par tâche en cours: un agent
+    n'exécute qu'une tâche à la fois (is_running) et revient au pool à la
+    fin de sa tâche
+    """
+
+    def __init__(self, config: argparse.Namespace):
+        self.config = config
+        self.idle: Deque[Any] = deque()
+        self.created = 0
+
+    def create(self):
+        from core import SintraAgent
+
+        agent = SintraAgent(model="gpt-4o")
+        StubLLM.install(agent, plan_size=self.config.plan_size, latency=self.config.latency)
+        return agent
+
+    def lease(self):
+        if self.idle:
+            return self.idle.popleft()
+        self.created += 1
+        return self.create()
+
+    def release(self, agent):
+        self.idle.append(agent)
+
+    def pooled(self, specialized_agent):
+        """
+        Agent spécialisé dont chaque exécution emprunte un agent du pool
+        (emprunté au début de execute_task, rendu quoi qu'il arrive)
+        """
+        execute_task = specialized_agent.execute_task
+
+        async def pooled_execute_task(*args, **kwargs):
+            specialized_agent.agent_core = self.lease()
+            try:
+                return await execute_task(*args, **kwargs)
+            finally:
+                self.release(specialized_agent.agent_core)
+
+        specialized_agent.execute_task = pooled_execute_task
+        return specialized_agent
+
+
+def _install_stub(config: argparse.Namespace):
+    """
+    Agent par défaut de l'API branché sur le LLM factice (aucun appel
+    réseau); avec --agent-pool, chaque tâche créée reçoit un agent du pool
+    """
+    from api import routes
+
+    pool = AgentPool(config)
+    routes.active_agents["default"] = pool.lease()
+    if config.agent_pool:
+        select_agent = routes.get_best_agent
+        routes.get_best_agent = lambda description, agent: pool.pooled(select_agent(description, agent))
+    return routes, pool
+
+
+async def run_stage(
+    client: httpx.AsyncClient,
+    scenario: Callable[..., Awaitable[None]],
+    concurrency: int,
+    monitor: LoopLagMonitor,
+    task_store: Dict[str, Any],
+    config: argparse.Namespace
+) -> Dict[str, Any]:
+    stats = StageStats()
+    deadline = time.perf_counter() + config.duration
+
+    async def virtual_client():
+        while time.perf_counter() < deadline:
+            await scenario(client, stats, config, deadline)
+
+    monitor.reset()
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    lags = monitor.reset()
+
+    outcomes: Dict[str, int] = defaultdict(int)
+    rejected = 0
+    for task_id in stats.task_ids:
+        task = task_store.get(task_id, {})
+        outcomes[task.get("status", "unknown")] += 1
+        if REJECTED_ERROR in str(task.get("error") or ""):
+            rejected += 1
+
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        # Un palier dont des tâches ont été refusées ne mesure pas la charge demandée
+        "passed": rejected == 0,
+        "rejected_tasks": rejected,
+        **stats.report(elapsed, len(stats.task_ids), outcomes.get("failed", 0)),
+        "loop_lag_ms": {
+            **_percentiles(lags),
+            "mean_ms": round(sum(lags) / len(lags) * 1000, 2) if lags else None
+        },
+        "tasks": dict(outcomes)
+    }
+
+
+async def run(config: argparse.Namespace) -> Dict[str, Any]:
+    from main import app
+
+    routes, pool = _install_stub(config)
+    if config.agent_pool:
+        print("🧪 Pool d'agents: un agent par tâche (application modifiée)", file=sys.stderr)
+    scenario = SCENARIOS[config.scenario]
+    monitor = LoopLagMonitor()
+    pending: Set[asyncio.Task] = set()
+    server: Optional[UvicornThread] = None
+
+    if config.uvicorn:
+        server = UvicornThread(app, config.port)
+        await server.start()
+        # Retard mesuré sur la boucle du serveur, pas sur celle du générateur de charge
+        monitor_future = asyncio.run_coroutine_threadsafe(monitor.run(), server.loop)
+        client = httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{config.port}",
+            timeout=config.timeout,
+            limits=httpx.Limits(max_connections=max(config.concurrency))
+        )
+    else:
+        monitor_task = asyncio.ensure_future(monitor.run())
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=detached_responses(app, pending)),
+            base_url="http://loadtest",
+            timeout=config.timeout
+        )
+
+    stages = []
+    try:
+        async with client:
+            for concurrency in config.concurrency:
+                stage = await run_stage(client, scenario, concurrency, monitor, routes.task_store, config)
+                stages.append(stage)
+                print(_summary(stage), file=sys.stderr)
+    finally:
+        monitor.stop()
+        if server is not None:
+            monitor_future.cancel()
+            server.stop()
+        else:
+            await asyncio.gather(monitor_task, return_exceptions=True)
+            for task in list(pending):
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "mode": "uvicorn" if config.uvicorn else "asgi",
+            # Pool d'agents: sélection de l'agent modifiée, pas l'application telle quelle
+            "agent_pool": config.agent_pool,
+            "scenario": config.scenario,
+            "duration_s": config.duration,
+            "llm_latency_s": config.latency,
+            "plan_size": config.plan_size,
+            "profile": config.profile,
+            "agents": pool.created
+        },
+        "passed": all(stage["passed"] for stage in stages),
+        "stages": stages
+    }
+
+
+def _summary(stage: Dict[str, Any]) -> str:
+    lines = [
+        f"👥 {stage['concurrency']} clients: {stage['requests_per_s']} req/s, "
+        f"{stage['error_rate'] * 100:.1f}% d'erreurs, retard de boucle p99 {stage['loop_lag_ms']['p99_ms']}ms, "
+        f"tâches {stage['tasks'] or '-'}"
+    ]
+    if not stage["passed"]:
+        lines.append(f"   ⛔ Palier en échec: {stage['rejected_tasks']} tâche(s) refusée(s)")
+    for label, endpoint in stage["endpoints"].items():
+        lines.append(
+            f"   {label}: {endpoint['requests']} requêtes, p50 {endpoint['p50_ms']}ms, "
+            f"p95 {endpoint['p95_ms']}ms, p99 {endpoint['p99_ms']}ms, erreurs {endpoint['error_rate'] * 100:.1f}%"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Test de charge de l'API en processus (LLM factice)")
+    parser.add_argument("--scenario", choices=list(SCENARIOS), default="mixed")
+    parser.add_argument("--concurrency", default="1,10,50,100", help="Paliers de clients concurrents (séparés par des virgules)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Durée de chaque palier (s)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Latence LLM simulée par appel (s)")
+    parser.add_argument("--plan-size", type=int, default=3, help="Sous-tâches des plans du LLM factice")
+    parser.add_argument("--profile", default="light", help="Profil d'exécution des tâches créées")
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="Intervalle de suivi d'une tâche (s)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Délai maximal d'une requête (s)")
+    parser.add_argument("--uvicorn", action="store_true", help="Vrai serveur uvicorn sur localhost")
+    parser.add_argument(
+        "--agent-pool", action="store_true",
+        help="Un agent par tâche en cours au lieu de l'agent par défaut partagé (application modifiée)"
+    )
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Fichier JSON des résultats (défaut: stdout)")
+    parser.add_argument("--verbose", action="store_true", help="Logs de l'API et de l'agent")
+    config = parser.parse_args(argv)
+
+    config.concurrency = [int(value) for value in config.concurrency.split(",")]
+    config.random = random.Random(config.seed)
+    config.task_counter = 0
+    return config
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    config = parse_args(argv)
+    # Les échecs de tâches sont comptés dans le rapport: pas de log par requête
+    logging.basicConfig(level=logging.INFO if config.verbose else logging.CRITICAL, force=True)
+
+    report = asyncio.run(run(config))
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if config.output:
+        with open(config.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"📊 Résultats: {config.output}", file=sys.stderr)
+    else:
+        print(output)
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
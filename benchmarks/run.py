@@ -0,0 +1,400 @@
+"""
+Benchmarks de bout en bout du pipeline de l'agent, avec un LLM factice
+(benchmarks.stub_llm): coût propre du framework par tâche, débit à N
+tâches concurrentes et allocations mémoire
+
+Usage (depuis la racine du dépôt):
+    python -m benchmarks.run [--quick] [--only run_task,memory]
+                             [--output resultats.json] [--latency 0.02]
+                             [--baseline reference.json] [--max-regression 0.25]
+
+Les résultats sont émis en JSON (stdout ou --output) pour suivre leur
+évolution; avec --baseline, les p50 sont comparés à une exécution de
+référence et le code de sortie vaut 1 en cas de régression.
+"""
+
+import argparse
+import asyncio
+import copy
+import gc
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from core import SintraAgent
+from core.memory import MemorySystem
+from tools import ToolRegistry
+
+from .stub_llm import StubLLM
+
+logger = logging.getLogger(__name__)
+
+PLAN_SIZES = (1, 5, 20)
+MEMORY_SIZES = (100, 1000, 10000)
+CONCURRENCY = (1, 10, 50)
+PROFILES = ("full", "light")
+
+# Entrées d'exemple par outil du registre (outils sans entrée: ignorés)
+TOOL_INPUTS: Dict[str, Dict[str, Any]] = {
+    "calculator": {"expression": "(15 + 27) * 3"},
+    "websearch": {"query": "énergies renouvelables", "num_results": 3},
+    "fileoperations": {"operation": "write", "path": "benchmark.txt", "content": "contenu " * 100},
+    "codeexecutor": {"code": "print(sum(range(1000)))", "timeout": 10}
+}
+
+
+def _task_description(index: int, plan_size: int) -> str:
+    return f"Rédige une étude de marché détaillée sur le secteur {index} en {plan_size} parties"
+
+
+def _new_agent(plan_size: int = 5, latency: float = 0.0) -> SintraAgent:
+    agent = SintraAgent(model="gpt-4o", speculative_execution=True)
+    StubLLM.install(agent, plan_size=plan_size, latency=latency)
+    return agent
+
+
+def _timings(durations: List[float]) -> Dict[str, float]:
+    ordered = sorted(durations)
+    return {
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3)
+    }
+
+
+async def _allocations(run: Callable[[], Awaitable[Any]]) -> Dict[str, float]:
+    """
+    Allocations d'une exécution: blocs encore alloués à la fin, pic
+    mémoire (tracemalloc) et collectes gc de génération 0 (rotation des objets)
+    """
+    gc.collect()
+    collections = gc.get_stats()[0]["collections"]
+    tracemalloc.start()
+    try:
+        await run()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    statistics_by_file = snapshot.statistics("filename")
+    return {
+        "retained_blocks": sum(stat.count for stat in statistics_by_file),
+        "retained_kib": round(sum(stat.size for stat in statistics_by_file) / 1024, 1),
+        "peak_kib": round(peak / 1024, 1),
+        "gc_gen0_collections": gc.get_stats()[0]["collections"] - collections
+    }
+
+
+async def bench_run_task(config: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    SintraAgent.run_task sans latence LLM: durée = coût propre du framework
+    """
+    results = []
+    for plan_size in config.plan_sizes:
+        for profile in PROFILES:
+            durations, calls = [], 0
+            for i in range(config.iterations):
+                agent = _new_agent(plan_size)
+                started = time.perf_counter()
+                result = await agent.run_task(_task_description(i, plan_size), profile=profile)
+                durations.append(time.perf_counter() - started)
+                if not result["success"]:
+                    raise RuntimeError(f"run_task en échec: {result.get('error')}")
+                calls += sum(agent.llm_provider.calls.values())
+
+            agent = _new_agent(plan_size)
+            allocations = await _allocations(
+                lambda: agent.run_task(_task_description(0, plan_size), profile=profile)
+            )
+            results.append({
+                "benchmark": "run_task",
+                "params": {"plan_size": plan_size, "profile": profile},
+                **_timings(durations),
+                "llm_calls_per_task": calls / config.iterations,
+                "allocations": allocations
+            })
+    return results
+
+
+async def bench_throughput(config: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    N tâches concurrentes (un agent par tâche), latence LLM simulée
+    """
+    results = []
+    for concurrency in config.concurrency:
+        agents = [_new_agent(5, config.latency) for _ in range(concurrency)]
+        durations: List[float] = []
+
+        async def run_one(index: int, agent: SintraAgent):
+            started = time.perf_counter()
+            result = await agent.run_task(_task_description(index, 5), profile="full")
+            durations.append(time.perf_counter() - started)
+            return result
+
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(run_one(i, agent) for i, agent in enumerate(agents)))
+        elapsed = time.perf_counter() - started
+
+        calls_per_task = sum(sum(agent.llm_provider.calls.values()) for agent in agents) / concurrency
+        results.append({
+            "benchmark": "throughput",
+            "params": {"concurrency": concurrency, "plan_size": 5, "llm_latency_s": config.latency},
+            **_timings(durations),
+            "tasks_per_s": round(concurrency / elapsed, 2),
+            # Débit si seule la latence LLM comptait (appels séquentiels d'une tâche)
+            "ideal_tasks_per_s": round(concurrency / (calls_per_task * config.latency), 2) if config.latency else None,
+            "failed": sum(1 for outcome in outcomes if not outcome["success"])
+        })
+    return results
+
+
+async def bench_planner(config: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    TaskPlanner.create_plan (analyse et décomposition)
+    """
+    results = []
+    for plan_size in config.plan_sizes:
+        for profile in PROFILES:
+            agent = _new_agent(plan_size)
+            durations = []
+            for i in range(config.iterations):
+                started = time.perf_counter()
+                await agent.planner.create_plan(_task_description(i, plan_size), profile=profile)
+                durations.append(time.perf_counter() - started)
+
+            allocations = await _allocations(
+                lambda: agent.planner.create_plan(_task_description(-1, plan_size), profile=profile)
+            )
+            results.append({
+                "benchmark": "planner.create_plan",
+                "params": {"plan_size": plan_size, "profile": profile},
+                **_timings(durations),
+                "allocations": allocations
+            })
+    return results
+
+
+async def bench_executor(config: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    TaskExecutor.execute_plan sur un plan déjà construit (copié à chaque itération)
+    """
+    results = []
+    for plan_size in config.plan_sizes:
+        agent = _new_agent(plan_size)
+        plan = agent.optimizer.optimize(
+            await agent.planner.create_plan(_task_description(0, plan_size), profile="full")
+        )
+        durations = []
+        for _ in range(config.iterations):
+            current = copy.deepcopy(plan)
+            started = time.perf_counter()
+            await agent.executor.execute_plan(current)
+            durations.append(time.perf_counter() - started)
+
+        allocations = await _allocations(lambda: agent.executor.execute_plan(copy.deepcopy(plan)))
+        results.append({
+            "benchmark": "executor.execute_plan",
+            "params": {"plan_size": plan_size, "steps": len(plan["steps"])},
+            **_timings(durations),
+            "allocations": allocations
+        })
+    return results
+
+
+async def bench_memory(config: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    MemorySystem.retrieve_relevant selon la taille de la mémoire: requête
+    trouvée dès les entrées récentes et requête sans résultat (parcours complet)
+    """
+    results = []
+    stub = StubLLM(None, plan_size=5)
+    steps = [{"id": subtask["id"], "tool": subtask["tool"]} for subtask in stub._subtasks()]
+    for size in config.memory_sizes:
+        memory = MemorySystem()
+        for i in range(size):
+            await memory.store_task(
+                _task_description(i, 5),
+                {"analysis": {"type": f"catégorie {i % 20}"}, "steps": steps},
+                [],
+                {"summary": f"Synthèse {i}"}
+            )
+
+        for label, query in (("hit", "secteur parties"), ("miss", "requete absente inconnue")):
+            durations = []
+            for _ in range(config.iterations):
+                started = time.perf_counter()
+                await memory.retrieve_relevant(query, limit=5)
+                durations.append(time.perf_counter() - started)
+
+            allocations = await _allocations(lambda: memory.retrieve_relevant(query, limit=5))
+            results.append({
+                "benchmark": "memory.retrieve_relevant",
+                "params": {"memory_size": size, "query": label},
+                **_timings(durations),
+                "allocations": allocations
+            })
+    return results
+
+
+async def bench_tools(config: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    BaseTool.run de chaque outil du registre (fichiers dans un répertoire temporaire)
+    """
+    results = []
+    registry = ToolRegistry()
+    with tempfile.TemporaryDirectory() as workspace:
+        for name in registry.get_tool_names():
+            tool = registry.get_tool(name)
+            inputs = TOOL_INPUTS.get(name)
+            if inputs is None:
+                logger.warning(f"⚠️  Aucune entrée d'exemple pour l'outil {name}, ignoré")
+                continue
+            if hasattr(tool, "workspace_dir"):
+                tool.workspace_dir = workspace
+
+            durations = []
+            for _ in range(config.iterations):
+                started = time.perf_counter()
+                output = await tool.run(**inputs)
+                durations.append(time.perf_counter() - started)
+
+            allocations = await _allocations(lambda: tool.run(**inputs))
+            results.append({
+                "benchmark": "tool",
+                "params": {"tool": name},
+                **_timings(durations),
+                "success": not (isinstance(output, dict) and output.get("success") is False),
+                "allocations": allocations
+            })
+    return results
+
+
+BENCHMARKS: Dict[str, Callable[[argparse.Namespace], Awaitable[List[Dict[str, Any]]]]] = {
+    "run_task": bench_run_task,
+    "throughput": bench_throughput,
+    "planner": bench_planner,
+    "executor": bench_executor,
+    "memory": bench_memory,
+    "tools": bench_tools
+}
+
+
+def _key(result: Dict[str, Any]) -> str:
+    return f"{result['benchmark']} {json.dumps(result['params'], sort_keys=True)}"
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], max_regression: float) -> List[Dict[str, Any]]:
+    """
+    Benchmarks dont le p50 dépasse celui de la référence de plus de max_regression
+    """
+    reference = {_key(result): result for result in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        previous = reference.get(_key(result))
+        if not previous or not previous.get("p50_ms"):
+            continue
+        ratio = result["p50_ms"] / previous["p50_ms"]
+        if ratio > 1 + max_regression:
+            regressions.append({
+                "benchmark": _key(result),
+                "baseline_p50_ms": previous["p50_ms"],
+                "p50_ms": result["p50_ms"],
+                "ratio": round(ratio, 2)
+            })
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(config: argparse.Namespace) -> Dict[str, Any]:
+    selected = config.only.split(",") if config.only else list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Benchmarks inconnus: {', '.join(unknown)} (disponibles: {', '.join(BENCHMARKS)})")
+
+    results: List[Dict[str, Any]] = []
+    for name in selected:
+        started = time.perf_counter()
+        results.extend(await BENCHMARKS[name](config))
+        print(f"⏱️  {name}: {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": config.quick,
+            "iterations": config.iterations
+        },
+        "results": results
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmarks du pipeline de l'agent (LLM factice)")
+    parser.add_argument("--quick", action="store_true", help="Moins d'itérations et de tailles (CI)")
+    parser.add_argument("--only", help=f"Benchmarks à exécuter, séparés par des virgules ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--iterations", type=int, help="Itérations par mesure (défaut: 20, 5 avec --quick)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Latence LLM simulée du benchmark de débit (s)")
+    parser.add_argument("--output", help="Fichier JSON des résultats (défaut: stdout)")
+    parser.add_argument("--baseline", help="Résultats de référence à comparer")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Hausse du p50 tolérée (0.25 = +25%%)")
+    parser.add_argument("--verbose", action="store_true", help="Logs de l'agent")
+    config = parser.parse_args(argv)
+
+    config.iterations = config.iterations or (5 if config.quick else 20)
+    config.plan_sizes = PLAN_SIZES[:2] if config.quick else PLAN_SIZES
+    config.memory_sizes = MEMORY_SIZES[:2] if config.quick else MEMORY_SIZES
+    config.concurrency = CONCURRENCY[:2] if config.quick else CONCURRENCY
+    return config
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    config = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if config.verbose else logging.ERROR, force=True)
+
+    report = asyncio.run(run(config))
+
+    status = 0
+    if config.baseline:
+        with open(config.baseline, encoding="utf-8") as f:
+            regressions = compare(report["results"], json.load(f), config.max_regression)
+        report["regressions"] = regressions
+        for regression in regressions:
+            print(
+                f"❌ Régression {regression['benchmark']}: {regression['baseline_p50_ms']}ms → "
+                f"{regression['p50_ms']}ms (x{regression['ratio']})",
+                file=sys.stderr
+            )
+        status = 1 if regressions else 0
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if config.output:
+        with open(config.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"📊 Résultats: {config.output}", file=sys.stderr)
+    else:
+        print(output)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
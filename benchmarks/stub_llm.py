@@ -0,0 +1,123 @@
+"""
+Fournisseur LLM factice pour les benchmarks: réponses valides pour chaque
+type d'appel, plan de taille fixée, latence simulée, aucun appel réseau
+"""
+
+import asyncio
+import json
+import re
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from core.estimator import DurationEstimator
+
+# Lignes "- step_1: ..." des étapes groupées (executor, appel "batch")
+_BATCH_MEMBER = re.compile(r"^- ([\w.-]+): ", re.MULTILINE)
+
+
+class StubLLM:
+    """
+    Fournisseur substitué aux API (SintraAgent.llm_provider)
+
+    plan_size: nombre de sous-tâches des décompositions; une sous-tâche
+    sur tool_every utilise la calculatrice (sans appel au modèle), les
+    autres sont des étapes de réflexion, indépendantes sauf la dernière
+    latency: délai simulé par appel, en secondes
+    """
+
+    def __init__(
+        self,
+        agent,
+        plan_size: int = 5,
+        tool_every: int = 3,
+        latency: float = 0.0
+    ):
+        self.agent = agent
+        self.plan_size = plan_size
+        self.tool_every = tool_every
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+
+    @classmethod
+    def install(cls, agent, **options) -> "StubLLM":
+        # Historique d'estimation vierge et non persisté: ni lu ni pollué par les mesures
+        agent.estimator = DurationEstimator()
+        agent.llm_provider = cls(agent, **options)
+        return agent.llm_provider
+
+    def supports(self, model: str) -> bool:
+        return True
+
+    async def complete(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        schema: Optional[str] = None,
+        route: Optional[Dict[str, Any]] = None
+    ) -> str:
+        route = route or self.agent.router.resolve()
+        call_type = route.get("call_type") or schema or "default"
+        self.calls[call_type] = self.calls.get(call_type, 0) + 1
+
+        started = time.perf_counter()
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        response = self._respond(call_type, prompt)
+
+        # Usage approximatif (4 caractères par token), comme une réponse fournisseur
+        usage = SimpleNamespace(
+            prompt_tokens=(len(system or "") + len(prompt)) // 4,
+            completion_tokens=len(response) // 4,
+            prompt_tokens_details=None
+        )
+        self.agent._record_call_usage(route, usage, started)
+        return response
+
+    def _respond(self, call_type: str, prompt: str) -> str:
+        if call_type == "analysis":
+            return json.dumps(self._analysis())
+        if call_type in ("decomposition", "replan"):
+            return json.dumps({"subtasks": self._subtasks()})
+        if call_type == "planning":
+            return json.dumps({"analysis": self._analysis(), "subtasks": self._subtasks()})
+        if call_type == "synthesis":
+            return json.dumps({
+                "summary": "Synthèse des résultats",
+                "key_findings": ["Point clé 1", "Point clé 2"],
+                "data": {},
+                "next_steps": ["Recommandation 1"]
+            })
+        if call_type == "evaluation":
+            return json.dumps({"satisfied": True, "unmet": []})
+        if call_type == "batch":
+            members = _BATCH_MEMBER.findall(prompt)
+            return json.dumps({member: f"Réponse de l'étape {member}" for member in members})
+        return f"Réponse ({call_type}): " + "contenu généré " * 20
+
+    def _analysis(self) -> Dict[str, Any]:
+        return {
+            "type": "analyse",
+            "complexity": "medium",
+            "requires_tools": ["calculator"],
+            "estimated_steps": self.plan_size,
+            "risk_level": "low",
+            "key_challenges": [],
+            "success_criteria": ["Réponse complète"]
+        }
+
+    def _subtasks(self) -> List[Dict[str, Any]]:
+        subtasks = []
+        for i in range(1, self.plan_size + 1):
+            uses_tool = self.tool_every and i % self.tool_every == 0
+            subtasks.append({
+                "id": f"step_{i}",
+                "description": f"Étape {i}: {'calculer le total' if uses_tool else 'analyser la section'} {i}",
+                "action": "calculate" if uses_tool else "think",
+                "tool": "calculator" if uses_tool else None,
+                "inputs": {"expression": f"({i} + 27) * 3"} if uses_tool else {},
+                # Sections indépendantes, la dernière étape s'appuie sur toutes les autres
+                "depends_on": [f"step_{j}" for j in range(1, i)] if i == self.plan_size else [],
+                "expected_output": "Résultat de l'étape"
+            })
+        return subtasks
@@ -3,7 +3,7 @@ Configuration de Sintra AI
 """
 
 import os
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -36,8 +36,28 @@ class Settings(BaseSettings):
     max_concurrent_tasks: int = 5
     max_memory_size: int = 1000  # nombre d'entrées
     
+    # LLM Gateway (limites par fournisseur/modèle)
+    llm_requests_per_minute: int = 500
+    llm_tokens_per_minute: int = 200000
+    llm_rate_limits: Dict[str, Dict[str, int]] = {}  # {"gpt-4o": {"rpm": 5000, "tpm": 800000}}
+    llm_initial_concurrency: int = 8
+    llm_max_concurrency: int = 64
+    llm_max_retries: int = 4
+    llm_critical_share: float = 0.9  # part de la concurrence ouverte aux étapes de tâches
+    llm_background_share: float = 0.5  # part ouverte aux traitements par lots
+    llm_starvation_timeout: float = 30.0  # secondes avant de servir un lot comme critique
+    llm_fallback_models: List[str] = []  # ex: ["claude-3-5-sonnet-latest", "gpt-4o-mini"]
+    llm_request_timeout: float = 120.0  # secondes avant de passer au modèle suivant
+    llm_hedging: bool = False  # requête de couverture au-delà du p95 observé
+    # Routage par type d'appel (analysis, decomposition, planning, step, batch, synthesis,
+    # replan, evaluation, summary, direct): ex {"analysis": {"model": "gpt-4o-mini", "max_tokens": 600}}
+    llm_routes: Dict[str, Dict[str, Any]] = {}
+    llm_agent_routes: Dict[str, Dict[str, Dict[str, Any]]] = {}  # par agent spécialisé: {"penn": {"synthesis": {...}}}
+    
     # Workspace
     workspace_dir: str = "./workspace"
+    # Historique des durées d'exécution (estimations), rechargé au démarrage; vide: en mémoire seulement
+    estimator_history_file: Optional[str] = "./workspace/estimator_history.json"
     
     class Config:
         env_file = ".env"
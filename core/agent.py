@@ -4,7 +4,8 @@ Agent IA Autonome Principal
 
 import asyncio
 import logging
-from typing import Dict, List, Any, Optional
+import time
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import json
 
@@ -14,6 +15,20 @@ from anthropic import AsyncAnthropic
 from .planner import TaskPlanner
 from .memory import MemorySystem
 from .executor import TaskExecutor
+from .optimizer import PlanOptimizer
+from .estimator import DurationEstimator, StepUsage, current_step_usage
+from .profiles import ProfileClassifier
+from .tool_loop import ToolCallingLoop
+from .budget import PromptBudget
+from .schemas import SCHEMAS, SCHEMA_DESCRIPTIONS, parse_json, parse_metrics
+from .tokens import count_tokens
+from .llm_gateway import current_call_class, get_llm_gateway
+from .singleflight import completion_flights
+from .fallback import ModelFallback
+from .routing import ModelRouter
+from .batch import current_batch_collector
+from .usage import TaskUsage, current_task_usage, record_llm_call, usage_ledger
+from .context import compact_json
 from tools import ToolRegistry
 
 logging.basicConfig(level=logging.INFO)
@@ -25,6 +40,9 @@ class SintraAgent:
     Agent IA autonome capable de planifier et exécuter des tâches complexes
     """
     
+    # Modèles OpenAI acceptant response_format "json_schema" (les autres: "json_object")
+    STRUCTURED_OUTPUT_MODELS = ("gpt-4o", "gpt-4.1", "gpt-5")
+    
     def __init__(
         self,
         name: str = "Sintra",
@@ -32,19 +50,49 @@ class SintraAgent:
         api_key: Optional[str] = None,
         anthropic_key: Optional[str] = None,
         max_iterations: int = 50,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        speculative_execution: bool = True,
+        max_prompt_tokens: Optional[int] = None,
+        llm_provider: Optional[Any] = None
     ):
         self.name = name
         self.model = model
         self.max_iterations = max_iterations
         self.temperature = temperature
+        # Décomposition en streaming et démarrage anticipé des premières étapes
+        self.speculative_execution = speculative_execution
+        
+        # Initialisation des clients API (réessais gérés par la passerelle, pas par les SDK)
+        self.openai_client = AsyncOpenAI(api_key=api_key, max_retries=0) if api_key else None
+        self.anthropic_client = AsyncAnthropic(api_key=anthropic_key, max_retries=0) if anthropic_key else None
+        # Fournisseur substitué aux API (cassette d'enregistrement ou de rejeu, cf. core.replay)
+        self.llm_provider = llm_provider
         
-        # Initialisation des clients API
-        self.openai_client = AsyncOpenAI(api_key=api_key) if api_key else None
-        self.anthropic_client = AsyncAnthropic(api_key=anthropic_key) if anthropic_key else None
+        # Limites de débit et concurrence partagées par tous les agents du processus
+        self.gateway = get_llm_gateway()
+        # Appels identiques concurrents regroupés en une seule requête
+        self.flights = completion_flights
+        # Modèles de repli et requêtes de couverture (config: llm_fallback_models, llm_hedging)
+        self.fallback = ModelFallback.from_settings(self)
+        # Modèle, max_tokens et température par type d'appel (config: llm_routes)
+        self.router = ModelRouter.from_settings(self)
         
         # Initialisation des composants
         self.planner = TaskPlanner(self)
+        self.optimizer = PlanOptimizer()
+        self.estimator = DurationEstimator.from_settings()
+        self.profile_classifier = ProfileClassifier()
+        self.budget = PromptBudget(self, max_prompt_tokens=max_prompt_tokens)
+        
+        # Préfixes système mis en cache et utilisation du cache fournisseur
+        self._system_prefixes: Dict[Any, str] = {}
+        self.prompt_cache_stats = {
+            "calls": 0,
+            "hits": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "cache_write_tokens": 0
+        }
         self.memory = MemorySystem()
         self.executor = TaskExecutor(self)
         self.tool_registry = ToolRegistry()
@@ -56,13 +104,24 @@ class SintraAgent:
         
         logger.info(f"Agent {self.name} initialisé avec le modèle {self.model}")
     
-    async def run_task(self, task_description: str, context: Optional[Dict] = None) -> Dict[str, Any]:
+    async def run_task(
+        self,
+        task_description: str,
+        context: Optional[Dict] = None,
+        skip_synthesis: Optional[bool] = None,
+        profile: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Exécute une tâche de manière autonome
         
         Args:
             task_description: Description de la tâche à accomplir
             context: Contexte additionnel pour la tâche
+            skip_synthesis: Retourner directement la sortie de l'étape finale
+                sans appel de synthèse (None: automatique pour les plans directs
+                et le profil "light")
+            profile: Profil d'exécution "direct", "light", "full" ou "loop"
+                (None ou "auto": choisi selon la tâche)
             
         Returns:
             Résultat de l'exécution de la tâche
@@ -78,30 +137,68 @@ class SintraAgent:
             "status": "running"
         }
         
+        # Usage réel des appels LLM de la tâche (tokens, latence, coût)
+        task_usage = TaskUsage()
+        usage_token = current_task_usage.set(task_usage)
+        
         try:
             logger.info(f"🚀 Démarrage de la tâche: {task_description}")
             
-            # Étape 1: Planification
-            logger.info("📋 Phase de planification...")
-            plan = await self.planner.create_plan(task_description, context)
-            self.current_task["plan"] = plan
+            profile = self.profile_classifier.resolve(profile, task_description)
+            self.current_task["profile"] = profile
             
-            # Étape 2: Exécution
-            logger.info(f"⚙️  Exécution du plan ({len(plan['steps'])} étapes)...")
-            results = await self.executor.execute_plan(plan)
+            # Les tâches triviales reconnues par le planificateur restent sans appel au modèle
+            if profile == "direct" and not self.planner.fast_path.match(task_description):
+                plan, results = await self._answer_directly(task_description, context)
+            elif profile == "loop":
+                plan, results = await self._run_tool_loop(task_description, context)
+            else:
+                # Étape 1: Planification
+                logger.info("📋 Phase de planification...")
+                on_subtask = self.executor.speculate if self.speculative_execution else None
+                plan = await self.planner.create_plan(task_description, context, on_subtask, profile)
+                plan["metadata"]["profile"] = profile
+                
+                # Optimisation: moins d'appels au modèle pour le même plan
+                plan = self.optimizer.optimize(plan)
+                self.planner.update_estimate(plan)
+                self.current_task["plan"] = plan
+                
+                # Étape 2: Exécution
+                logger.info(f"⚙️  Exécution du plan ({len(plan['steps'])} étapes)...")
+                results = await self.executor.execute_plan(plan)
             
             # Étape 3: Synthèse
-            logger.info("📊 Synthèse des résultats...")
-            final_result = await self._synthesize_results(task_description, results)
+            direct_result = None
+            if skip_synthesis is not False and (
+                skip_synthesis or plan.get("direct_answer") or profile == "light"
+            ):
+                direct_result = self._direct_result(results)
+            
+            if direct_result is not None:
+                logger.info("⚡ Réponse directe, synthèse ignorée")
+                final_result = direct_result
+            else:
+                logger.info("📊 Synthèse des résultats...")
+                final_result = await self._synthesize_results(task_description, results)
             
             # Sauvegarder dans la mémoire
             await self.memory.store_task(task_description, plan, results, final_result)
             
+            # Conserver le plan comme template pour les tâches similaires
+            self.planner.learn_from_plan(plan, results)
+            
             self.current_task["status"] = "completed"
             self.current_task["end_time"] = datetime.now()
             self.current_task["result"] = final_result
             self.task_history.append(self.current_task)
             
+            self.estimator.record_task(
+                (self.current_task["end_time"] - self.current_task["start_time"]).total_seconds(),
+                agent=plan["metadata"].get("agent"),
+                complexity=plan["metadata"].get("complexity")
+            )
+            
             logger.info("✅ Tâche complétée avec succès!")
             
             return {
@@ -109,7 +206,8 @@ class SintraAgent:
                 "result": final_result,
                 "plan": plan,
                 "execution_results": results,
-                "duration": (self.current_task["end_time"] - self.current_task["start_time"]).total_seconds()
+                "duration": (self.current_task["end_time"] - self.current_task["start_time"]).total_seconds(),
+                "usage": task_usage.to_dict()
             }
             
         except Exception as e:
@@ -117,23 +215,158 @@ class SintraAgent:
             self.current_task["status"] = "failed"
             self.current_task["error"] = str(e)
             self.current_task["end_time"] = datetime.now()
+            self.executor.cancel_speculative()
             
             return {
                 "success": False,
                 "error": str(e),
-                "task": self.current_task
+                "task": self.current_task,
+                "usage": task_usage.to_dict()
             }
         finally:
+            current_task_usage.reset(usage_token)
+            usage_ledger.record_task(self._usage_agent())
             self.is_running = False
             self.current_task = None
     
-    async def think(self, prompt: str, context: Optional[Dict] = None) -> str:
+    async def _answer_directly(
+        self,
+        task_description: str,
+        context: Optional[Dict] = None
+    ):
+        """
+        Profil "direct": un seul appel au modèle répond à la tâche
+        
+        Returns:
+            (plan, résultats) au même format que le pipeline complet
+        """
+        step = {
+            "id": "step_1",
+            "order": 1,
+            "description": task_description,
+            "action": "answer",
+            "tool": None,
+            "inputs": {},
+            "expected_output": "Réponse complète à la tâche",
+            "type": "single",
+            "status": "pending"
+        }
+        plan = {
+            "task": task_description,
+            "analysis": {"main_objective": task_description, "complexity": "simple"},
+            "steps": [step],
+            "dependencies": {"step_1": []},
+            "direct_answer": True,
+            "created_at": datetime.now().isoformat(),
+            "metadata": {
+                "complexity": "simple",
+                "requires_tools": [],
+                "risk_level": "low",
+                "agent": (context or {}).get("agent_name"),
+                "profile": "direct"
+            }
+        }
+        self.current_task["plan"] = plan
+        logger.info("💬 Réponse directe en un seul appel...")
+        
+        result = {
+            "step_id": step["id"],
+            "description": task_description,
+            "start_time": datetime.now().isoformat(),
+            "success": False
+        }
+        usage = StepUsage(step["id"])
+        usage_token = current_step_usage.set(usage)
+        started = time.perf_counter()
+        try:
+            result["output"] = await self.think(task_description, context, call_type="direct")
+            result["success"] = True
+            step["status"] = "completed"
+        finally:
+            current_step_usage.reset(usage_token)
+        
+        result["end_time"] = datetime.now().isoformat()
+        result["duration"] = time.perf_counter() - started
+        result["tokens"] = {"prompt": usage.prompt_tokens, "completion": usage.completion_tokens}
+        self.estimator.record_step(
+            step,
+            result["duration"],
+            usage.prompt_tokens,
+            usage.completion_tokens,
+            agent=plan["metadata"]["agent"],
+            complexity="simple"
+        )
+        
+        return plan, [result]
+    
+    async def _run_tool_loop(
+        self,
+        task_description: str,
+        context: Optional[Dict] = None
+    ):
+        """
+        Profil "loop": le modèle appelle lui-même les outils (en parallèle)
+        jusqu'à sa réponse finale ou max_iterations
+        
+        Returns:
+            (plan, résultats) au même format que le pipeline complet
+        """
+        plan = {
+            "task": task_description,
+            "analysis": {"main_objective": task_description},
+            "steps": [],
+            "dependencies": {},
+            "direct_answer": True,
+            "created_at": datetime.now().isoformat(),
+            "metadata": {
+                "complexity": None,
+                "requires_tools": [],
+                "risk_level": "low",
+                "agent": (context or {}).get("agent_name"),
+                "profile": "loop"
+            }
+        }
+        self.current_task["plan"] = plan
+        
+        if self.llm_provider is not None:
+            raise ValueError("Le profil \"loop\" appelle directement les API, sans fournisseur substitué")
+        
+        loop = await ToolCallingLoop(self).run(task_description, context)
+        
+        results = [
+            {
+                "step_id": f"call_{position}",
+                "description": f"{call['tool']} (itération {call['iteration']})",
+                "success": not (isinstance(call["output"], dict) and call["output"].get("success") is False),
+                "output": call["output"],
+                "inputs": call["arguments"]
+            }
+            for position, call in enumerate(loop["tool_calls"], start=1)
+        ]
+        results.append({"step_id": "answer", "description": "Réponse finale", "success": True, "output": loop["answer"]})
+        
+        plan["metadata"]["requires_tools"] = sorted({call["tool"] for call in loop["tool_calls"]})
+        plan["tool_loop"] = {"iterations": loop["iterations"], "stopped": loop["stopped"]}
+        
+        return plan, results
+    
+    async def think(
+        self,
+        prompt: str,
+        context: Optional[Dict] = None,
+        schema: Optional[str] = None,
+        call_type: Optional[str] = None
+    ) -> str:
         """
         Fait réfléchir l'agent avec un prompt donné
         
         Args:
             prompt: Le prompt à envoyer au modèle
             context: Contexte additionnel
+            schema: Nom d'un schéma de core.schemas pour obtenir une réponse
+                JSON structurée (JSON schema OpenAI, outil forcé Anthropic)
+            call_type: Type d'appel pour le routage (modèle, max_tokens,
+                température); par défaut le nom du schéma
             
         Returns:
             La réponse du modèle
@@ -141,24 +374,118 @@ class SintraAgent:
         # Récupérer la mémoire pertinente
         relevant_memories = await self.memory.retrieve_relevant(prompt, limit=5)
         
-        # Construire le prompt avec contexte
-        full_prompt = self._build_prompt(prompt, context, relevant_memories)
+        # Construire le prompt: préfixe stable (mis en cache) + partie variable
+        system_prefix, user_prompt = self._build_prompt(
+            prompt, context, relevant_memories, call_type or schema
+        )
+        
+        # Vérifier que le modèle routé est pris en charge
+        route = self.router.resolve(call_type or schema)
+        self._completion_for(route["model"])
         
-        # Envoyer au modèle approprié
-        if self.model.startswith("gpt"):
-            return await self._openai_completion(full_prompt)
-        elif self.model.startswith("claude"):
-            return await self._anthropic_completion(full_prompt)
+        # Envoyer au modèle (repli sur la chaîne de secours, une seule
+        # requête pour les appels identiques en cours)
+        key = (route["model"], route["temperature"], route["max_tokens"], system_prefix, user_prompt, schema)
+        # (l'usage réel est imputé par l'appel qui a effectivement eu lieu)
+        response, _ = await self.flights.do(
+            key, lambda: self.fallback.complete(user_prompt, system_prefix, schema, route)
+        )
+        
+        return response
+    
+    async def think_stream(
+        self,
+        prompt: str,
+        context: Optional[Dict] = None,
+        schema: Optional[str] = None,
+        call_type: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Variante de think() qui retourne la réponse par fragments
+        au fur et à mesure de sa génération
+        """
+        # Mode batch ou fournisseur substitué (cassette): pas de streaming,
+        # la réponse complète arrive en un seul fragment
+        if current_batch_collector() is not None or self.llm_provider is not None:
+            yield await self.think(prompt, context, schema, call_type)
+            return
+        
+        relevant_memories = await self.memory.retrieve_relevant(prompt, limit=5)
+        system_prefix, user_prompt = self._build_prompt(
+            prompt, context, relevant_memories, call_type or schema
+        )
+        route = self.router.resolve(call_type or schema)
+        
+        if route["model"].startswith("gpt"):
+            chunks = self._openai_stream(user_prompt, system_prefix, schema, route)
+        elif route["model"].startswith("claude"):
+            chunks = self._anthropic_stream(user_prompt, system_prefix, route)
         else:
-            raise ValueError(f"Modèle non supporté: {self.model}")
+            raise ValueError(f"Modèle non supporté: {route['model']}")
+        
+        # Échec avant le premier fragment: même chemin que think() (chaîne
+        # de secours, hedging, requête unique); au-delà, l'erreur remonte
+        streamed = False
+        try:
+            async for chunk in chunks:
+                streamed = True
+                yield chunk
+        except Exception as e:
+            if streamed:
+                raise
+            logger.warning(f"⚠️  Streaming indisponible ({route['model']}), réponse sans streaming: {str(e)}")
+            yield await self.think(prompt, context, schema, call_type)
     
     def _build_prompt(
         self,
         prompt: str,
         context: Optional[Dict],
-        memories: List[Dict]
-    ) -> str:
-        """Construit le prompt complet avec contexte et mémoires"""
+        memories: List[Dict],
+        call_type: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """
+        Construit le prompt complet avec contexte et mémoires, dans le
+        budget de tokens du type d'appel
+        
+        Returns:
+            (préfixe système stable, partie variable): le préfixe (rôle, outils,
+            persona de l'agent spécialisé) est identique d'un appel à l'autre
+            et peut être mis en cache par le fournisseur
+        """
+        context = dict(context or {})
+        persona = context.pop("agent_personality", None)
+        system_prefix = self._system_prefix(persona)
+        
+        context_section = ""
+        if context:
+            context_section = f"Contexte actuel:\n{compact_json(context)}\n\n"
+        
+        memory_section = ""
+        if memories:
+            memory_section = "Expériences pertinentes:\n"
+            for mem in memories:
+                memory_section += f"- {mem.get('description') or mem.get('category', '')}\n"
+            memory_section += "\n"
+        
+        # Le contexte puis les mémoires sont tronqués en premier si le budget est dépassé
+        system_prefix, context_section, memory_section, task_section = self.budget.fit([
+            (system_prefix, 0),
+            (context_section, 1),
+            (memory_section, 2),
+            (f"Tâche:\n{prompt}", 0)
+        ], call_type=call_type)
+        
+        return system_prefix, f"{context_section}{memory_section}{task_section}"
+    
+    def _system_prefix(self, persona: Optional[str] = None) -> str:
+        """
+        Préambule système (rôle, outils, persona), construit une seule fois
+        par persona pour rester identique octet pour octet entre les appels
+        """
+        tool_names = tuple(tool["name"] for tool in self.tool_registry.list_tools())
+        key = (persona, tool_names)
+        if key in self._system_prefixes:
+            return self._system_prefixes[key]
         
         system_prompt = f"""Tu es {self.name}, un agent IA autonome sophistiqué.
 
@@ -177,57 +504,369 @@ Principes:
 3. Apprends de tes expériences passées
 4. Sois précis et méthodique
 """
+        if persona:
+            system_prompt += f"\n{persona}"
         
-        context_section = ""
-        if context:
-            context_section = f"\n\nContexte actuel:\n{json.dumps(context, indent=2)}"
-        
-        memory_section = ""
-        if memories:
-            memory_section = "\n\nExpériences pertinentes:\n"
-            for mem in memories:
-                memory_section += f"- {mem['description']}\n"
-        
-        return f"{system_prompt}{context_section}{memory_section}\n\nTâche:\n{prompt}"
+        self._system_prefixes[key] = system_prompt
+        return system_prompt
     
     def _format_available_tools(self) -> str:
         """Formate la liste des outils disponibles"""
         tools = self.tool_registry.list_tools()
         return "\n".join([f"- {tool['name']}: {tool['description']}" for tool in tools])
     
-    async def _openai_completion(self, prompt: str) -> str:
+    def _record_cache_usage(self, prompt_tokens: int, cached_tokens: int, cache_writes: int = 0):
+        """
+        Enregistre l'utilisation du cache de préfixe du fournisseur
+        """
+        stats = self.prompt_cache_stats
+        stats["calls"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["cached_tokens"] += cached_tokens
+        stats["cache_write_tokens"] += cache_writes
+        if cached_tokens:
+            stats["hits"] += 1
+    
+    def _record_openai_usage(self, usage: Any):
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        self._record_cache_usage(
+            getattr(usage, "prompt_tokens", 0) or 0,
+            getattr(details, "cached_tokens", 0) or 0
+        )
+    
+    def _record_anthropic_usage(self, usage: Any):
+        if usage is None:
+            return
+        cached = getattr(usage, "cache_read_input_tokens", 0) or 0
+        written = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        self._record_cache_usage(
+            (getattr(usage, "input_tokens", 0) or 0) + cached + written,
+            cached,
+            written
+        )
+    
+    def _openai_messages(self, prompt: str, system: Optional[str]) -> List[Dict[str, str]]:
+        # Le préfixe identique en tête de requête active le cache automatique d'OpenAI
+        return [
+            {"role": "system", "content": system or "Tu es Sintra, un agent IA autonome."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _anthropic_system(self, system: Optional[str]) -> List[Dict[str, Any]]:
+        if not system:
+            return []
+        return [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+    
+    def _openai_response_format(self, schema: Optional[str], model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Paramètre response_format pour une réponse structurée (vide sans schéma)
+        """
+        if not schema:
+            return {}
+        if (model or self.model).startswith(self.STRUCTURED_OUTPUT_MODELS):
+            return {"response_format": {
+                "type": "json_schema",
+                "json_schema": {"name": schema, "schema": SCHEMAS[schema]}
+            }}
+        return {"response_format": {"type": "json_object"}}
+    
+    def _anthropic_tools(self, schema: Optional[str]) -> Dict[str, Any]:
+        """
+        Outil forcé dont l'entrée suit le schéma (vide sans schéma)
+        """
+        if not schema:
+            return {}
+        return {
+            "tools": [{
+                "name": schema,
+                "description": SCHEMA_DESCRIPTIONS.get(schema, schema),
+                "input_schema": SCHEMAS[schema]
+            }],
+            "tool_choice": {"type": "tool", "name": schema}
+        }
+    
+    def _estimated_tokens(self, prompt: str, system: Optional[str] = None, max_tokens: Optional[int] = None) -> int:
+        """
+        Tokens réservés auprès de la passerelle: prompt + complétion maximale
+        (ajustés à l'usage réel après la réponse)
+        """
+        return (
+            count_tokens(prompt, self.model)
+            + count_tokens(system or "", self.model)
+            + (max_tokens or self.router.resolve()["max_tokens"])
+        )
+    
+    def _usage_agent(self) -> str:
+        """
+        Agent auquel imputer l'usage: agent spécialisé en cours, sinon cet agent
+        """
+        agent = current_call_class()["agent"]
+        return self.name if agent == "default" else agent
+    
+    def _record_call_usage(
+        self,
+        route: Dict[str, Any],
+        usage: Any,
+        started: float,
+        prompt: str = "",
+        response: str = ""
+    ):
+        """
+        Impute l'usage réel d'un appel (tokens de la réponse du fournisseur,
+        latence, coût) à l'étape, à la tâche et au cumul par agent et modèle;
+        tokens estimés si le fournisseur n'en renvoie pas
+        """
+        model = route["model"]
+        if usage is None:
+            prompt_tokens, completion_tokens, cached_tokens = (
+                count_tokens(prompt, model), count_tokens(response or "", model), 0
+            )
+        elif getattr(usage, "prompt_tokens", None) is not None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            prompt_tokens = usage.prompt_tokens or 0
+            completion_tokens = usage.completion_tokens or 0
+            cached_tokens = getattr(details, "cached_tokens", 0) or 0
+        else:
+            # Anthropic: input_tokens exclut les lectures et écritures du cache
+            cached_tokens = getattr(usage, "cache_read_input_tokens", 0) or 0
+            prompt_tokens = (
+                (getattr(usage, "input_tokens", 0) or 0)
+                + cached_tokens
+                + (getattr(usage, "cache_creation_input_tokens", 0) or 0)
+            )
+            completion_tokens = getattr(usage, "output_tokens", 0) or 0
+        
+        record_llm_call(
+            model,
+            route.get("call_type"),
+            prompt_tokens,
+            completion_tokens,
+            time.perf_counter() - started,
+            cost_usd=self.estimator.estimate_cost(prompt_tokens, completion_tokens, model),
+            cached_tokens=cached_tokens,
+            agent=self._usage_agent(),
+            tenant=current_call_class()["tenant"]
+        )
+    
+    def has_client(self, model: str) -> bool:
+        """
+        Le client du fournisseur de ce modèle est configuré
+        """
+        if self.llm_provider is not None:
+            return self.llm_provider.supports(model)
+        return self.has_api_client(model)
+    
+    def has_api_client(self, model: str) -> bool:
+        """
+        Le client API du fournisseur de ce modèle est configuré
+        """
+        if model.startswith("gpt"):
+            return self.openai_client is not None
+        if model.startswith("claude"):
+            return self.anthropic_client is not None
+        return False
+    
+    def _completion_for(self, model: str):
+        """
+        Méthode de complétion du modèle (fournisseur substitué s'il est défini)
+        """
+        completion = self._api_completion_for(model)
+        return self.llm_provider.complete if self.llm_provider is not None else completion
+    
+    def _api_completion_for(self, model: str):
+        """
+        Méthode de complétion du fournisseur du modèle
+        """
+        if model.startswith("gpt"):
+            return self._openai_completion
+        if model.startswith("claude"):
+            return self._anthropic_completion
+        raise ValueError(f"Modèle non supporté: {model}")
+    
+    async def _openai_completion(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        schema: Optional[str] = None,
+        route: Optional[Dict[str, Any]] = None
+    ) -> str:
         """Obtient une complétion via OpenAI"""
         if not self.openai_client:
             raise ValueError("Client OpenAI non initialisé")
         
-        response = await self.openai_client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": "Tu es Sintra, un agent IA autonome."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=self.temperature,
-            max_tokens=4000
-        )
+        route = route or self.router.resolve()
+        params = {
+            "model": route["model"],
+            "messages": self._openai_messages(prompt, system),
+            "temperature": route["temperature"],
+            "max_tokens": route["max_tokens"],
+            **self._openai_response_format(schema, route["model"])
+        }
+        
+        # Mode batch: l'appel rejoint le prochain lot au lieu de partir seul
+        started = time.perf_counter()
+        collector = current_batch_collector()
+        if collector is not None:
+            response = await collector.submit("openai", params)
+        else:
+            response = await self.gateway.call(
+                "openai",
+                route["model"],
+                lambda: self.openai_client.chat.completions.create(**params),
+                self._estimated_tokens(prompt, system, route["max_tokens"])
+            )
+        usage = getattr(response, "usage", None)
+        self._record_openai_usage(usage)
+        content = response.choices[0].message.content
+        self._record_call_usage(route, usage, started, f"{system or ''}{prompt}", content)
         
-        return response.choices[0].message.content
+        return content
     
-    async def _anthropic_completion(self, prompt: str) -> str:
+    async def _anthropic_completion(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        schema: Optional[str] = None,
+        route: Optional[Dict[str, Any]] = None
+    ) -> str:
         """Obtient une complétion via Anthropic"""
         if not self.anthropic_client:
             raise ValueError("Client Anthropic non initialisé")
         
-        response = await self.anthropic_client.messages.create(
-            model=self.model,
-            max_tokens=4000,
-            temperature=self.temperature,
-            messages=[
+        route = route or self.router.resolve()
+        params = {
+            "model": route["model"],
+            "max_tokens": route["max_tokens"],
+            "temperature": route["temperature"],
+            "system": self._anthropic_system(system),
+            "messages": [
                 {"role": "user", "content": prompt}
-            ]
-        )
+            ],
+            **self._anthropic_tools(schema)
+        }
+        
+        # Mode batch: l'appel rejoint le prochain lot au lieu de partir seul
+        started = time.perf_counter()
+        collector = current_batch_collector()
+        if collector is not None:
+            response = await collector.submit("anthropic", params)
+        else:
+            response = await self.gateway.call(
+                "anthropic",
+                route["model"],
+                lambda: self.anthropic_client.messages.create(**params),
+                self._estimated_tokens(prompt, system, route["max_tokens"])
+            )
+        usage = getattr(response, "usage", None)
+        self._record_anthropic_usage(usage)
+        self._record_call_usage(route, usage, started, f"{system or ''}{prompt}")
+        
+        # Réponse structurée: l'entrée de l'outil forcé
+        for block in response.content:
+            if getattr(block, "type", None) == "tool_use":
+                return json.dumps(block.input, ensure_ascii=False)
         
         return response.content[0].text
     
+    async def _openai_stream(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        schema: Optional[str] = None,
+        route: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Complétion OpenAI en streaming"""
+        if not self.openai_client:
+            raise ValueError("Client OpenAI non initialisé")
+        
+        route = route or self.router.resolve()
+        estimated_tokens = self._estimated_tokens(prompt, system, route["max_tokens"])
+        async with self.gateway.slot("openai", route["model"], estimated_tokens) as ticket:
+            started = time.perf_counter()
+            usage = None
+            parts = []
+            stream = await self.openai_client.chat.completions.create(
+                model=route["model"],
+                messages=self._openai_messages(prompt, system),
+                temperature=route["temperature"],
+                max_tokens=route["max_tokens"],
+                stream=True,
+                stream_options={"include_usage": True},
+                **self._openai_response_format(schema, route["model"])
+            )
+            
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                    self._record_openai_usage(usage)
+                    ticket.record(usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+            
+            self._record_call_usage(route, usage, started, f"{system or ''}{prompt}", "".join(parts))
+    
+    async def _anthropic_stream(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        route: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Complétion Anthropic en streaming"""
+        if not self.anthropic_client:
+            raise ValueError("Client Anthropic non initialisé")
+        
+        route = route or self.router.resolve()
+        estimated_tokens = self._estimated_tokens(prompt, system, route["max_tokens"])
+        async with self.gateway.slot("anthropic", route["model"], estimated_tokens) as ticket:
+            started = time.perf_counter()
+            async with self.anthropic_client.messages.stream(
+                model=route["model"],
+                max_tokens=route["max_tokens"],
+                temperature=route["temperature"],
+                system=self._anthropic_system(system),
+                messages=[
+                    {"role": "user", "content": prompt}
+                ]
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                final_message = await stream.get_final_message()
+                self._record_anthropic_usage(getattr(final_message, "usage", None))
+                ticket.record(final_message)
+                self._record_call_usage(route, getattr(final_message, "usage", None), started, f"{system or ''}{prompt}")
+    
+    def _direct_result(self, execution_results: List[Dict]) -> Optional[Dict[str, Any]]:
+        """
+        Construit la réponse finale à partir de la sortie de la dernière étape
+        (None si cette sortie n'est pas exploitable telle quelle)
+        """
+        if not execution_results or not execution_results[-1].get("success"):
+            return None
+        
+        output = execution_results[-1].get("output")
+        if isinstance(output, dict):
+            # Les outils signalent leurs erreurs dans la sortie
+            if output.get("success") is False:
+                return None
+            if "expression" in output and "result" in output:
+                summary = f"{output['expression']} = {output['result']}"
+            elif "result" in output:
+                summary = str(output["result"])
+            else:
+                summary = compact_json(output)
+        else:
+            summary = str(output)
+        
+        return {
+            "summary": summary,
+            "key_findings": [],
+            "data": output,
+            "next_steps": []
+        }
+    
     async def _synthesize_results(
         self,
         task_description: str,
@@ -236,10 +875,19 @@ Principes:
         """
         Synthétise les résultats d'exécution en une réponse finale
         """
+        # Résultats résumés (map-reduce) s'ils dépassent leur part du budget;
+        # un résultat groupé est déjà présent via les résultats de ses membres
+        results_section = await self.budget.condense(
+            [compact_json(result) for result in execution_results if not result.get("batch_members")],
+            self.budget.share(0.6, "synthesis"),
+            "Résume ces résultats d'exécution en conservant les faits, chiffres, "
+            "sources et conclusions utiles à la réponse finale."
+        )
+        
         synthesis_prompt = f"""Tâche originale: {task_description}
 
 Résultats d'exécution:
-{json.dumps(execution_results, indent=2)}
+{results_section}
 
 Synthétise ces résultats en une réponse claire et complète.
 Format de réponse (JSON):
@@ -251,17 +899,17 @@ Format de réponse (JSON):
 }}
 """
         
-        response = await self.think(synthesis_prompt)
+        response = await self.think(synthesis_prompt, schema="synthesis")
         
-        try:
-            # Tenter de parser en JSON
-            return json.loads(response)
-        except:
-            # Si échec, retourner en format texte
-            return {
-                "summary": response,
-                "raw_results": execution_results
-            }
+        synthesis = parse_json(response, "synthesis", expect=dict)
+        if synthesis is not None:
+            return synthesis
+        
+        # Si échec, retourner en format texte
+        return {
+            "summary": response,
+            "raw_results": execution_results
+        }
     
     def get_status(self) -> Dict[str, Any]:
         """Retourne le statut actuel de l'agent"""
@@ -271,7 +919,13 @@ Format de réponse (JSON):
             "is_running": self.is_running,
             "current_task": self.current_task,
             "tasks_completed": len(self.task_history),
-            "memory_size": self.memory.size()
+            "memory_size": self.memory.size(),
+            "prompt_cache": self.prompt_cache_stats,
+            "json_parsing": parse_metrics.snapshot(),
+            "llm_gateway": self.gateway.get_metrics(),
+            "singleflight": self.flights.stats,
+            "fallback": self.fallback.get_stats(),
+            "llm_usage": usage_ledger.snapshot()
         }
     
     async def reset(self):
@@ -0,0 +1,349 @@
+"""
+Mode batch hors ligne: regroupement des appels LLM de nombreuses tâches
+et soumission via les API batch des fournisseurs
+"""
+
+import asyncio
+import json
+import logging
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from .llm_gateway import llm_call_class
+
+logger = logging.getLogger(__name__)
+
+# Requête d'un lot: (identifiant, paramètres de l'appel chat/messages)
+BatchRequest = Tuple[str, Dict[str, Any]]
+
+_collector: ContextVar[Optional["BatchCollector"]] = ContextVar("batch_collector", default=None)
+_job_id: ContextVar[Optional[int]] = ContextVar("batch_job_id", default=None)
+
+
+def current_batch_collector() -> Optional["BatchCollector"]:
+    """
+    Collecteur actif (None hors du mode batch)
+    """
+    return _collector.get()
+
+
+class OpenAIBatchBackend:
+    """
+    API Batch OpenAI: fichier JSONL de requêtes /v1/chat/completions,
+    suivi du lot puis lecture du fichier de sortie
+    """
+
+    ENDPOINT = "/v1/chat/completions"
+    FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+    def __init__(self, client, poll_interval: float = 30.0):
+        self.client = client
+        self.poll_interval = poll_interval
+
+    async def run(self, requests: List[BatchRequest]) -> Dict[str, Any]:
+        from openai.types.chat import ChatCompletion
+
+        lines = [
+            json.dumps({"custom_id": custom_id, "method": "POST", "url": self.ENDPOINT, "body": params})
+            for custom_id, params in requests
+        ]
+        batch_file = await self.client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint=self.ENDPOINT,
+            completion_window="24h"
+        )
+        logger.info(f"📦 Lot OpenAI {batch.id} soumis ({len(requests)} requêtes)")
+
+        while batch.status not in self.FINAL_STATUSES:
+            await asyncio.sleep(self.poll_interval)
+            batch = await self.client.batches.retrieve(batch.id)
+
+        results: Dict[str, Any] = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                response = item.get("response") or {}
+                if response.get("status_code") == 200:
+                    results[item["custom_id"]] = ChatCompletion.model_validate(response["body"])
+                else:
+                    error = item.get("error") or response.get("body", {}).get("error")
+                    results[item["custom_id"]] = RuntimeError(f"Requête du lot en échec: {error}")
+
+        for custom_id, _ in requests:
+            results.setdefault(custom_id, RuntimeError(f"Lot OpenAI {batch.id} terminé: {batch.status}"))
+        return results
+
+
+class AnthropicBatchBackend:
+    """
+    API Message Batches Anthropic
+    """
+
+    def __init__(self, client, poll_interval: float = 30.0):
+        self.client = client
+        self.poll_interval = poll_interval
+
+    async def run(self, requests: List[BatchRequest]) -> Dict[str, Any]:
+        batch = await self.client.messages.batches.create(
+            requests=[{"custom_id": custom_id, "params": params} for custom_id, params in requests]
+        )
+        logger.info(f"📦 Lot Anthropic {batch.id} soumis ({len(requests)} requêtes)")
+
+        while batch.processing_status != "ended":
+            await asyncio.sleep(self.poll_interval)
+            batch = await self.client.messages.batches.retrieve(batch.id)
+
+        results: Dict[str, Any] = {}
+        async for entry in await self.client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                results[entry.custom_id] = entry.result.message
+            else:
+                results[entry.custom_id] = RuntimeError(f"Requête du lot en échec: {entry.result.type}")
+
+        for custom_id, _ in requests:
+            results.setdefault(custom_id, RuntimeError(f"Résultat absent du lot Anthropic {batch.id}"))
+        return results
+
+
+class LocalBatchBackend:
+    """
+    Substitut local des API batch (tests, développement): chaque requête du
+    lot est exécutée par complete(params) avec une concurrence limitée
+    """
+
+    def __init__(self, complete: Callable[[Dict[str, Any]], Awaitable[Any]], concurrency: int = 8):
+        self.complete = complete
+        self.concurrency = concurrency
+
+    async def run(self, requests: List[BatchRequest]) -> Dict[str, Any]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_one(params: Dict[str, Any]) -> Any:
+            async with semaphore:
+                try:
+                    return await self.complete(params)
+                except Exception as e:
+                    return e
+
+        responses = await asyncio.gather(*(run_one(params) for _, params in requests))
+        return {custom_id: response for (custom_id, _), response in zip(requests, responses)}
+
+
+class BatchCollector:
+    """
+    Regroupe les appels LLM des tâches en cours et les soumet par lot
+
+    Un lot part dès que chaque tâche active attend une réponse (toutes les
+    tâches ont atteint la même étape du pipeline), quand max_batch_size est
+    atteint, ou après flush_interval secondes sans nouvel appel.
+    """
+
+    def __init__(
+        self,
+        backends: Dict[str, Any],
+        max_batch_size: int = 1000,
+        flush_interval: float = 5.0
+    ):
+        self.backends = backends
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.active_jobs = 0
+        self._pending: Dict[str, List[Tuple[str, Dict[str, Any], asyncio.Future]]] = {}
+        self._waiting: Dict[int, int] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._flushes: Set[asyncio.Task] = set()
+        self._counter = 0
+        self.stats = {"batches": 0, "requests": 0, "failed": 0}
+
+    async def submit(self, provider: str, params: Dict[str, Any]) -> Any:
+        """
+        Ajoute un appel au prochain lot du fournisseur et attend sa réponse
+        """
+        if provider not in self.backends:
+            raise ValueError(f"Aucun backend batch pour le fournisseur {provider}")
+
+        self._counter += 1
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending.setdefault(provider, [])
+        pending.append((f"req-{self._counter}", params, future))
+
+        job_id = _job_id.get()
+        if job_id is not None:
+            self._waiting[job_id] = self._waiting.get(job_id, 0) + 1
+        try:
+            if len(pending) >= self.max_batch_size or self._all_jobs_waiting():
+                self._flush_all()
+            else:
+                self._schedule(provider)
+            return await future
+        finally:
+            if job_id is not None:
+                self._waiting[job_id] -= 1
+                if not self._waiting[job_id]:
+                    del self._waiting[job_id]
+
+    def _all_jobs_waiting(self) -> bool:
+        return self.active_jobs > 0 and len(self._waiting) >= self.active_jobs
+
+    def job_finished(self):
+        """
+        Une tâche de moins à attendre: les tâches restantes peuvent toutes être en attente
+        """
+        self.active_jobs -= 1
+        if self._all_jobs_waiting():
+            self._flush_all()
+
+    def _schedule(self, provider: str):
+        timer = self._timers.pop(provider, None)
+        if timer is not None:
+            timer.cancel()
+        self._timers[provider] = asyncio.get_running_loop().call_later(
+            self.flush_interval, self._flush, provider
+        )
+
+    def _flush_all(self):
+        for provider in list(self._pending):
+            self._flush(provider)
+
+    def _flush(self, provider: str):
+        timer = self._timers.pop(provider, None)
+        if timer is not None:
+            timer.cancel()
+        entries = [entry for entry in self._pending.pop(provider, []) if not entry[2].done()]
+        if entries:
+            task = asyncio.ensure_future(self._run(provider, entries))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _run(self, provider: str, entries: List[Tuple[str, Dict[str, Any], asyncio.Future]]):
+        self.stats["batches"] += 1
+        self.stats["requests"] += len(entries)
+        logger.info(f"📦 Lot {provider}: {len(entries)} requêtes")
+
+        try:
+            results = await self.backends[provider].run([(custom_id, params) for custom_id, params, _ in entries])
+        except Exception as e:
+            logger.error(f"❌ Échec du lot {provider}: {str(e)}")
+            results = {custom_id: e for custom_id, _, _ in entries}
+
+        for custom_id, _, future in entries:
+            if future.done():
+                continue
+            result = results.get(custom_id, RuntimeError("Résultat absent du lot"))
+            if isinstance(result, Exception):
+                self.stats["failed"] += 1
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class BatchRunner:
+    """
+    Exécute de nombreuses tâches en mode batch: un agent par tâche
+    (agent_factory), appels LLM regroupés par BatchCollector, priorité
+    background sur la passerelle pour les appels restés synchrones
+
+    Chaque tâche est un texte ou un dict {"description", "context",
+    "profile", "agent_id"}.
+    """
+
+    def __init__(
+        self,
+        agent_factory: Callable[[], Any],
+        backends: Optional[Dict[str, Any]] = None,
+        local: bool = False,
+        max_concurrent_tasks: int = 500,
+        max_batch_size: int = 1000,
+        flush_interval: float = 5.0,
+        poll_interval: float = 30.0
+    ):
+        self.agent_factory = agent_factory
+        self.backends = backends
+        self.local = local
+        self.max_concurrent_tasks = max_concurrent_tasks
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval
+
+    def _default_backends(self, agent) -> Dict[str, Any]:
+        backends: Dict[str, Any] = {}
+        if agent.openai_client:
+            backends["openai"] = (
+                LocalBatchBackend(lambda params: agent.openai_client.chat.completions.create(**params))
+                if self.local else OpenAIBatchBackend(agent.openai_client, self.poll_interval)
+            )
+        if agent.anthropic_client:
+            backends["anthropic"] = (
+                LocalBatchBackend(lambda params: agent.anthropic_client.messages.create(**params))
+                if self.local else AnthropicBatchBackend(agent.anthropic_client, self.poll_interval)
+            )
+        return backends
+
+    async def run(self, tasks: List[Union[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Retourne les résultats de run_task dans l'ordre des tâches
+        """
+        if not tasks:
+            return []
+
+        agents = [self.agent_factory() for _ in tasks]
+        collector = BatchCollector(
+            self.backends or self._default_backends(agents[0]),
+            max_batch_size=self.max_batch_size,
+            flush_interval=self.flush_interval
+        )
+        semaphore = asyncio.Semaphore(self.max_concurrent_tasks)
+        token = _collector.set(collector)
+
+        logger.info(f"📦 Mode batch: {len(tasks)} tâches")
+        try:
+            with llm_call_class("background"):
+                results = await asyncio.gather(*(
+                    self._run_one(collector, semaphore, job_id, agent, task)
+                    for job_id, (agent, task) in enumerate(zip(agents, tasks))
+                ))
+        finally:
+            _collector.reset(token)
+
+        succeeded = sum(1 for result in results if result.get("success"))
+        logger.info(f"📦 Mode batch terminé: {succeeded}/{len(results)} tâches réussies, {collector.stats}")
+        return results
+
+    async def _run_one(
+        self,
+        collector: BatchCollector,
+        semaphore: asyncio.Semaphore,
+        job_id: int,
+        agent,
+        task: Union[str, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        from .specialized_agents import SPECIALIZED_AGENTS
+
+        if isinstance(task, str):
+            task = {"description": task}
+
+        async with semaphore:
+            collector.active_jobs += 1
+            token = _job_id.set(job_id)
+            try:
+                agent_id = task.get("agent_id")
+                if agent_id in SPECIALIZED_AGENTS:
+                    return await SPECIALIZED_AGENTS[agent_id](agent).execute_task(
+                        task["description"], task.get("context"), profile=task.get("profile")
+                    )
+                return await agent.run_task(task["description"], task.get("context"), profile=task.get("profile"))
+            except Exception as e:
+                logger.error(f"❌ Tâche {job_id} du lot en échec: {str(e)}")
+                return {"success": False, "task": task["description"], "error": str(e)}
+            finally:
+                _job_id.reset(token)
+                collector.job_finished()
@@ -0,0 +1,173 @@
+"""
+Budget de tokens pour l'assemblage des prompts
+"""
+
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from .tokens import context_window, count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class PromptBudget:
+    """
+    Maintient la taille des prompts sous un budget de tokens
+
+    - fit(): tronque les sections par ordre de priorité (0 = obligatoire,
+      puis les plus petites valeurs sont servies en premier)
+    - condense(): résumé map-reduce par le modèle quand un contenu
+      dépasse le budget et doit être conservé en substance
+
+    Le budget d'un prompt dépend de son type d'appel: fenêtre de contexte
+    du modèle routé moins le max_tokens réservé à sa complétion.
+    """
+
+    TRUNCATION_MARKER = "\n[... tronqué ...]"
+    MIN_SECTION_TOKENS = 32
+
+    def __init__(
+        self,
+        agent,
+        max_prompt_tokens: Optional[int] = None,
+        chunk_tokens: int = 3000,
+        max_reduce_rounds: int = 3
+    ):
+        self.agent = agent
+        self.max_prompt_tokens = max_prompt_tokens
+        self.chunk_tokens = chunk_tokens
+        self.max_reduce_rounds = max_reduce_rounds
+        self.stats = {"truncated_sections": 0, "dropped_sections": 0, "condensed": 0, "summary_calls": 0}
+
+    def prompt_tokens(self, call_type: Optional[str] = None) -> int:
+        """
+        Nombre de tokens disponibles pour un prompt complet de ce type d'appel
+        """
+        route = self.agent.router.resolve(call_type)
+        available = context_window(route["model"]) - route["max_tokens"]
+        if self.max_prompt_tokens:
+            available = min(available, self.max_prompt_tokens)
+        return max(available, self.MIN_SECTION_TOKENS)
+
+    def share(self, fraction: float, call_type: Optional[str] = None) -> int:
+        """
+        Part du budget réservée à une section variable d'un prompt
+        """
+        return max(self.MIN_SECTION_TOKENS, int(self.prompt_tokens(call_type) * fraction))
+
+    def count(self, text: str) -> int:
+        return count_tokens(text, self.agent.model)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Tronque une section à max_tokens
+        """
+        truncated = truncate_to_tokens(text, max_tokens, self.agent.model, self.TRUNCATION_MARKER)
+        if truncated != text:
+            self.stats["truncated_sections"] += 1
+        return truncated
+
+    def fit(
+        self,
+        sections: List[Tuple[str, int]],
+        max_tokens: Optional[int] = None,
+        call_type: Optional[str] = None
+    ) -> List[str]:
+        """
+        Ajuste des sections (texte, priorité) au budget et les retourne
+        dans leur ordre d'origine
+
+        Les sections de priorité 0 sont conservées intégralement; les autres
+        reçoivent le budget restant par priorité croissante et sont tronquées,
+        ou retirées s'il ne reste presque plus rien.
+        """
+        budget = max_tokens if max_tokens is not None else self.prompt_tokens(call_type)
+        sizes = [self.count(text) for text, _ in sections]
+
+        remaining = budget - sum(size for size, (_, priority) in zip(sizes, sections) if priority == 0)
+        if remaining < 0:
+            logger.warning(f"⚠️  Sections obligatoires au-delà du budget ({budget - remaining}/{budget} tokens)")
+
+        fitted = [text for text, _ in sections]
+        order = sorted(
+            (position for position, (_, priority) in enumerate(sections) if priority > 0),
+            key=lambda position: sections[position][1]
+        )
+        for position in order:
+            size = sizes[position]
+            if size <= remaining:
+                remaining -= size
+                continue
+            if remaining >= self.MIN_SECTION_TOKENS:
+                fitted[position] = self.truncate(fitted[position], remaining)
+                remaining = 0
+            else:
+                fitted[position] = ""
+                self.stats["dropped_sections"] += 1
+
+        return fitted
+
+    async def condense(self, items: List[str], max_tokens: int, instruction: str) -> str:
+        """
+        Réduit une liste de contenus à max_tokens par résumés successifs
+        (map: résumé de chaque paquet en parallèle, reduce: nouvelle passe
+        sur les résumés tant que le budget est dépassé)
+        """
+        text = "\n".join(items)
+        if self.count(text) <= max_tokens:
+            return text
+
+        self.stats["condensed"] += 1
+        logger.info(f"🗜️  Contenu au-delà du budget ({self.count(text)}/{max_tokens} tokens), résumé...")
+
+        for _ in range(self.max_reduce_rounds):
+            chunks = self._chunk(items)
+            target = max(self.MIN_SECTION_TOKENS, max_tokens // len(chunks))
+            items = list(await asyncio.gather(
+                *(self._summarize(chunk, target, instruction) for chunk in chunks)
+            ))
+            text = "\n".join(items)
+            if self.count(text) <= max_tokens:
+                return text
+
+        return self.truncate(text, max_tokens)
+
+    def _chunk(self, items: List[str]) -> List[str]:
+        """
+        Regroupe les contenus en paquets d'au plus chunk_tokens
+        (sans dépasser la part du budget d'un prompt de résumé)
+        """
+        limit = min(self.chunk_tokens, self.share(0.6, "summary"))
+        chunks: List[str] = []
+        current: List[str] = []
+        current_size = 0
+
+        for item in items:
+            item = self.truncate(item, limit)
+            size = self.count(item)
+            if current and current_size + size > limit:
+                chunks.append("\n".join(current))
+                current, current_size = [], 0
+            current.append(item)
+            current_size += size
+
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+
+    async def _summarize(self, chunk: str, max_tokens: int, instruction: str) -> str:
+        prompt = f"""{instruction}
+
+Longueur maximale: environ {max_tokens} tokens.
+
+Contenu:
+{chunk}
+"""
+        self.stats["summary_calls"] += 1
+        try:
+            summary = await self.agent.think(prompt, call_type="summary")
+        except Exception as e:
+            logger.warning(f"⚠️  Résumé impossible, troncature: {str(e)}")
+            return self.truncate(chunk, max_tokens)
+        return self.truncate(summary, max_tokens)
@@ -0,0 +1,129 @@
+"""
+Construction du contexte des étapes de réflexion
+"""
+
+import json
+import logging
+from typing import Dict, List, Any, Optional
+
+from .references import ResultIndex, find_references
+
+logger = logging.getLogger(__name__)
+
+
+def compact_json(value: Any) -> str:
+    """
+    Sérialise en JSON compact (sans indentation ni espaces superflus)
+    """
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class StepContextBuilder:
+    """
+    Sélectionne et réduit les résultats précédents utiles à une étape
+
+    Seules les sorties des étapes référencées ($ref) ou dont l'étape dépend
+    sont incluses, de sorte que la taille du prompt reste stable quelle que
+    soit la longueur du plan.
+    """
+
+    def __init__(
+        self,
+        max_output_chars: int = 1500,
+        max_string_chars: int = 500,
+        max_list_items: int = 10,
+        max_depth: int = 4
+    ):
+        self.max_output_chars = max_output_chars
+        self.max_string_chars = max_string_chars
+        self.max_list_items = max_list_items
+        self.max_depth = max_depth
+
+    def relevant_step_ids(
+        self,
+        step: Dict[str, Any],
+        dependencies: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        Retourne les étapes dont la sortie est utile à cette étape
+        """
+        step_ids: List[str] = []
+        candidates = list(dependencies or [])
+        candidates += find_references(step.get("inputs", {}))
+        candidates += find_references(step.get("map", {}))
+
+        for step_id in candidates:
+            if step_id not in step_ids and step_id != step.get("id"):
+                step_ids.append(step_id)
+
+        return step_ids
+
+    def select_results(
+        self,
+        step: Dict[str, Any],
+        previous_results: ResultIndex,
+        dependencies: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Retourne {step_id: sortie réduite} pour les étapes pertinentes
+        """
+        selected = {}
+        for step_id in self.relevant_step_ids(step, dependencies):
+            result = previous_results.get(step_id)
+            if result is None:
+                continue
+            if result.get("success"):
+                selected[step_id] = self.reduce_output(result.get("output"))
+            else:
+                selected[step_id] = {"error": result.get("error")}
+        return selected
+
+    def reduce_output(self, output: Any) -> Any:
+        """
+        Réduit une sortie volumineuse en conservant sa structure
+        """
+        reduced = self._shrink(output, depth=0)
+
+        # Dernier recours: tronquer la forme sérialisée
+        serialized = compact_json(reduced)
+        if len(serialized) > self.max_output_chars:
+            return serialized[:self.max_output_chars] + f"… [tronqué, {len(serialized)} caractères]"
+
+        return reduced
+
+    def _shrink(self, value: Any, depth: int) -> Any:
+        """
+        Tronque les chaînes longues, les listes et les structures profondes
+        """
+        if isinstance(value, str):
+            if len(value) > self.max_string_chars:
+                return value[:self.max_string_chars] + f"… [+{len(value) - self.max_string_chars} caractères]"
+            return value
+
+        if depth >= self.max_depth and isinstance(value, (dict, list)):
+            return f"[{type(value).__name__} de {len(value)} éléments]"
+
+        if isinstance(value, dict):
+            return {key: self._shrink(item, depth + 1) for key, item in value.items()}
+
+        if isinstance(value, (list, tuple)):
+            shrunk = [self._shrink(item, depth + 1) for item in value[:self.max_list_items]]
+            if len(value) > self.max_list_items:
+                shrunk.append(f"… (+{len(value) - self.max_list_items} éléments)")
+            return shrunk
+
+        return value
+
+    def format_results(self, selected: Dict[str, Any]) -> str:
+        """
+        Formate les résultats sélectionnés pour un prompt
+        """
+        if not selected:
+            return "Aucun résultat précédent pertinent"
+
+        lines = []
+        for step_id, output in selected.items():
+            text = output if isinstance(output, str) else compact_json(output)
+            lines.append(f"- {step_id}: {text}")
+
+        return "\n".join(lines)
@@ -0,0 +1,328 @@
+"""
+Estimation de durée et de coût à partir de l'historique d'exécution
+"""
+
+import json
+import logging
+import os
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StepUsage:
+    """
+    Tokens consommés par les appels au modèle pendant une étape
+    """
+
+    def __init__(self, step_id: Optional[str] = None):
+        self.step_id = step_id
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.llm_calls = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, prompt_tokens: int, completion_tokens: int):
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.llm_calls += 1
+
+
+# Usage de l'étape en cours (partagé par les sous-tâches asyncio de l'étape)
+current_step_usage: ContextVar[Optional[StepUsage]] = ContextVar("current_step_usage", default=None)
+
+
+def record_llm_tokens(prompt_tokens: int, completion_tokens: int):
+    """
+    Impute les tokens d'un appel au modèle à l'étape en cours (s'il y en a une)
+    """
+    usage = current_step_usage.get()
+    if usage is not None:
+        usage.add(prompt_tokens, completion_tokens)
+
+
+class DurationEstimator:
+    """
+    Enregistre les durées et tokens réels des étapes et en déduit des
+    estimations par outil, par agent spécialisé et par classe de complexité
+
+    Avec path, l'historique est chargé depuis ce fichier JSON à la création
+    et réécrit après chaque tâche, pour survivre aux redémarrages (plusieurs
+    agents d'un même processus partageant le fichier: le dernier écrit l'emporte).
+    """
+
+    # Valeurs par défaut tant que l'historique est insuffisant
+    DEFAULT_STEP_SECONDS = 30
+    DEFAULT_TOOL_EXTRA_SECONDS = {
+        "web_search": 20,
+        "websearch": 20,
+        "code_execution": 20,
+        "codeexecutor": 20
+    }
+    DEFAULT_THINKING_TOKENS = {"prompt": 1500, "completion": 500}
+
+    # Tarifs indicatifs en USD par million de tokens (entrée, sortie)
+    MODEL_PRICES = {
+        "gpt-4o-mini": (0.15, 0.60),
+        "gpt-4o": (2.50, 10.00),
+        "gpt-4-turbo": (10.00, 30.00),
+        "gpt-4": (30.00, 60.00),
+        "gpt-3.5": (0.50, 1.50),
+        "claude-3-opus": (15.00, 75.00),
+        "claude-3-haiku": (0.25, 1.25),
+        "claude-3-5-haiku": (0.80, 4.00),
+        "claude": (3.00, 15.00)
+    }
+
+    def __init__(self, window: int = 500, min_samples: int = 3, path: Optional[str] = None):
+        self.window = window
+        self.min_samples = min_samples
+        self.path = path
+        self._durations: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self.window))
+        self._prompt_tokens: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self.window))
+        self._completion_tokens: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self.window))
+        if path and os.path.exists(path):
+            self.load(path)
+
+    @classmethod
+    def from_settings(cls) -> "DurationEstimator":
+        from config import settings
+        return cls(path=settings.estimator_history_file)
+
+    def to_dict(self) -> Dict[str, Dict[str, List[float]]]:
+        return {
+            "durations": {key: list(values) for key, values in self._durations.items()},
+            "prompt_tokens": {key: list(values) for key, values in self._prompt_tokens.items()},
+            "completion_tokens": {key: list(values) for key, values in self._completion_tokens.items()}
+        }
+
+    def load(self, path: str):
+        """
+        Charge un historique enregistré par save() (fichier illisible: ignoré)
+        """
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️  Historique d'estimation illisible ({path}): {str(e)}")
+            return
+
+        for name, store in (
+            ("durations", self._durations),
+            ("prompt_tokens", self._prompt_tokens),
+            ("completion_tokens", self._completion_tokens)
+        ):
+            for key, values in data.get(name, {}).items():
+                store[key].extend(values)
+        logger.info(f"⏱️  Historique d'estimation chargé: {len(self._durations)} catégories")
+
+    def save(self):
+        """
+        Écrit l'historique dans path (remplacement atomique du fichier)
+        """
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f)
+            os.replace(temporary, self.path)
+        except OSError as e:
+            logger.warning(f"⚠️  Historique d'estimation non enregistré: {str(e)}")
+
+    def _step_kind(self, step: Dict[str, Any]) -> str:
+        """
+        Catégorie d'une étape: nom de l'outil, ou type d'étape sans outil
+        """
+        if step.get("type") in ("map", "batch"):
+            return f"{step['type']}:{step.get('tool') or 'thinking'}"
+        return step.get("tool") or "thinking"
+
+    def _keys(self, kind: str, agent: Optional[str], complexity: Optional[str]) -> List[str]:
+        """
+        Clés de statistiques, de la plus spécifique à la plus générale
+        """
+        keys = []
+        if agent:
+            keys.append(f"{kind}|agent:{agent.lower()}")
+        if complexity:
+            keys.append(f"{kind}|complexity:{complexity}")
+        keys.append(kind)
+        return keys
+
+    def record_step(
+        self,
+        step: Dict[str, Any],
+        duration: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        agent: Optional[str] = None,
+        complexity: Optional[str] = None
+    ):
+        """
+        Enregistre la durée réelle (secondes) et les tokens d'une étape
+        """
+        for key in self._keys(self._step_kind(step), agent, complexity):
+            self._durations[key].append(duration)
+            self._prompt_tokens[key].append(prompt_tokens)
+            self._completion_tokens[key].append(completion_tokens)
+
+    def record_task(
+        self,
+        duration: float,
+        agent: Optional[str] = None,
+        complexity: Optional[str] = None
+    ):
+        """
+        Enregistre la durée totale d'une tâche (et sauvegarde l'historique)
+        """
+        for key in self._keys("task", agent, complexity):
+            self._durations[key].append(duration)
+        self.save()
+
+    @staticmethod
+    def _percentile(values: List[float], percentile: float) -> float:
+        """
+        Percentile par interpolation linéaire
+        """
+        ordered = sorted(values)
+        if not ordered:
+            return 0.0
+        rank = (len(ordered) - 1) * percentile / 100
+        lower = int(rank)
+        upper = min(lower + 1, len(ordered) - 1)
+        return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+    def percentiles(self, key: str) -> Dict[str, float]:
+        """
+        Statistiques de durée pour une clé (p50, p90, p95, moyenne)
+        """
+        values = list(self._durations.get(key, []))
+        if not values:
+            return {"count": 0}
+        return {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "p50": self._percentile(values, 50),
+            "p90": self._percentile(values, 90),
+            "p95": self._percentile(values, 95)
+        }
+
+    def _lookup(self, store: Dict[str, deque], keys: List[str]) -> Optional[List[float]]:
+        """
+        Retourne l'historique de la clé la plus spécifique suffisamment fournie
+        """
+        for key in keys:
+            values = store.get(key)
+            if values is not None and len(values) >= self.min_samples:
+                return list(values)
+        return None
+
+    def estimate_step(
+        self,
+        step: Dict[str, Any],
+        agent: Optional[str] = None,
+        complexity: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Estime la durée et les tokens d'une étape
+        """
+        kind = self._step_kind(step)
+        keys = self._keys(kind, agent, complexity)
+        durations = self._lookup(self._durations, keys)
+
+        if durations is not None:
+            duration = self._percentile(durations, 50)
+            duration_p90 = self._percentile(durations, 90)
+            source = "history"
+        else:
+            duration = self.DEFAULT_STEP_SECONDS + self.DEFAULT_TOOL_EXTRA_SECONDS.get(step.get("tool"), 0)
+            duration_p90 = duration * 2
+            source = "default"
+
+        prompt_tokens = self._lookup(self._prompt_tokens, keys)
+        completion_tokens = self._lookup(self._completion_tokens, keys)
+        if prompt_tokens is not None and completion_tokens is not None:
+            tokens = {
+                "prompt": self._percentile(prompt_tokens, 50),
+                "completion": self._percentile(completion_tokens, 50)
+            }
+        elif step.get("tool") and step.get("type") != "map":
+            tokens = {"prompt": 0, "completion": 0}
+        else:
+            tokens = dict(self.DEFAULT_THINKING_TOKENS)
+
+        return {
+            "duration": duration,
+            "duration_p90": duration_p90,
+            "tokens": tokens,
+            "source": source
+        }
+
+    def estimate_plan(
+        self,
+        steps: List[Dict[str, Any]],
+        agent: Optional[str] = None,
+        complexity: Optional[str] = None,
+        model: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Estime la durée (p50 et p90) et le coût d'un plan
+        """
+        duration = 0.0
+        duration_p90 = 0.0
+        prompt_tokens = 0.0
+        completion_tokens = 0.0
+        from_history = 0
+
+        for step in steps:
+            estimate = self.estimate_step(step, agent, complexity)
+            duration += estimate["duration"]
+            duration_p90 += estimate["duration_p90"]
+            prompt_tokens += estimate["tokens"]["prompt"]
+            completion_tokens += estimate["tokens"]["completion"]
+            from_history += estimate["source"] == "history"
+
+        return {
+            "duration": int(round(duration)),
+            "duration_p90": int(round(duration_p90)),
+            "prompt_tokens": int(prompt_tokens),
+            "completion_tokens": int(completion_tokens),
+            "cost_usd": round(self.estimate_cost(prompt_tokens, completion_tokens, model), 4),
+            "confidence": from_history / len(steps) if steps else 0.0
+        }
+
+    def estimate_cost(self, prompt_tokens: float, completion_tokens: float, model: Optional[str]) -> float:
+        """
+        Coût en USD pour un nombre de tokens donné
+        """
+        prices = self.get_prices(model)
+        if prices is None:
+            return 0.0
+        input_price, output_price = prices
+        return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+    def get_prices(self, model: Optional[str]) -> Optional[Tuple[float, float]]:
+        """
+        Tarif du modèle (préfixe le plus long correspondant)
+        """
+        if not model:
+            return None
+        matches = [prefix for prefix in self.MODEL_PRICES if model.startswith(prefix)]
+        if not matches:
+            return None
+        return self.MODEL_PRICES[max(matches, key=len)]
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Statistiques de durée pour toutes les clés enregistrées
+        """
+        return {key: self.percentiles(key) for key in self._durations}
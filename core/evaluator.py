@@ -0,0 +1,171 @@
+"""
+Évaluation des critères de succès pendant l'exécution
+"""
+
+import logging
+import re
+from typing import Dict, List, Any, Set
+
+from .context import StepContextBuilder, compact_json
+from .references import find_references
+from .schemas import parse_json
+
+logger = logging.getLogger(__name__)
+
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Mots trop génériques pour caractériser un critère
+_STOPWORDS = {
+    "avec", "dans", "pour", "sont", "être", "cette", "celui", "celle", "chaque", "tous",
+    "toutes", "plus", "moins", "leur", "leurs", "elle", "elles", "nous", "vous", "mais",
+    "ainsi", "donc", "afin", "entre", "sans", "sous", "vers", "comme", "tâche", "résultat",
+    "résultats", "doit", "doivent", "bien", "avoir", "fait", "faire", "est", "une", "des",
+    "that", "with", "from", "this", "these", "those", "have", "must", "should", "been",
+    "being", "into", "each", "task", "result", "results", "will", "their", "there", "which"
+}
+
+
+class SuccessEvaluator:
+    """
+    Vérifie si les résultats accumulés satisfont déjà les critères de succès
+    de l'analyse (success_criteria), afin d'arrêter les étapes restantes
+
+    Les critères sont d'abord filtrés par règles (mots-clés du critère
+    présents comme mots entiers dans les sorties); l'arrêt n'est décidé que
+    si le modèle confirme, et seulement quand les règles sont presque
+    satisfaites. La dernière étape du plan, qui produit la réponse, n'est
+    jamais sautée.
+    """
+
+    # Étapes restantes qui ne doivent jamais être sautées
+    SIDE_EFFECT_TOOLS = {"codeexecutor"}
+    SIDE_EFFECT_FILE_OPERATIONS = {"write", "delete"}
+
+    def __init__(
+        self,
+        agent=None,
+        keyword_ratio: float = 0.75,
+        use_model: bool = True,
+        max_model_checks: int = 1
+    ):
+        self.agent = agent
+        self.keyword_ratio = keyword_ratio
+        self.use_model = use_model
+        self.max_model_checks = max_model_checks
+        self.context_builder = StepContextBuilder(max_output_chars=800)
+
+    def _keywords(self, criterion: str) -> List[str]:
+        words = _WORD_PATTERN.findall(criterion.lower())
+        return [word for word in words if (len(word) >= 4 or word.isdigit()) and word not in _STOPWORDS]
+
+    def _criterion_met(self, criterion: str, words: Set[str]) -> bool:
+        keywords = self._keywords(criterion)
+        if not keywords:
+            return False
+        found = sum(1 for keyword in keywords if keyword in words)
+        return found / len(keywords) >= self.keyword_ratio
+
+    def _has_side_effects(self, step: Dict[str, Any]) -> bool:
+        """
+        Une étape dont l'exécution compte en elle-même (écriture, code)
+        """
+        members = step.get("batch") or [step]
+        for member in members:
+            tool_name = str(member.get("tool") or "").lower().replace("tool", "")
+            if tool_name in self.SIDE_EFFECT_TOOLS:
+                return True
+            if tool_name == "fileoperations":
+                operation = member.get("inputs", {}).get("operation")
+                if operation in self.SIDE_EFFECT_FILE_OPERATIONS:
+                    return True
+        return False
+
+    async def evaluate(
+        self,
+        plan: Dict[str, Any],
+        results: List[Dict[str, Any]],
+        remaining_steps: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Retourne {"satisfied": bool, "met": [...], "unmet": [...], "method": ...}
+
+        remaining_steps inclut la dernière étape du plan: seules les étapes
+        qui la précèdent peuvent être sautées.
+        """
+        criteria = [
+            str(criterion) for criterion in plan.get("analysis", {}).get("success_criteria", [])
+            if str(criterion).strip()
+        ]
+        evaluation = {"satisfied": False, "met": [], "unmet": criteria, "method": "rules"}
+
+        skippable = remaining_steps[:-1]
+        if not criteria or not skippable:
+            return evaluation
+        if any(self._has_side_effects(step) for step in skippable):
+            return evaluation
+        # La dernière étape ne peut pas s'appuyer sur une étape sautée
+        skipped_ids = {step["id"] for step in skippable}
+        if any(ref in skipped_ids for ref in find_references(remaining_steps[-1].get("inputs", {}))):
+            return evaluation
+
+        words: Set[str] = set()
+        for result in results:
+            if result.get("success"):
+                words.update(_WORD_PATTERN.findall(compact_json(result.get("output")).lower()))
+        met = [criterion for criterion in criteria if self._criterion_met(criterion, words)]
+        unmet = [criterion for criterion in criteria if criterion not in met]
+        evaluation.update({"met": met, "unmet": unmet})
+
+        # Les règles ne font que filtrer: seul le modèle confirme l'arrêt
+        if not self._should_ask_model(plan, met, criteria):
+            return evaluation
+
+        return await self._evaluate_with_model(plan, results, criteria, evaluation)
+
+    def _should_ask_model(self, plan: Dict[str, Any], met: List[str], criteria: List[str]) -> bool:
+        if not self.use_model or self.agent is None:
+            return False
+        if plan.get("evaluation_checks", 0) >= self.max_model_checks:
+            return False
+        # Inutile de payer un appel quand la plupart des critères manquent
+        return len(met) * 2 >= len(criteria)
+
+    async def _evaluate_with_model(
+        self,
+        plan: Dict[str, Any],
+        results: List[Dict[str, Any]],
+        criteria: List[str],
+        evaluation: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Demande au modèle si les critères non vérifiés par règles sont atteints
+        """
+        plan["evaluation_checks"] = plan.get("evaluation_checks", 0) + 1
+        outputs = {
+            result["step_id"]: self.context_builder.reduce_output(result.get("output"))
+            for result in results if result.get("success")
+        }
+
+        budget = self.agent.budget
+        prompt = f"""Tâche: {plan.get('task', '')}
+
+Critères de succès:
+{compact_json(criteria)}
+
+Résultats obtenus:
+{budget.truncate(self.context_builder.format_results(outputs), budget.share(0.5, "evaluation"))}
+
+Les critères de succès sont-ils tous déjà satisfaits par ces résultats?
+Réponds uniquement en JSON: {{"satisfied": true|false, "unmet": ["critère non satisfait"]}}
+"""
+
+        try:
+            response = await self.agent.think(prompt, schema="evaluation")
+        except Exception as e:
+            logger.debug(f"Évaluation par le modèle impossible: {str(e)}")
+            return evaluation
+        data = parse_json(response, "evaluation", expect=dict)
+
+        if isinstance(data, dict) and data.get("satisfied") is True:
+            evaluation.update({"satisfied": True, "met": criteria, "unmet": [], "method": "model"})
+        return evaluation
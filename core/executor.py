@@ -3,11 +3,19 @@ Moteur d'Exécution des Tâches
 """
 
 import asyncio
+import os
 import logging
+import time
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
 from tools import ToolRegistry
+from .references import ResultIndex, find_references, resolve_reference, resolve_value
+from .fanout import FanOutRunner
+from .context import StepContextBuilder, compact_json
+from .estimator import StepUsage, current_step_usage
+from .evaluator import SuccessEvaluator
+from .schemas import parse_json
 
 logger = logging.getLogger(__name__)
 
@@ -17,26 +25,42 @@ class TaskExecutor:
     Exécute les plans de tâches créés par le planificateur
     """
     
-    def __init__(self, agent):
+    # Outils sans effet de bord, exécutables avant la fin de la planification
+    SPECULATIVE_TOOLS = {"websearch", "calculator", "fileoperations"}
+    SPECULATIVE_FILE_OPERATIONS = {"read", "list"}
+    # Outils qui peuvent modifier des fichiers à un chemin inconnu
+    FILE_WRITING_TOOLS = {"codeexecutor"}
+    
+    def __init__(self, agent, max_replans: int = 2):
         self.agent = agent
+        self.max_replans = max_replans
         self.tool_registry = ToolRegistry()
+        self.fan_out = FanOutRunner(self)
+        self.context_builder = StepContextBuilder()
+        self.evaluator = SuccessEvaluator(agent)
         self.execution_history = []
         self.current_execution = None
+        self._speculative: Dict[str, asyncio.Task] = {}
+        # Chemins lus par les exécutions anticipées, écrits par les étapes du plan
+        # (None: chemin inconnu, tous les fichiers sont concernés)
+        self._speculative_paths: Dict[str, str] = {}
+        self._written_paths: List[Optional[str]] = []
     
     async def execute_plan(self, plan: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         Exécute un plan complet
         
+        En cas d'échec définitif d'une étape, seule la partie du plan qui en
+        dépend est replanifiée; le plan est mis à jour sur place et les
+        résultats déjà obtenus sont conservés.
+        
         Args:
             plan: Le plan à exécuter
             
         Returns:
             Liste des résultats pour chaque étape
         """
-        steps = plan["steps"]
-        dependencies = plan.get("dependencies", {})
-        
-        logger.info(f"⚙️  Démarrage de l'exécution de {len(steps)} étapes")
+        logger.info(f"⚙️  Démarrage de l'exécution de {len(plan['steps'])} étapes")
         
         self.current_execution = {
             "plan_id": plan.get("created_at"),
@@ -44,47 +68,84 @@ class TaskExecutor:
             "status": "running"
         }
         
-        results = []
+        results = ResultIndex()
         completed_steps = set()
+        skipped_steps = set()
+        replans = 0
+        position = 0
         
         try:
-            # Exécuter les étapes dans l'ordre
-            for step in steps:
+            # Exécuter les étapes dans l'ordre (la liste peut changer après replanification)
+            while position < len(plan["steps"]):
+                step = plan["steps"][position]
+                position += 1
                 step_id = step["id"]
                 
                 # Vérifier les dépendances
-                deps = dependencies.get(step_id, [])
-                if not all(dep in completed_steps for dep in deps):
+                deps = plan.get("dependencies", {}).get(step_id, [])
+                if not all(dep in completed_steps or dep in skipped_steps for dep in deps):
                     logger.warning(f"⚠️  Dépendances non satisfaites pour {step_id}")
                     continue
+                # Étape finale après un arrêt anticipé: s'appuyer sur les résultats obtenus
+                if any(dep in skipped_steps for dep in deps):
+                    deps = [dep for dep in deps if dep not in skipped_steps] + [
+                        result["step_id"] for result in results
+                        if result["step_id"] in completed_steps and result["step_id"] not in deps
+                    ]
                 
                 # Exécuter l'étape
                 logger.info(f"  📌 Exécution: {step['description']}")
-                step_result = await self._execute_step(step, results)
+                step_result = await self._take_speculative(step)
+                if step_result is None:
+                    step_result = await self._execute_step(step, results, deps)
                 
                 results.append(step_result)
                 
+                # Tenter à nouveau les étapes obligatoires
+                while (
+                    not step_result["success"]
+                    and not step.get("optional", False)
+                    and step.get("retries", 0) < step.get("max_retries", 0)
+                ):
+                    logger.error(f"  ❌ Étape {step_id} échouée: {step_result.get('error')}")
+                    step["retries"] = step.get("retries", 0) + 1
+                    logger.info(f"  🔄 Nouvelle tentative {step['retries']}/{step['max_retries']}")
+                    step_result = await self._execute_step(step, results, deps)
+                    results[-1] = step_result
+                
                 if step_result["success"]:
                     completed_steps.add(step_id)
+                    self._record_batch_members(step, step_result, results, completed_steps)
+                    self._record_step_stats(plan, step, step_result)
                     logger.info(f"  ✅ Étape {step_id} complétée")
-                else:
-                    logger.error(f"  ❌ Étape {step_id} échouée: {step_result.get('error')}")
                     
-                    # Décider si on continue ou on arrête
-                    if not step.get("optional", False):
-                        # Tenter une nouvelle fois
-                        if step["retries"] < step["max_retries"]:
-                            step["retries"] += 1
-                            logger.info(f"  🔄 Nouvelle tentative {step['retries']}/{step['max_retries']}")
-                            # Re-exécuter
-                            step_result = await self._execute_step(step, results)
-                            results[-1] = step_result
-                            
-                            if step_result["success"]:
-                                completed_steps.add(step_id)
-                        else:
-                            logger.error(f"  ⛔ Nombre maximum de tentatives atteint")
-                            break
+                    # Critères de succès déjà atteints: passer directement à la
+                    # dernière étape, qui produit la réponse
+                    remaining = plan["steps"][position:]
+                    evaluation = await self.evaluator.evaluate(plan, results, remaining)
+                    if evaluation["satisfied"]:
+                        skipped_steps.update(self._stop_early(plan, step_id, remaining[:-1], evaluation))
+                        position = len(plan["steps"]) - 1
+                    continue
+                
+                logger.error(f"  ❌ Étape {step_id} échouée: {step_result.get('error')}")
+                
+                if step.get("optional", False):
+                    continue
+                
+                # Échec définitif: replanifier uniquement la partie dépendante
+                if replans < self.max_replans:
+                    new_plan = await self.agent.planner.replan(
+                        plan, step, step_result.get("error", ""), results
+                    )
+                    if new_plan.get("replanned"):
+                        replans += 1
+                        plan.update(new_plan)
+                        position = plan["replan_history"][-1]["position"]
+                        continue
+                
+                logger.error(f"  ⛔ Nombre maximum de tentatives atteint")
+                break
             
             self.current_execution["status"] = "completed"
             self.current_execution["end_time"] = datetime.now()
@@ -99,11 +160,150 @@ class TaskExecutor:
             raise
         finally:
             self.current_execution = None
+            self.cancel_speculative()
+    
+    def _stop_early(
+        self,
+        plan: Dict[str, Any],
+        step_id: str,
+        remaining: List[Dict[str, Any]],
+        evaluation: Dict[str, Any]
+    ) -> List[str]:
+        """
+        Marque les étapes sautées et retourne leurs identifiants
+        """
+        for step in remaining:
+            step["status"] = "skipped"
+        plan["early_stop"] = {
+            "after_step": step_id,
+            "skipped": [step["id"] for step in remaining],
+            "criteria": evaluation["met"],
+            "method": evaluation["method"]
+        }
+        logger.info(f"  🏁 Critères de succès atteints, {len(remaining)} étape(s) sautée(s)")
+        return plan["early_stop"]["skipped"]
+    
+    def _speculation_key(self, step: Dict[str, Any]) -> str:
+        tool_name = str(step.get("tool", "")).lower().replace("tool", "")
+        return f"{tool_name}|{compact_json(step.get('inputs', {}))}"
+    
+    def _is_speculable(self, step: Dict[str, Any]) -> bool:
+        """
+        Une étape outil sans effet de bord dont les inputs ne référencent
+        aucun résultat précédent: son résultat ne dépend pas des autres étapes
+        """
+        tool_name = str(step.get("tool") or "").lower().replace("tool", "")
+        if tool_name not in self.SPECULATIVE_TOOLS or step.get("type", "single") != "single":
+            return False
+        inputs = step.get("inputs", {})
+        if not isinstance(inputs, dict) or find_references(inputs):
+            return False
+        if tool_name == "fileoperations":
+            return inputs.get("operation") in self.SPECULATIVE_FILE_OPERATIONS
+        return True
+    
+    def _paths_overlap(self, left: Optional[str], right: Optional[str]) -> bool:
+        """
+        Deux chemins désignent le même fichier, ou l'un contient l'autre
+        """
+        if left is None or right is None:
+            return True
+        left, right = os.path.normpath(left), os.path.normpath(right)
+        return (
+            left == right
+            or left == "."
+            or right == "."
+            or right.startswith(left + os.sep)
+            or left.startswith(right + os.sep)
+        )
+    
+    def _track_file_writes(self, step: Dict[str, Any]):
+        """
+        Enregistre le chemin modifié par une étape du plan et abandonne les
+        lectures anticipées de ce chemin
+        """
+        tool_name = str(step.get("tool") or "").lower().replace("tool", "")
+        inputs = step.get("inputs", {}) if isinstance(step.get("inputs"), dict) else {}
+        if tool_name in self.FILE_WRITING_TOOLS:
+            path = None
+        elif tool_name == "fileoperations" and inputs.get("operation") not in self.SPECULATIVE_FILE_OPERATIONS:
+            path = inputs.get("path")
+            if not isinstance(path, str) or find_references(path) or step.get("type", "single") != "single":
+                path = None
+        else:
+            return
+        
+        self._written_paths.append(path)
+        for key, read_path in list(self._speculative_paths.items()):
+            if self._paths_overlap(path, read_path):
+                self._speculative.pop(key).cancel()
+                del self._speculative_paths[key]
+                logger.info(f"  🏎️  Lecture anticipée abandonnée: {read_path} est modifié par {step['id']}")
+    
+    def speculate(self, step: Dict[str, Any]) -> bool:
+        """
+        Démarre une étape pendant que la planification se poursuit
+        
+        Le résultat est utilisé quand le plan atteint une étape identique
+        (même outil, mêmes inputs); il est abandonné sinon. Une lecture de
+        fichier n'est anticipée que si aucune étape du plan ne modifie ce chemin.
+        """
+        self._track_file_writes(step)
+        if not self._is_speculable(step):
+            return False
+        key = self._speculation_key(step)
+        if key in self._speculative:
+            return False
+        
+        path = None
+        if str(step.get("tool")).lower().replace("tool", "") == "fileoperations":
+            path = step["inputs"].get("path", ".")
+            if any(self._paths_overlap(written, path) for written in self._written_paths):
+                return False
+            self._speculative_paths[key] = path
+        
+        self._speculative[key] = asyncio.create_task(self._execute_step(dict(step), []))
+        logger.info(f"  🏎️  Démarrage anticipé: {step['id']}")
+        return True
+    
+    async def _take_speculative(self, step: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Retourne le résultat de l'exécution anticipée de l'étape (ou None)
+        """
+        if not self._speculative or step.get("type", "single") != "single":
+            return None
+        key = self._speculation_key(step)
+        task = self._speculative.pop(key, None)
+        self._speculative_paths.pop(key, None)
+        if task is None:
+            return None
+        
+        step_result = await task
+        # Un échec anticipé (y compris signalé par l'outil) est rejoué normalement
+        output = step_result.get("output")
+        if not step_result["success"] or (isinstance(output, dict) and output.get("success") is False):
+            return None
+        
+        step_result["step_id"] = step["id"]
+        step_result["description"] = step["description"]
+        step_result["speculative"] = True
+        return step_result
+    
+    def cancel_speculative(self):
+        """
+        Abandonne les exécutions anticipées non utilisées
+        """
+        for task in self._speculative.values():
+            task.cancel()
+        self._speculative.clear()
+        self._speculative_paths.clear()
+        self._written_paths.clear()
     
     async def _execute_step(
         self,
         step: Dict[str, Any],
-        previous_results: List[Dict[str, Any]]
+        previous_results: List[Dict[str, Any]],
+        dependencies: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """
         Exécute une étape individuelle
@@ -111,6 +311,7 @@ class TaskExecutor:
         Args:
             step: L'étape à exécuter
             previous_results: Résultats des étapes précédentes
+            dependencies: Étapes dont celle-ci dépend
             
         Returns:
             Résultat de l'exécution
@@ -126,9 +327,20 @@ class TaskExecutor:
             "success": False
         }
         
+        # Mesurer la durée et les tokens consommés par l'étape
+        usage = StepUsage(step_id)
+        usage_token = current_step_usage.set(usage)
+        started = time.perf_counter()
+        
         try:
+            # Étape map: appliquer l'outil ou le prompt sur chaque élément
+            if step.get("type") == "map":
+                result["output"] = await self.fan_out.run(step, previous_results)
+            # Étapes de réflexion regroupées par l'optimiseur: un seul appel
+            elif step.get("type") == "batch":
+                result["output"] = await self._execute_batch(step, previous_results, dependencies)
             # Si un outil est spécifié, l'utiliser
-            if tool_name:
+            elif tool_name:
                 result["output"] = await self._execute_with_tool(
                     tool_name,
                     step["inputs"],
@@ -138,7 +350,8 @@ class TaskExecutor:
                 # Sinon, demander à l'agent de réfléchir
                 result["output"] = await self._execute_with_thinking(
                     step,
-                    previous_results
+                    previous_results,
+                    dependencies
                 )
             
             result["success"] = True
@@ -149,6 +362,14 @@ class TaskExecutor:
             result["success"] = False
             result["error"] = str(e)
             result["end_time"] = datetime.now().isoformat()
+        finally:
+            current_step_usage.reset(usage_token)
+        
+        result["duration"] = time.perf_counter() - started
+        result["tokens"] = {
+            "prompt": usage.prompt_tokens,
+            "completion": usage.completion_tokens
+        }
         
         return result
     
@@ -177,32 +398,165 @@ class TaskExecutor:
     async def _execute_with_thinking(
         self,
         step: Dict[str, Any],
-        previous_results: List[Dict[str, Any]]
+        previous_results: List[Dict[str, Any]],
+        dependencies: Optional[List[str]] = None
     ) -> str:
         """
         Exécute une étape en faisant réfléchir l'agent
+        
+        Seules les sorties des étapes référencées ou dont l'étape dépend
+        sont transmises, réduites si elles sont volumineuses.
         """
+        relevant_results = self.context_builder.select_results(
+            step,
+            self._as_index(previous_results),
+            dependencies
+        )
+        
         # Construire le contexte
         context = {
-            "step": step,
-            "previous_results": previous_results
+            "step_id": step["id"],
+            "expected_output": step.get("expected_output", "")
         }
         
+        # Les inputs passent avant les résultats précédents si le budget est dépassé
+        inputs_section, results_section = self.agent.budget.fit([
+            (compact_json(step.get('inputs', {})), 1),
+            (self.context_builder.format_results(relevant_results), 2)
+        ], self.agent.budget.share(0.6, "step"))
+        
         prompt = f"""Exécute cette étape:
 
 Description: {step['description']}
 Action: {step['action']}
-Inputs: {step.get('inputs', {})}
+Inputs: {inputs_section}
 
 Résultats précédents:
-{self._format_previous_results(previous_results)}
+{results_section}
 
 Fournis une réponse claire et actionnable.
 """
         
         logger.debug(f"    🧠 Réflexion sur l'étape")
         
-        return await self.agent.think(prompt, context)
+        return await self.agent.think(prompt, context, call_type="step")
+    
+    async def _execute_batch(
+        self,
+        step: Dict[str, Any],
+        previous_results: List[Dict[str, Any]],
+        dependencies: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Exécute plusieurs étapes de réflexion en un seul appel au modèle
+        
+        Retourne {step_id: réponse}. Si la réponse n'est pas exploitable,
+        les étapes sont exécutées une par une.
+        """
+        members = step["batch"]
+        member_ids = [member["id"] for member in members]
+        
+        relevant_results = self.context_builder.select_results(
+            {"id": step["id"], "inputs": [member.get("inputs", {}) for member in members]},
+            self._as_index(previous_results),
+            dependencies
+        )
+        
+        steps_section = "\n".join(
+            f"- {member['id']}: {member['description']} "
+            f"(action: {member['action']}, inputs: {compact_json(member.get('inputs', {}))})"
+            for member in members
+        )
+        
+        steps_section, results_section = self.agent.budget.fit([
+            (steps_section, 1),
+            (self.context_builder.format_results(relevant_results), 2)
+        ], self.agent.budget.share(0.6, "batch"))
+        
+        prompt = f"""Exécute ces étapes indépendantes:
+
+{steps_section}
+
+Résultats précédents:
+{results_section}
+
+Réponds uniquement en JSON, avec une réponse claire et actionnable par étape:
+{compact_json({member_id: "réponse" for member_id in member_ids})}
+"""
+        
+        logger.debug(f"    🧠 Réflexion groupée sur {len(members)} étapes")
+        
+        response = await self.agent.think(prompt, {"step_id": step["id"], "batch": member_ids}, call_type="batch")
+        
+        outputs = parse_json(response, "batch", expect=dict)
+        
+        if isinstance(outputs, dict) and all(member_id in outputs for member_id in member_ids):
+            return {member_id: outputs[member_id] for member_id in member_ids}
+        
+        logger.warning("⚠️  Réponse groupée inexploitable, exécution étape par étape")
+        
+        outputs = {}
+        member_results = ResultIndex(previous_results)
+        member_dependencies = step.get("member_dependencies", {})
+        for member in members:
+            output = await self._execute_with_thinking(
+                member, member_results, member_dependencies.get(member["id"], dependencies)
+            )
+            outputs[member["id"]] = output
+            member_results.append({"step_id": member["id"], "success": True, "output": output})
+        
+        return outputs
+    
+    def _record_step_stats(
+        self,
+        plan: Dict[str, Any],
+        step: Dict[str, Any],
+        step_result: Dict[str, Any]
+    ):
+        """
+        Alimente l'estimateur avec la durée et les tokens réels de l'étape
+        """
+        estimator = getattr(self.agent, "estimator", None)
+        if estimator is None or "duration" not in step_result:
+            return
+        
+        metadata = plan.get("metadata", {})
+        estimator.record_step(
+            step,
+            step_result["duration"],
+            prompt_tokens=step_result["tokens"]["prompt"],
+            completion_tokens=step_result["tokens"]["completion"],
+            agent=metadata.get("agent"),
+            complexity=metadata.get("complexity")
+        )
+    
+    def _record_batch_members(
+        self,
+        step: Dict[str, Any],
+        step_result: Dict[str, Any],
+        results: ResultIndex,
+        completed_steps: set
+    ):
+        """
+        Enregistre un résultat par étape regroupée, pour que les références
+        et dépendances vers ces étapes restent valides
+        """
+        if step.get("type") != "batch":
+            return
+        
+        # Les résultats des membres remplacent le résultat groupé (synthèse)
+        step_result["batch_members"] = [member["id"] for member in step["batch"]]
+        for member in step["batch"]:
+            results.append({
+                "step_id": member["id"],
+                "description": member["description"],
+                "start_time": step_result["start_time"],
+                "end_time": step_result["end_time"],
+                "success": True,
+                "output": step_result["output"].get(member["id"]),
+                "batch_id": step["id"]
+            })
+            completed_steps.add(member["id"])
     
     def _enrich_inputs(
         self,
@@ -212,17 +566,11 @@ Fournis une réponse claire et actionnable.
         """
         Enrichit les inputs avec les résultats précédents
         
-        Résout les références comme {"$ref": "step_1.output"}
+        Résout les références comme {"$ref": "step_1.output"}, y compris
+        dans les listes et dictionnaires imbriqués. Les sorties référencées
+        sont passées par référence, sans copie.
         """
-        enriched = inputs.copy()
-        
-        for key, value in inputs.items():
-            if isinstance(value, dict) and "$ref" in value:
-                # Résoudre la référence
-                ref_path = value["$ref"]
-                enriched[key] = self._resolve_reference(ref_path, previous_results)
-        
-        return enriched
+        return resolve_value(inputs, self._as_index(previous_results))
     
     def _resolve_reference(
         self,
@@ -232,24 +580,18 @@ Fournis une réponse claire et actionnable.
         """
         Résout une référence à un résultat précédent
         
-        Format: "step_id.field.subfield"
+        Format: "step_id.field.subfield", avec index ("results[0]"),
+        jokers ("results[*].url") et préfixe JSONPath optionnel ("$.")
         """
-        parts = ref_path.split(".")
-        step_id = parts[0]
-        
-        # Trouver le résultat correspondant
-        for result in previous_results:
-            if result["step_id"] == step_id:
-                # Naviguer dans les champs
-                value = result
-                for part in parts[1:]:
-                    if isinstance(value, dict):
-                        value = value.get(part)
-                    else:
-                        return None
-                return value
-        
-        return None
+        return resolve_reference(ref_path, self._as_index(previous_results))
+    
+    def _as_index(self, previous_results: List[Dict[str, Any]]) -> ResultIndex:
+        """
+        Garantit un accès indexé par step_id aux résultats précédents
+        """
+        if isinstance(previous_results, ResultIndex):
+            return previous_results
+        return ResultIndex(previous_results)
     
     def _format_previous_results(self, results: List[Dict[str, Any]]) -> str:
         """
@@ -258,13 +600,10 @@ Fournis une réponse claire et actionnable.
         if not results:
             return "Aucun résultat précédent"
         
-        formatted = []
-        for result in results:
-            formatted.append(
-                f"- {result['step_id']}: {result.get('output', 'N/A')[:100]}"
-            )
-        
-        return "\n".join(formatted)
+        return self.context_builder.format_results({
+            result["step_id"]: self.context_builder.reduce_output(result.get("output", "N/A"))
+            for result in results
+        })
     
     def get_execution_status(self) -> Optional[Dict[str, Any]]:
         """
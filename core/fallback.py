@@ -0,0 +1,247 @@
+"""
+Chaîne de modèles de repli et requêtes de couverture (hedging)
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from .batch import current_batch_collector
+from .llm_gateway import SlotTimer, timed_slots
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """
+    Latences récentes des appels réussis par (modèle, type d'appel): une
+    synthèse et une classification n'ont pas la même durée
+    """
+
+    def __init__(self, window: int = 200):
+        self._latencies: Dict[Tuple[str, Optional[str]], Deque[float]] = defaultdict(
+            lambda: deque(maxlen=window)
+        )
+
+    def record(self, model: str, call_type: Optional[str], latency: float):
+        self._latencies[(model, call_type)].append(latency)
+
+    def quantile(
+        self,
+        model: str,
+        call_type: Optional[str],
+        q: float,
+        min_samples: int = 20
+    ) -> Optional[float]:
+        """
+        Quantile q des latences du modèle pour ce type d'appel (None sans
+        assez d'observations)
+        """
+        latencies = self._latencies.get((model, call_type))
+        if not latencies or len(latencies) < min_samples:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def snapshot(self) -> Dict[str, Dict[str, Optional[float]]]:
+        return {
+            f"{model}/{call_type or 'default'}": {
+                "samples": len(latencies),
+                "p50": self.quantile(model, call_type, 0.5, min_samples=1),
+                "p95": self.quantile(model, call_type, 0.95, min_samples=1)
+            }
+            for (model, call_type), latencies in self._latencies.items()
+        }
+
+
+# Partagé par tous les agents du processus
+model_latencies = LatencyTracker()
+
+
+class ModelFallback:
+    """
+    Complétion avec repli sur les modèles suivants de la chaîne (erreur ou
+    délai dépassé) et, si hedging est activé, requête de couverture vers le
+    modèle suivant quand le premier dépasse son p95 observé: la première
+    réponse reçue est retenue, l'autre requête est annulée
+    """
+
+    def __init__(
+        self,
+        agent,
+        models: Optional[List[str]] = None,
+        timeout: float = 120.0,
+        hedging: bool = False,
+        hedge_quantile: float = 0.95,
+        min_samples: int = 20
+    ):
+        self.agent = agent
+        self.models = models or []
+        self.timeout = timeout
+        self.hedging = hedging
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.latencies = model_latencies
+        self.stats = {"fallbacks": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0}
+
+    @classmethod
+    def from_settings(cls, agent) -> "ModelFallback":
+        from config import settings
+        return cls(
+            agent,
+            models=settings.llm_fallback_models,
+            timeout=settings.llm_request_timeout,
+            hedging=settings.llm_hedging
+        )
+
+    def chain(self, model: Optional[str] = None) -> List[str]:
+        """
+        Modèle principal puis modèles de repli dont le client est configuré
+        """
+        primary = model or self.agent.model
+        models = [primary] + [candidate for candidate in self.models if candidate != primary]
+        return [candidate for candidate in models if self.agent.has_client(candidate)]
+
+    async def complete(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        schema: Optional[str] = None,
+        route: Optional[Dict[str, Any]] = None,
+        completion_for: Optional[Callable[[str], Optional[Callable]]] = None
+    ) -> Any:
+        """
+        route: réglages de l'appel (ModelRouter.resolve); seul le modèle
+        change d'une tentative à l'autre
+        completion_for: méthode de complétion par modèle, même signature que
+        celles de l'agent (None: modèle exclu de la chaîne); par défaut
+        agent._completion_for
+        """
+        route = route or self.agent.router.resolve()
+        completion_for = completion_for or self.agent._completion_for
+        models = [model for model in self.chain(route["model"]) if completion_for(model) is not None]
+        if not models:
+            raise ValueError(f"Aucun client configuré pour le modèle {route['model']}")
+
+        tried: List[str] = []
+        last_error: Optional[Exception] = None
+        for candidate in models:
+            if candidate in tried:
+                continue
+            remaining = [other for other in models if other not in tried and other != candidate]
+            alternate = remaining[0] if self.hedging and remaining else None
+            try:
+                return await self._attempt(
+                    candidate, alternate, prompt, system, schema, route, tried, completion_for
+                )
+            except Exception as e:
+                last_error = e
+                if isinstance(e, asyncio.TimeoutError):
+                    self.stats["timeouts"] += 1
+                if any(other not in tried for other in models):
+                    self.stats["fallbacks"] += 1
+                    logger.warning(f"⚠️  Échec de {candidate} ({type(e).__name__}: {str(e)}), repli sur le modèle suivant")
+
+        raise last_error
+
+    async def _attempt(
+        self,
+        model: str,
+        alternate: Optional[str],
+        prompt: str,
+        system: Optional[str],
+        schema: Optional[str],
+        route: Dict[str, Any],
+        tried: List[str],
+        completion_for: Callable[[str], Optional[Callable]]
+    ) -> Any:
+        tried.append(model)
+        # Mode batch: les lots prennent des heures, ni couverture ni délai maximal
+        if current_batch_collector() is not None:
+            return await completion_for(model)(prompt, system, schema, {**route, "model": model})
+
+        delay = None
+        if alternate:
+            delay = self.latencies.quantile(model, route.get("call_type"), self.hedge_quantile, self.min_samples)
+        if delay is None:
+            return await self._timed(model, prompt, system, schema, route, completion_for)
+
+        pending = {asyncio.ensure_future(self._timed(model, prompt, system, schema, route, completion_for))}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return done.pop().result()
+
+            tried.append(alternate)
+            self.stats["hedges"] += 1
+            logger.info(f"🏁 {model} au-delà de son p95 ({delay:.1f}s), requête de couverture vers {alternate}")
+            backup = asyncio.ensure_future(
+                self._timed(alternate, prompt, system, schema, route, completion_for)
+            )
+            pending.add(backup)
+
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _timed(
+        self,
+        model: str,
+        prompt: str,
+        system: Optional[str],
+        schema: Optional[str],
+        route: Dict[str, Any],
+        completion_for: Callable[[str], Optional[Callable]]
+    ) -> Any:
+        """
+        Délai et latence mesurés à partir du créneau obtenu auprès de la
+        passerelle: la file d'attente et les attentes de limite de débit
+        (entre deux reprises) n'en font pas partie
+        """
+        started = time.monotonic()
+        timer = SlotTimer()
+        completion = completion_for(model)
+
+        async def run():
+            with timed_slots(timer):
+                return await completion(prompt, system, schema, {**route, "model": model})
+
+        task = asyncio.ensure_future(run())
+        try:
+            while not task.done():
+                if timer.started is None:
+                    # En attente d'un créneau: pas de délai maximal
+                    waiter = asyncio.ensure_future(timer.wait_acquired())
+                    try:
+                        await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        waiter.cancel()
+                    continue
+                remaining = timer.started + self.timeout - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                await asyncio.wait({task}, timeout=remaining)
+            response = task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+
+        # Fournisseur substitué (sans passerelle): durée totale de l'appel
+        elapsed = timer.elapsed if timer.elapsed is not None else time.monotonic() - started
+        self.latencies.record(model, route.get("call_type"), elapsed)
+        return response
+
+    def get_stats(self) -> Dict[str, object]:
+        return {**self.stats, "chain": self.chain(), "latencies": self.latencies.snapshot()}
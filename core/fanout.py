@@ -0,0 +1,278 @@
+"""
+Étapes de type "map": application d'un outil ou d'un prompt sur une collection
+"""
+
+import asyncio
+import json
+import logging
+from typing import Dict, List, Any, Optional
+
+from .context import compact_json
+from .references import resolve_value
+from .schemas import parse_json
+
+logger = logging.getLogger(__name__)
+
+
+class FanOutRunner:
+    """
+    Exécute les étapes "map" avec concurrence bornée, batching et agrégation
+
+    Schéma d'une étape map:
+    {
+        "id": "step_2",
+        "type": "map",
+        "tool": "websearch",              # ou null pour un prompt
+        "inputs": {"query": "{item}"},    # inputs de l'outil ({item}, {index})
+        "map": {
+            "items": {"$ref": "step_1.output.results"},
+            "item_param": "query",        # optionnel: injecte l'élément dans les inputs
+            "prompt": "Résume {item}",    # pour les étapes sans outil
+            "concurrency": 5,
+            "batch_size": 1,
+            "reduce": "collect"           # collect, concat, count, sum, merge, prompt
+        }
+    }
+    """
+
+    DEFAULT_CONCURRENCY = 5
+    MAX_CONCURRENCY = 20
+    MAX_BATCH_SIZE = 50
+    REDUCERS = ("collect", "concat", "count", "sum", "merge", "prompt")
+
+    def __init__(self, executor):
+        self.executor = executor
+
+    async def run(
+        self,
+        step: Dict[str, Any],
+        previous_results: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Exécute une étape map et retourne le résultat agrégé
+        """
+        spec = step.get("map") or {}
+        index = self.executor._as_index(previous_results)
+
+        items = self._collect_items(resolve_value(spec.get("items", []), index))
+        reducer = spec.get("reduce", "collect")
+        if reducer not in self.REDUCERS:
+            raise ValueError(f"Réduction non supportée: {reducer}")
+
+        concurrency = max(1, min(int(spec.get("concurrency", self.DEFAULT_CONCURRENCY)), self.MAX_CONCURRENCY))
+        batch_size = max(1, min(int(spec.get("batch_size", 1)), self.MAX_BATCH_SIZE))
+        tool_name = step.get("tool")
+
+        logger.info(
+            f"    🗂️  Map sur {len(items)} éléments "
+            f"(concurrence {concurrency}, lots de {batch_size})"
+        )
+
+        batches = [
+            list(range(start, min(start + batch_size, len(items))))
+            for start in range(0, len(items), batch_size)
+        ]
+        semaphore = asyncio.Semaphore(concurrency)
+        outputs: List[Any] = [None] * len(items)
+        errors: List[Dict[str, Any]] = []
+
+        async def run_batch(positions: List[int]):
+            async with semaphore:
+                try:
+                    if tool_name:
+                        batch_outputs = await self._run_tool_batch(
+                            tool_name, step, spec, items, positions, index
+                        )
+                    else:
+                        batch_outputs = await self._run_prompt_batch(step, spec, items, positions)
+                except Exception as e:
+                    batch_outputs = [e] * len(positions)
+
+                for position, output in zip(positions, batch_outputs):
+                    if isinstance(output, Exception):
+                        errors.append({"index": position, "error": str(output)})
+                    else:
+                        outputs[position] = output
+
+        await asyncio.gather(*(run_batch(positions) for positions in batches))
+
+        if items and len(errors) == len(items):
+            raise RuntimeError(f"Tous les éléments ont échoué ({errors[0]['error']})")
+
+        errors.sort(key=lambda error: error["index"])
+        failed = {error["index"] for error in errors}
+        succeeded = [output for position, output in enumerate(outputs) if position not in failed]
+
+        return {
+            "results": outputs,
+            "reduced": await self._reduce(reducer, succeeded, spec, step),
+            "count": len(items),
+            "failed": len(errors),
+            "errors": errors
+        }
+
+    def _collect_items(self, items: Any) -> List[Any]:
+        """
+        Normalise la collection d'entrée en liste
+        """
+        if items is None:
+            return []
+        if isinstance(items, list):
+            return items
+        if isinstance(items, (tuple, set)):
+            return list(items)
+        if isinstance(items, dict):
+            return list(items.values())
+        if isinstance(items, str):
+            return [line.strip() for line in items.splitlines() if line.strip()]
+        raise ValueError(f"Collection map invalide: {type(items).__name__}")
+
+    async def _run_tool_batch(
+        self,
+        tool_name: str,
+        step: Dict[str, Any],
+        spec: Dict[str, Any],
+        items: List[Any],
+        positions: List[int],
+        index
+    ) -> List[Any]:
+        """
+        Applique l'outil sur chaque élément du lot
+        """
+        tool = self.executor.tool_registry.get_tool(tool_name)
+        if not tool:
+            raise ValueError(f"Outil non trouvé: {tool_name}")
+
+        base_inputs = resolve_value(step.get("inputs", {}), index)
+        item_param = spec.get("item_param")
+
+        outputs = []
+        for position in positions:
+            inputs = self._render(base_inputs, items[position], position)
+            if item_param:
+                inputs[item_param] = items[position]
+            try:
+                output = await tool.execute(**inputs)
+            except Exception as e:
+                output = e
+            # Les outils signalent leurs échecs via {"success": False, "error": ...}
+            if isinstance(output, dict) and output.get("success") is False:
+                output = RuntimeError(output.get("error", "Échec de l'outil"))
+            outputs.append(output)
+
+        return outputs
+
+    async def _run_prompt_batch(
+        self,
+        step: Dict[str, Any],
+        spec: Dict[str, Any],
+        items: List[Any],
+        positions: List[int]
+    ) -> List[Any]:
+        """
+        Applique le prompt sur un lot d'éléments en un seul appel au modèle
+        """
+        template = spec.get("prompt") or step.get("description", "")
+
+        if len(positions) == 1:
+            position = positions[0]
+            prompt = self._render(template, items[position], position)
+            return [await self.executor.agent.think(prompt, call_type="step")]
+
+        batch_items = [items[position] for position in positions]
+        prompt = f"""Applique cette instruction à chaque élément de la liste:
+
+Instruction: {template}
+
+Éléments (JSON):
+{json.dumps(batch_items, ensure_ascii=False, default=str)}
+
+Réponds uniquement avec un tableau JSON contenant exactement {len(batch_items)} résultats, dans le même ordre.
+"""
+        response = await self.executor.agent.think(prompt, call_type="batch")
+
+        parsed = parse_json(response, "map_batch", expect=list)
+
+        if isinstance(parsed, list) and len(parsed) == len(positions):
+            return parsed
+
+        error = ValueError("Réponse du lot invalide (tableau JSON attendu)")
+        return [error] * len(positions)
+
+    def _render(self, template: Any, item: Any, position: int) -> Any:
+        """
+        Remplace {item} et {index} dans un template (chaîne ou structure)
+        """
+        if isinstance(template, str):
+            if template == "{item}":
+                return item
+            item_text = item if isinstance(item, str) else json.dumps(item, ensure_ascii=False, default=str)
+            return template.replace("{item}", item_text).replace("{index}", str(position))
+        if isinstance(template, dict):
+            return {key: self._render(value, item, position) for key, value in template.items()}
+        if isinstance(template, list):
+            return [self._render(value, item, position) for value in template]
+        return template
+
+    async def _reduce(
+        self,
+        reducer: str,
+        outputs: List[Any],
+        spec: Dict[str, Any],
+        step: Dict[str, Any]
+    ) -> Any:
+        """
+        Agrège les sorties des éléments réussis
+        """
+        if reducer == "collect":
+            return outputs
+
+        if reducer == "count":
+            return len(outputs)
+
+        if reducer == "concat":
+            if all(isinstance(output, str) for output in outputs):
+                return "\n".join(outputs)
+            flattened = []
+            for output in outputs:
+                if isinstance(output, list):
+                    flattened.extend(output)
+                else:
+                    flattened.append(output)
+            return flattened
+
+        if reducer == "sum":
+            return sum(self._as_number(output) for output in outputs)
+
+        if reducer == "merge":
+            merged: Dict[str, Any] = {}
+            for output in outputs:
+                if isinstance(output, dict):
+                    merged.update(output)
+            return merged
+
+        # reducer == "prompt": agrégation par le modèle
+        reduce_prompt = spec.get("reduce_prompt") or f"Agrège ces résultats: {step.get('description', '')}"
+        budget = self.executor.agent.budget
+        outputs_section = await budget.condense(
+            [compact_json(output) for output in outputs],
+            budget.share(0.6, "step"),
+            f"Résume ces résultats en conservant ce qui est utile pour: {reduce_prompt}"
+        )
+        prompt = f"""{reduce_prompt}
+
+Résultats ({len(outputs)} éléments):
+{outputs_section}
+"""
+        return await self.executor.agent.think(prompt, call_type="step")
+
+    def _as_number(self, value: Any) -> float:
+        """
+        Extrait une valeur numérique (y compris {"result": x} de la calculatrice)
+        """
+        if isinstance(value, dict):
+            value = value.get("result", 0)
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return 0.0
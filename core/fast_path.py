@@ -0,0 +1,241 @@
+"""
+Planification déterministe des tâches triviales (sans appel au modèle)
+"""
+
+import ast
+import logging
+import operator
+import re
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Expression arithmétique: chiffres, opérateurs et parenthèses uniquement
+_EXPRESSION_CHARS = re.compile(r"^[\d\s+\-*/().,^×÷x%]+$")
+_HAS_OPERATOR = re.compile(r"\d\s*[+\-*/^×÷x%]\s*[\d(]")
+
+_ARITHMETIC_LEAD = re.compile(
+    r"^(?:calcule[rz]?|calculate|compute|évalue[rz]?|evaluate|combien (?:font|fait)|"
+    r"what is|what's|quel est le résultat de|résultat de)\s*:?\s*(?P<expression>.+)$",
+    re.IGNORECASE
+)
+
+_CLAUSE_SEPARATOR = re.compile(
+    r"\s*(?:,|;)?\s*\b(?:puis|ensuite|et enfin|and then|then|après)\b\s*|\s*[,;]\s*",
+    re.IGNORECASE
+)
+
+# Au-delà, une "recherche" décrit en général une tâche plus large
+MAX_SEARCH_WORDS = 12
+
+# Conjonction suivie d'un second verbe d'action ("... et rédige un article"):
+# la tâche enchaîne plusieurs actions
+_SECOND_ACTION = re.compile(
+    r"\b(?:et|puis|and|then)\s+(?:(?:les|le|la|l'|en|leur|y|nous)\s*)?"
+    r"(?:rédige[rz]?|écri(?:s|re|vez)|compare[rz]?|résume[rz]?|synthétise[rz]?|analyse[rz]?|"
+    r"tradui(?:s|re|sez)|crée[rz]?|génère|générer|générez|envoie|envoyer|envoyez|calcule[rz]?|"
+    r"fai(?:s|re|tes)|prépare[rz]?|propose[rz]?|présente[rz]?|explique[rz]?|trouve[rz]?|"
+    r"identifie[rz]?|sauvegarde[rz]?|enregistre[rz]?|publie[rz]?|extrai(?:s|re|yez)|"
+    r"write|compare|summari[sz]e|analy[sz]e|translate|create|generate|send|calculate|compute|"
+    r"make|prepare|propose|present|explain|find|identify|rank|save|store|publish|draft|extract|build)\b",
+    re.IGNORECASE
+)
+
+# Opérateurs évalués pour détecter une division par zéro
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_MAX_EXPONENT = 64
+
+# Opérations enchaînées sur le résultat précédent
+_FOLLOW_UPS = [
+    (re.compile(r"^(?:multiplie[rz]?|multiply)(?: (?:le résultat|le tout|it|the result))? (?:par|by) (?P<n>[\d.,]+)$", re.IGNORECASE), "*"),
+    (re.compile(r"^(?:divise[rz]?|divide)(?: (?:le résultat|le tout|it|the result))? (?:par|by) (?P<n>[\d.,]+)$", re.IGNORECASE), "/"),
+    (re.compile(r"^(?:ajoute[rz]?|additionne[rz]?|add) (?P<n>[\d.,]+)(?: (?:au résultat|to it|to the result))?$", re.IGNORECASE), "+"),
+    (re.compile(r"^(?:soustrai[st]|soustraire|retire[rz]?|enlève[rz]?|subtract) (?P<n>[\d.,]+)(?: (?:du résultat|from it|from the result))?$", re.IGNORECASE), "-"),
+    (re.compile(r"^(?:élève[rz]?|mets?|raise)(?: (?:le résultat|le tout|it|the result))? (?:au carré|squared|to the power of 2)$", re.IGNORECASE), "**2"),
+    (re.compile(r"^(?:élève[rz]?|raise)(?: (?:le résultat|le tout|it|the result))? (?:à la puissance|to the power of) (?P<n>[\d.,]+)$", re.IGNORECASE), "**"),
+]
+
+_SEARCH = re.compile(
+    r"^(?:recherche[rz]?|cherche[rz]?|search(?: for)?|look up)"
+    r"(?: (?:sur (?:le )?web|sur internet|on the web|online))?\s*:?\s+(?P<query>[^,;]+?)"
+    r"(?: (?:sur (?:le )?web|sur internet|on the web|online))?$",
+    re.IGNORECASE
+)
+
+_READ_FILE = re.compile(
+    r"^(?:lis|lire|affiche[rz]?|ouvre[rz]?|read|show|open|cat)(?: (?:le|the))? (?:fichier|file) (?P<path>\S+)$",
+    re.IGNORECASE
+)
+
+_LIST_FILES = re.compile(
+    r"^(?:liste[rz]?|list|affiche[rz]?|show)(?: (?:les|the))? (?:fichiers|files)"
+    r"(?: (?:de|du|dans|in|of)(?: (?:le|the))?(?: (?:dossier|répertoire|directory|folder))? (?P<path>\S+))?$",
+    re.IGNORECASE
+)
+
+
+class FastPathPlanner:
+    """
+    Reconnaît les tâches triviales (calcul simple, recherche unique,
+    lecture ou liste de fichiers) et produit directement leurs sous-tâches
+
+    Les noms d'outils sont ceux du ToolRegistry.
+    """
+
+    def match(self, task_description: str) -> Optional[Dict[str, Any]]:
+        """
+        Retourne {"kind": ..., "tool": ..., "subtasks": [...]} ou None
+        """
+        text = " ".join(task_description.split()).rstrip(".!?")
+        if not text:
+            return None
+
+        for matcher in (self._match_arithmetic, self._match_file, self._match_search):
+            matched = matcher(text)
+            if matched:
+                logger.info(f"⚡ Tâche triviale reconnue ({matched['kind']})")
+                return matched
+
+        return None
+
+    def _single(self, kind: str, tool: str, description: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "kind": kind,
+            "tool": tool,
+            "subtasks": [{
+                "id": "step_1",
+                "description": description,
+                "action": kind,
+                "tool": tool,
+                "inputs": inputs,
+                "expected_output": "Réponse directe à la tâche"
+            }]
+        }
+
+    def _normalize_expression(self, expression: str) -> Optional[str]:
+        """
+        Convertit une expression écrite en syntaxe Python (ou None)
+        """
+        expression = expression.strip().lower()
+        if not _EXPRESSION_CHARS.match(expression) or not _HAS_OPERATOR.search(expression):
+            return None
+
+        expression = expression.replace("×", "*").replace("÷", "/").replace("^", "**")
+        expression = re.sub(r"(?<=\d)\s*x\s*(?=\d)", " * ", expression)
+        expression = re.sub(r"(?<=\d),(?=\d)", ".", expression)
+        if "x" in expression or "," in expression:
+            return None
+        # "%" seul après un nombre signifie un pourcentage
+        expression = re.sub(r"(\d+(?:\.\d+)?)\s*%(?!\s*[\d(])", r"(\1/100)", expression)
+        return expression
+
+    def _evaluate(self, node: ast.AST) -> Optional[float]:
+        """
+        Valeur d'un nœud d'expression (None si non évaluable à peu de frais)
+
+        Lève ZeroDivisionError sur une division par zéro.
+        """
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return node.value
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+            operand = self._evaluate(node.operand)
+            if operand is None:
+                return None
+            return -operand if isinstance(node.op, ast.USub) else operand
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+            left, right = self._evaluate(node.left), self._evaluate(node.right)
+            if left is None or right is None:
+                return None
+            if isinstance(node.op, ast.Pow) and abs(right) > _MAX_EXPONENT:
+                return None
+            try:
+                return _BINARY_OPERATORS[type(node.op)](left, right)
+            except OverflowError:
+                return None
+        return None
+
+    def _divides_by_zero(self, expression: str) -> bool:
+        """
+        "1/0" ou "10 / (5 - 5)": le calcul échouerait, la tâche n'est pas triviale
+        """
+        try:
+            self._evaluate(ast.parse(expression, mode="eval").body)
+        except ZeroDivisionError:
+            return True
+        except SyntaxError:
+            return False
+        return False
+
+    def _match_arithmetic(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        "Calcule 15 + 27, puis multiplie le résultat par 3" → "(15 + 27) * 3"
+        """
+        clauses = [clause for clause in _CLAUSE_SEPARATOR.split(text) if clause]
+        if not clauses:
+            return None
+
+        lead = _ARITHMETIC_LEAD.match(clauses[0])
+        first = lead.group("expression") if lead else clauses[0]
+        expression = self._normalize_expression(first.rstrip(" =?"))
+        if expression is None:
+            return None
+
+        for clause in clauses[1:]:
+            for pattern, operator in _FOLLOW_UPS:
+                follow_up = pattern.match(clause.strip())
+                if follow_up:
+                    number = (follow_up.groupdict().get("n") or "").replace(",", ".")
+                    expression = f"({expression}) {operator}{' ' + number if number else ''}"
+                    break
+            else:
+                # Clause non reconnue: la tâche n'est pas triviale
+                return None
+
+        expression = expression.replace(" **2", " ** 2")
+        if self._divides_by_zero(expression):
+            return None
+        return self._single("arithmetic", "calculator", f"Calculer {expression}", {"expression": expression})
+
+    def _match_search(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        "Recherche les dernières tendances en IA" → une recherche web
+        """
+        if _CLAUSE_SEPARATOR.search(text):
+            return None
+        match = _SEARCH.match(text)
+        if not match:
+            return None
+        query = match.group("query").strip()
+        if len(query.split()) > MAX_SEARCH_WORDS or _SECOND_ACTION.search(query):
+            return None
+        return self._single("search", "websearch", f"Rechercher: {query}", {"query": query})
+
+    def _match_file(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        "Lis le fichier notes.txt" / "Liste les fichiers du dossier data"
+        """
+        match = _READ_FILE.match(text)
+        if match:
+            path = match.group("path")
+            return self._single(
+                "file", "fileoperations", f"Lire le fichier {path}",
+                {"operation": "read", "path": path}
+            )
+
+        match = _LIST_FILES.match(text)
+        if match:
+            path = match.group("path") or "."
+            return self._single(
+                "file", "fileoperations", f"Lister les fichiers de {path}",
+                {"operation": "list", "path": path}
+            )
+
+        return None
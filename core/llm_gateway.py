@@ -0,0 +1,682 @@
+"""
+Passerelle des appels LLM: limites de débit, concurrence adaptative et reprises
+"""
+
+import asyncio
+import email.utils
+import logging
+import random
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Codes HTTP signalant une surcharge du fournisseur (529: Anthropic overloaded)
+OVERLOAD_STATUS_CODES = {429, 529}
+
+# Classes de priorité des appels, de la plus urgente à la moins urgente:
+# interactive (/api/think), critical (étapes des tâches), background (lots)
+PRIORITIES = ("interactive", "critical", "background")
+
+# Classe de l'appel en cours: (priorité, client, agent)
+_call_class: ContextVar[Tuple[str, str, str]] = ContextVar(
+    "llm_call_class", default=("critical", "default", "default")
+)
+
+
+@contextmanager
+def llm_call_class(
+    priority: Optional[str] = None,
+    tenant: Optional[str] = None,
+    agent: Optional[str] = None
+) -> Iterator[None]:
+    """
+    Définit la priorité, le client et l'agent des appels LLM faits dans ce
+    bloc (hérités par les tâches asyncio qui y sont créées); les valeurs
+    non fournies sont conservées
+    """
+    current_priority, current_tenant, current_agent = _call_class.get()
+    if priority and priority not in PRIORITIES:
+        logger.warning(f"⚠️  Priorité inconnue '{priority}', conservation de '{current_priority}'")
+        priority = None
+
+    token = _call_class.set((
+        priority or current_priority,
+        tenant or current_tenant,
+        agent or current_agent
+    ))
+    try:
+        yield
+    finally:
+        _call_class.reset(token)
+
+
+def current_call_class() -> Dict[str, str]:
+    priority, tenant, agent = _call_class.get()
+    return {"priority": priority, "tenant": tenant, "agent": agent}
+
+
+class SlotTimer:
+    """
+    Temps passé dans les créneaux de la passerelle, hors file d'attente et
+    attentes de limite de débit (cf. timed_slots)
+    """
+
+    def __init__(self):
+        self.started: Optional[float] = None
+        self.elapsed: Optional[float] = None
+        self._acquired = asyncio.Event()
+
+    def acquired(self):
+        self.started = time.monotonic()
+        self._acquired.set()
+
+    def released(self):
+        if self.started is not None:
+            self.elapsed = time.monotonic() - self.started
+        self.started = None
+        self._acquired.clear()
+
+    async def wait_acquired(self):
+        await self._acquired.wait()
+
+
+_slot_timer: ContextVar[Optional[SlotTimer]] = ContextVar("llm_slot_timer", default=None)
+
+
+@contextmanager
+def timed_slots(timer: SlotTimer) -> Iterator[SlotTimer]:
+    """
+    Signale au timer chaque créneau obtenu puis libéré par les appels faits
+    dans ce bloc
+    """
+    token = _slot_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _slot_timer.reset(token)
+
+
+class TokenBucket:
+    """
+    Seau à jetons rechargé en continu, de capacité égale au débit par minute
+    (débit nul = illimité)
+    """
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self.tokens = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.per_minute / 60.0)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Secondes à attendre avant de disposer de amount jetons
+        """
+        if not self.per_minute:
+            return 0.0
+        self._refill()
+        # Une demande plus grosse que le seau attend simplement qu'il soit plein
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60.0 / self.per_minute
+
+    def consume(self, amount: float):
+        if not self.per_minute:
+            return
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        """
+        Rend les jetons réservés en trop (amount négatif: consommation sous-estimée)
+        """
+        if not self.per_minute:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class AdaptiveConcurrency:
+    """
+    Limite de concurrence AIMD: augmentation additive (+1 par fenêtre
+    d'appels réussis) tant que la latence reste proche de la meilleure
+    observée, réduction multiplicative sur surcharge (429) ou latence dégradée
+    """
+
+    def __init__(
+        self,
+        initial: int = 8,
+        minimum: int = 1,
+        maximum: int = 64,
+        decrease: float = 0.5,
+        latency_tolerance: float = 2.0,
+        cooldown: float = 1.0
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+        self.baseline: Optional[float] = None
+        self.latency: Optional[float] = None
+        self._last_decrease = 0.0
+
+    @property
+    def current(self) -> int:
+        return max(self.minimum, int(self.limit))
+
+    def on_success(self, latency: float):
+        """
+        latency: latence normalisée de l'appel (voir LLMGateway._normalized_latency)
+        """
+        self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            # Dérive lente pour suivre les changements durables du fournisseur
+            self.baseline += (latency - self.baseline) * 0.01
+
+        if self.latency > self.baseline * self.latency_tolerance:
+            self._reduce(0.9)
+        else:
+            self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+
+    def on_overload(self):
+        self._reduce(self.decrease)
+
+    def _reduce(self, factor: float):
+        # Les 429 arrivent en rafale: une seule réduction par intervalle
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.minimum), self.limit * factor)
+
+
+class _Waiter:
+    __slots__ = ("future", "tokens", "priority", "tenant", "agent", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, tokens: int, priority: str, tenant: str, agent: str):
+        self.future = future
+        self.tokens = tokens
+        self.priority = priority
+        self.tenant = tenant
+        self.agent = agent
+        self.enqueued_at = time.monotonic()
+
+
+class _FairQueue:
+    """
+    File d'une classe de priorité: les clients sont servis à tour de rôle,
+    puis les agents de chaque client, chacun dans l'ordre d'arrivée
+    """
+
+    def __init__(self):
+        self._tenants: "OrderedDict[str, OrderedDict[str, Deque[_Waiter]]]" = OrderedDict()
+
+    def push(self, waiter: _Waiter):
+        agents = self._tenants.setdefault(waiter.tenant, OrderedDict())
+        agents.setdefault(waiter.agent, deque()).append(waiter)
+
+    def peek(self) -> Optional[_Waiter]:
+        for agents in self._tenants.values():
+            for waiters in agents.values():
+                return waiters[0]
+        return None
+
+    def pop(self) -> _Waiter:
+        tenant, agents = next(iter(self._tenants.items()))
+        agent, waiters = next(iter(agents.items()))
+        waiter = waiters.popleft()
+
+        # Tour suivant: cet agent puis ce client passent en fin de file
+        if waiters:
+            agents.move_to_end(agent)
+        else:
+            del agents[agent]
+        if agents:
+            self._tenants.move_to_end(tenant)
+        else:
+            del self._tenants[tenant]
+        return waiter
+
+    def discard(self, waiter: _Waiter):
+        agents = self._tenants.get(waiter.tenant, {})
+        waiters = agents.get(waiter.agent)
+        if not waiters or waiter not in waiters:
+            return
+        waiters.remove(waiter)
+        if not waiters:
+            del agents[waiter.agent]
+        if not agents:
+            del self._tenants[waiter.tenant]
+
+    def __len__(self) -> int:
+        return sum(len(waiters) for agents in self._tenants.values() for waiters in agents.values())
+
+
+class _Lane:
+    """
+    Files d'attente et limites d'un couple (fournisseur, modèle)
+
+    Chaque classe de priorité ne peut occuper qu'une part de la limite de
+    concurrence (shares), ce qui garde des créneaux libres pour les classes
+    plus urgentes; une file background qui attend depuis plus de
+    starvation_timeout est servie comme critical.
+    """
+
+    def __init__(
+        self,
+        key: Tuple[str, str],
+        rpm: int,
+        tpm: int,
+        concurrency: AdaptiveConcurrency,
+        shares: Dict[str, float],
+        starvation_timeout: float
+    ):
+        self.key = key
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = concurrency
+        self.shares = shares
+        self.starvation_timeout = starvation_timeout
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.queues: Dict[str, _FairQueue] = {priority: _FairQueue() for priority in PRIORITIES}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_due = 0.0
+        self._waits: Dict[str, Deque[float]] = {priority: deque(maxlen=500) for priority in PRIORITIES}
+        self.stats = {
+            "requests": 0,
+            "completed": 0,
+            "errors": 0,
+            "rate_limited": 0,
+            "retries": 0,
+            "max_queued": 0
+        }
+
+    def _wait_time(self, tokens: int) -> float:
+        return max(
+            0.0,
+            self.blocked_until - time.monotonic(),
+            self.requests.wait_time(1),
+            self.tokens.wait_time(tokens)
+        )
+
+    def _queued(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    async def acquire(self, tokens: int, priority: str = "critical", tenant: str = "default", agent: str = "default"):
+        """
+        Attend un créneau (concurrence, requêtes/min, tokens/min) selon la
+        priorité et le tour de rôle entre clients et agents
+        """
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), tokens, priority, tenant, agent)
+        self.queues[priority].push(waiter)
+        self.stats["requests"] += 1
+        self.stats["max_queued"] = max(self.stats["max_queued"], self._queued())
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Créneau accordé juste avant l'annulation
+                self.release()
+            else:
+                self.queues[priority].discard(waiter)
+                self._dispatch()
+            raise
+
+        self._waits[priority].append(time.monotonic() - waiter.enqueued_at)
+
+    def release(self):
+        self.in_flight -= 1
+        self._dispatch()
+
+    def block(self, delay: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+    def _cap(self, priority: str) -> int:
+        return max(1, int(self.concurrency.current * self.shares.get(priority, 1.0)))
+
+    def _select(self) -> Optional[_FairQueue]:
+        """
+        File dont la tête doit être servie maintenant (None: aucune, ou la
+        plus urgente des files non vides a atteint sa part de concurrence)
+        """
+        order = list(PRIORITIES)
+        shares = {priority: priority for priority in PRIORITIES}
+        oldest_background = self.queues["background"].peek()
+        if oldest_background and time.monotonic() - oldest_background.enqueued_at > self.starvation_timeout:
+            order = ["interactive", "background", "critical"]
+            shares["background"] = "critical"
+
+        for priority in order:
+            queue = self.queues[priority]
+            if not len(queue):
+                continue
+            # Les classes suivantes ont une part inférieure ou égale: inutile de continuer
+            return queue if self.in_flight < self._cap(shares[priority]) else None
+        return None
+
+    def _dispatch(self):
+        while True:
+            queue = self._select()
+            if queue is None:
+                return
+            waiter = queue.peek()
+            if waiter.future.done():
+                queue.pop()
+                continue
+            wait = self._wait_time(waiter.tokens)
+            if wait > 0:
+                self._schedule(wait)
+                return
+
+            queue.pop()
+            self.requests.consume(1)
+            self.tokens.consume(waiter.tokens)
+            self.in_flight += 1
+            waiter.future.set_result(None)
+
+    def _schedule(self, delay: float):
+        due = time.monotonic() + delay
+        if self._timer is not None and self._timer_due <= due:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer_due = due
+        self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def metrics(self) -> Dict[str, Any]:
+        priorities = {}
+        for priority in PRIORITIES:
+            waits = sorted(self._waits[priority])
+            priorities[priority] = {
+                "queued": len(self.queues[priority]),
+                "concurrency_cap": self._cap(priority),
+                "avg_wait": sum(waits) / len(waits) if waits else 0.0,
+                "p95_wait": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0
+            }
+        return {
+            **self.stats,
+            "queued": self._queued(),
+            "in_flight": self.in_flight,
+            "concurrency_limit": self.concurrency.current,
+            "blocked_for": max(0.0, self.blocked_until - time.monotonic()),
+            "requests_available": self.requests.tokens if self.requests.per_minute else None,
+            "tokens_available": self.tokens.tokens if self.tokens.per_minute else None,
+            "priorities": priorities
+        }
+
+
+class _Ticket:
+    """
+    Créneau accordé à un appel; record() reçoit la réponse ou l'objet usage
+    pour ajuster les tokens/min à la consommation réelle
+    """
+
+    __slots__ = ("estimated_tokens", "usage")
+
+    def __init__(self, estimated_tokens: int):
+        self.estimated_tokens = estimated_tokens
+        self.usage: Optional[Tuple[int, int]] = None
+
+    def record(self, response_or_usage: Any):
+        usage = getattr(response_or_usage, "usage", response_or_usage)
+        if usage is None:
+            return
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        if prompt_tokens is None:
+            prompt_tokens = getattr(usage, "input_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        if completion_tokens is None:
+            completion_tokens = getattr(usage, "output_tokens", None)
+        if isinstance(prompt_tokens, int) and isinstance(completion_tokens, int):
+            self.usage = (prompt_tokens, completion_tokens)
+
+
+class LLMGateway:
+    """
+    Point de passage unique (par processus) des appels aux fournisseurs LLM
+
+    - limites requêtes/min et tokens/min par (fournisseur, modèle), les
+      tokens étant réservés avant l'appel puis ajustés à l'usage réel
+    - concurrence adaptative AIMD pilotée par la latence et les 429
+    - reprises sur surcharge en respectant Retry-After, la file entière
+      étant suspendue pendant ce délai plutôt que chaque appel isolément
+    - ordonnancement par priorité (llm_call_class) avec partage équitable
+      entre clients et agents spécialisés
+    """
+
+    DEFAULT_SHARES = {"interactive": 1.0, "critical": 0.9, "background": 0.5}
+
+    def __init__(
+        self,
+        requests_per_minute: int = 500,
+        tokens_per_minute: int = 200000,
+        limits: Optional[Dict[str, Dict[str, int]]] = None,
+        initial_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_concurrency: int = 64,
+        max_retries: int = 4,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        shares: Optional[Dict[str, float]] = None,
+        starvation_timeout: float = 30.0
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.limits = limits or {}
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.shares = {**self.DEFAULT_SHARES, **(shares or {})}
+        self.starvation_timeout = starvation_timeout
+        self._lanes: Dict[Tuple[str, str], _Lane] = {}
+
+    @classmethod
+    def from_settings(cls, settings) -> "LLMGateway":
+        return cls(
+            requests_per_minute=settings.llm_requests_per_minute,
+            tokens_per_minute=settings.llm_tokens_per_minute,
+            limits=settings.llm_rate_limits,
+            initial_concurrency=settings.llm_initial_concurrency,
+            max_concurrency=settings.llm_max_concurrency,
+            max_retries=settings.llm_max_retries,
+            shares={
+                "critical": settings.llm_critical_share,
+                "background": settings.llm_background_share
+            },
+            starvation_timeout=settings.llm_starvation_timeout
+        )
+
+    def _limits_for(self, model: str) -> Tuple[int, int]:
+        """
+        (requêtes/min, tokens/min) du modèle: entrée de limits au plus long
+        préfixe correspondant, sinon limites par défaut
+        """
+        matches = [prefix for prefix in self.limits if model.startswith(prefix)]
+        if not matches:
+            return self.requests_per_minute, self.tokens_per_minute
+        limit = self.limits[max(matches, key=len)]
+        return (
+            limit.get("rpm", self.requests_per_minute),
+            limit.get("tpm", self.tokens_per_minute)
+        )
+
+    def lane(self, provider: str, model: str) -> _Lane:
+        key = (provider, model)
+        if key not in self._lanes:
+            rpm, tpm = self._limits_for(model)
+            self._lanes[key] = _Lane(
+                key,
+                rpm,
+                tpm,
+                AdaptiveConcurrency(
+                    initial=self.initial_concurrency,
+                    minimum=self.min_concurrency,
+                    maximum=self.max_concurrency
+                ),
+                self.shares,
+                self.starvation_timeout
+            )
+        return self._lanes[key]
+
+    @asynccontextmanager
+    async def slot(self, provider: str, model: str, estimated_tokens: int = 0) -> AsyncIterator[_Ticket]:
+        """
+        Réserve un créneau pour un appel (utilisé tel quel pour le streaming,
+        sans reprise: des fragments ont pu être transmis)
+        """
+        lane = self.lane(provider, model)
+        await lane.acquire(estimated_tokens, *_call_class.get())
+        ticket = _Ticket(estimated_tokens)
+        started = time.monotonic()
+        timer = _slot_timer.get()
+        if timer is not None:
+            timer.acquired()
+
+        try:
+            yield ticket
+        except Exception as e:
+            if is_overload_error(e):
+                lane.stats["rate_limited"] += 1
+                lane.concurrency.on_overload()
+                lane.block(retry_after(e) or self.base_backoff)
+            else:
+                lane.stats["errors"] += 1
+            raise
+        else:
+            lane.stats["completed"] += 1
+            completion_tokens = 0
+            if ticket.usage is not None:
+                completion_tokens = ticket.usage[1]
+                lane.tokens.refund(estimated_tokens - sum(ticket.usage))
+            lane.concurrency.on_success(
+                self._normalized_latency(time.monotonic() - started, completion_tokens)
+            )
+        finally:
+            if timer is not None:
+                timer.released()
+            lane.release()
+
+    async def call(
+        self,
+        provider: str,
+        model: str,
+        request: Callable[[], Awaitable[Any]],
+        estimated_tokens: int = 0
+    ) -> Any:
+        """
+        Exécute request() sous les limites du modèle, avec reprises sur 429/529
+
+        Args:
+            provider: "openai" ou "anthropic"
+            model: Modèle appelé
+            request: Fabrique de l'appel (rappelée à chaque reprise)
+            estimated_tokens: Tokens réservés (prompt + complétion maximale)
+        """
+        lane = self.lane(provider, model)
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.slot(provider, model, estimated_tokens) as ticket:
+                    response = await request()
+                    ticket.record(response)
+                return response
+            except Exception as e:
+                if not is_overload_error(e) or attempt >= self.max_retries:
+                    raise
+                delay = retry_after(e)
+                if delay is None:
+                    delay = min(self.max_backoff, self.base_backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+                lane.block(delay)
+                lane.stats["retries"] += 1
+                logger.warning(
+                    f"⏳ Limite atteinte ({provider}/{model}), nouvelle tentative dans {delay:.1f}s "
+                    f"({attempt + 1}/{self.max_retries})"
+                )
+
+    @staticmethod
+    def _normalized_latency(latency: float, completion_tokens: int) -> float:
+        # La durée d'un appel croît avec la longueur de la réponse: latence par
+        # tranche de 100 tokens générés pour comparer des appels de tailles différentes
+        return latency / max(1.0, completion_tokens / 100)
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Métriques de file et de débit par "fournisseur/modèle"
+        """
+        return {f"{provider}/{model}": lane.metrics() for (provider, model), lane in self._lanes.items()}
+
+
+def is_overload_error(error: Exception) -> bool:
+    """
+    Erreur de limite de débit ou de surcharge du fournisseur
+    """
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status in OVERLOAD_STATUS_CODES
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    Délai demandé par le fournisseur (Retry-After en secondes ou date HTTP,
+    retry-after-ms), None s'il n'est pas indiqué
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_gateway: Optional[LLMGateway] = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    """
+    Passerelle partagée par tous les agents du processus
+    """
+    global _gateway
+    if _gateway is None:
+        from config import settings
+        _gateway = LLMGateway.from_settings(settings)
+    return _gateway
@@ -0,0 +1,297 @@
+"""
+Optimisation des plans avant exécution
+"""
+
+import logging
+import re
+from typing import Dict, List, Any, Optional, Tuple
+
+from .context import compact_json
+from .references import find_references
+
+logger = logging.getLogger(__name__)
+
+# Découpe "$.step_1.output[0]" en ("$.", "step_1", ".output[0]")
+_REF_HEAD = re.compile(r"^(\$\.?)?([^.\[]+)(.*)$", re.DOTALL)
+
+
+class PlanOptimizer:
+    """
+    Réduit le nombre d'appels au modèle nécessaires pour exécuter un plan:
+    - suppression des étapes sans effet (no-op)
+    - déduplication des étapes identiques
+    - regroupement des étapes de réflexion consécutives en un seul appel
+    """
+
+    NOOP_ACTIONS = {"noop", "no-op", "none", "skip", "wait", "rien"}
+
+    def __init__(self, max_batch_size: int = 6):
+        self.max_batch_size = max_batch_size
+
+    def optimize(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Retourne une version optimisée du plan (le plan d'origine n'est pas modifié)
+        """
+        original_steps = plan.get("steps", [])
+        aliases: Dict[str, str] = {}
+
+        steps = self._drop_noops(original_steps, aliases)
+        steps, deduplicated = self._deduplicate(steps, aliases)
+        steps = [self._rewrite_references(step, aliases) for step in steps]
+        dependencies = plan.get("dependencies", {})
+        steps, merged = self._merge_thinking_steps(steps, dependencies, aliases)
+
+        for order, step in enumerate(steps, start=1):
+            step["order"] = order
+
+        optimized = dict(plan)
+        optimized["steps"] = steps
+        optimized["dependencies"] = self._remap_dependencies(dependencies, steps, aliases)
+        optimized["optimization"] = {
+            "original_steps": len(original_steps),
+            "optimized_steps": len(steps),
+            "removed_noops": len(original_steps) - len(steps) - deduplicated - merged,
+            "deduplicated": deduplicated,
+            "merged": merged,
+            "aliases": aliases
+        }
+
+        if len(steps) != len(original_steps):
+            logger.info(f"🪄 Plan optimisé: {len(original_steps)} → {len(steps)} étapes")
+
+        return optimized
+
+    def _is_noop(self, step: Dict[str, Any]) -> bool:
+        """
+        Une étape sans outil dont l'action ou la description est vide de sens
+        """
+        if step.get("tool") or step.get("type", "single") != "single":
+            return False
+        action = str(step.get("action", "")).strip().lower()
+        description = str(step.get("description", "")).strip()
+        return action in self.NOOP_ACTIONS or not description
+
+    def _drop_noops(self, steps: List[Dict[str, Any]], aliases: Dict[str, str]) -> List[Dict[str, Any]]:
+        """
+        Supprime les étapes no-op; leurs références pointent vers l'étape
+        précédente (vers la suivante en tête de plan, sauf si celle-ci
+        référence le no-op, qui est alors conservé)
+        """
+        kept: List[Dict[str, Any]] = []
+        leading: List[Dict[str, Any]] = []
+        for step in steps:
+            if self._is_noop(step):
+                if kept:
+                    aliases[step["id"]] = kept[-1]["id"]
+                else:
+                    leading.append(step)
+                continue
+            if leading:
+                referenced = set(find_references(step.get("inputs", {})) + find_references(step.get("map", {})))
+                for noop in leading:
+                    if noop["id"] in referenced:
+                        kept.append(dict(noop))
+                    else:
+                        aliases[noop["id"]] = step["id"]
+                leading = []
+            kept.append(dict(step))
+        return kept
+
+    def _step_signature(self, step: Dict[str, Any]) -> str:
+        """
+        Signature d'une étape pour la déduplication
+        """
+        return compact_json({
+            "type": step.get("type", "single"),
+            "tool": step.get("tool"),
+            "action": str(step.get("action", "")).strip().lower(),
+            "description": " ".join(str(step.get("description", "")).lower().split()),
+            "inputs": step.get("inputs", {}),
+            "map": step.get("map")
+        })
+
+    def _deduplicate(
+        self,
+        steps: List[Dict[str, Any]],
+        aliases: Dict[str, str]
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Ne garde que la première occurrence d'étapes identiques
+        """
+        seen: Dict[str, str] = {}
+        kept: List[Dict[str, Any]] = []
+        removed = 0
+
+        for step in steps:
+            # Les références déjà réécrites font partie de la signature
+            signature = self._step_signature(self._rewrite_references(step, aliases))
+            if signature in seen:
+                aliases[step["id"]] = seen[signature]
+                removed += 1
+                continue
+            seen[signature] = step["id"]
+            kept.append(step)
+
+        return kept, removed
+
+    def _rewrite_references(self, step: Dict[str, Any], aliases: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Redirige les $ref vers les étapes conservées
+        """
+        if not aliases:
+            return step
+
+        rewritten = dict(step)
+        rewritten["inputs"] = self._rewrite_value(step.get("inputs", {}), aliases)
+        if "map" in step:
+            rewritten["map"] = self._rewrite_value(step["map"], aliases)
+        return rewritten
+
+    def _rewrite_value(self, value: Any, aliases: Dict[str, str]) -> Any:
+        if isinstance(value, dict):
+            if isinstance(value.get("$ref"), str):
+                match = _REF_HEAD.match(value["$ref"].strip())
+                if not match:
+                    return value
+                prefix, step_id, path = match.groups()
+                return {**value, "$ref": f"{prefix or ''}{self._canonical(step_id, aliases)}{path}"}
+            return {key: self._rewrite_value(item, aliases) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._rewrite_value(item, aliases) for item in value]
+        return value
+
+    def _canonical(self, step_id: str, aliases: Dict[str, str]) -> str:
+        """
+        Suit la chaîne d'alias jusqu'à l'étape conservée
+        """
+        visited = set()
+        while step_id in aliases and step_id not in visited:
+            visited.add(step_id)
+            step_id = aliases[step_id]
+        return step_id
+
+    def _is_batchable(self, step: Dict[str, Any]) -> bool:
+        return not step.get("tool") and step.get("type", "single") == "single"
+
+    def _step_dependencies(
+        self,
+        step_id: str,
+        dependencies: Dict[str, List[str]],
+        aliases: Dict[str, str]
+    ) -> List[str]:
+        """
+        Dépendances déclarées d'une étape, redirigées vers les étapes conservées
+        """
+        resolved: List[str] = []
+        for dep in dependencies.get(step_id, []):
+            dep = self._canonical(dep, aliases)
+            if dep != step_id and dep not in resolved:
+                resolved.append(dep)
+        return resolved
+
+    def _merge_thinking_steps(
+        self,
+        steps: List[Dict[str, Any]],
+        dependencies: Dict[str, List[str]],
+        aliases: Dict[str, str]
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Regroupe les étapes de réflexion consécutives et indépendantes
+        en une étape "batch" exécutée en un seul appel au modèle
+        """
+        merged_steps: List[Dict[str, Any]] = []
+        group: List[Dict[str, Any]] = []
+        merged = 0
+
+        def flush():
+            nonlocal merged
+            if len(group) > 1:
+                merged_steps.append(self._make_batch(list(group), dependencies, aliases))
+                merged += len(group) - 1
+            else:
+                merged_steps.extend(group)
+            group.clear()
+
+        for step in steps:
+            if not self._is_batchable(step):
+                flush()
+                merged_steps.append(step)
+                continue
+
+            group_ids = {member["id"] for member in group}
+            # Une étape qui dépend d'un membre du groupe (référence $ref ou
+            # dépendance du plan) a besoin de sa sortie: elle démarre un nouveau groupe
+            depends_on_group = any(
+                dep in group_ids
+                for dep in find_references(step.get("inputs", {}))
+                + self._step_dependencies(step["id"], dependencies, aliases)
+            )
+            if depends_on_group or len(group) >= self.max_batch_size:
+                flush()
+            group.append(step)
+
+        flush()
+        return merged_steps, merged
+
+    def _make_batch(
+        self,
+        group: List[Dict[str, Any]],
+        dependencies: Dict[str, List[str]],
+        aliases: Dict[str, str]
+    ) -> Dict[str, Any]:
+        """
+        Construit l'étape batch regroupant plusieurs étapes de réflexion
+        (les dépendances de chaque membre sont conservées pour l'exécution
+        étape par étape si la réponse groupée est inexploitable)
+        """
+        return {
+            "id": f"{group[0]['id']}__{group[-1]['id']}",
+            "description": " / ".join(step.get("description", "") for step in group),
+            "action": "batch",
+            "tool": None,
+            "inputs": {},
+            "expected_output": "Une réponse par étape regroupée",
+            "type": "batch",
+            "batch": group,
+            "member_dependencies": {
+                step["id"]: self._step_dependencies(step["id"], dependencies, aliases) for step in group
+            },
+            "status": "pending",
+            "retries": 0,
+            "max_retries": max(step.get("max_retries", 3) for step in group)
+        }
+
+    def _remap_dependencies(
+        self,
+        dependencies: Dict[str, List[str]],
+        steps: List[Dict[str, Any]],
+        aliases: Dict[str, str]
+    ) -> Dict[str, List[str]]:
+        """
+        Recalcule les dépendances sur les étapes optimisées
+        """
+        owner: Dict[str, str] = {}
+        for step in steps:
+            owner[step["id"]] = step["id"]
+            for member in step.get("batch", []):
+                owner[member["id"]] = step["id"]
+
+        def resolve(step_id: str) -> Optional[str]:
+            return owner.get(self._canonical(step_id, aliases))
+
+        remapped: Dict[str, List[str]] = {}
+        for step in steps:
+            member_ids = [member["id"] for member in step.get("batch", [])] or [step["id"]]
+            deps: List[str] = []
+            for member_id in member_ids:
+                for dep in dependencies.get(member_id, []):
+                    target = resolve(dep)
+                    # Une dépendance vers une étape supprimée remonte à ses propres dépendances
+                    while target is None and dependencies.get(dep):
+                        dep = dependencies[dep][0]
+                        target = resolve(dep)
+                    if target and target != step["id"] and target not in deps:
+                        deps.append(target)
+            remapped[step["id"]] = deps
+
+        return remapped
@@ -2,27 +2,64 @@
 Système de Planification Intelligent
 """
 
-import json
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from collections import deque
 from datetime import datetime
 
+from .context import StepContextBuilder, compact_json
+from .fast_path import FastPathPlanner
+from .references import ResultIndex, find_references
+from .schemas import parse_json
+from .streaming import SubtaskStreamParser
+from .templates import PlanTemplateStore
+
 logger = logging.getLogger(__name__)
 
+# Format d'une sous-tâche dans les réponses de décomposition
+SUBTASK_FORMAT = """
+        {
+            "id": "step_1",
+            "description": "Description de la sous-tâche",
+            "action": "action spécifique à effectuer",
+            "tool": "outil à utiliser (ou null)",
+            "inputs": {},
+            "depends_on": [],
+            "expected_output": "ce qui devrait être produit"
+        }
+    """
+
+DECOMPOSITION_PRINCIPLES = """Principes:
+- Chaque sous-tâche doit être simple et claire
+- Ordre logique d'exécution
+- Chaque sous-tâche doit avoir un résultat mesurable
+- Pour réutiliser un résultat précédent dans les inputs: {"$ref": "step_1.output.results[0].url"}
+- "depends_on": ids des sous-tâches précédentes dont le résultat est nécessaire
+  ([] si la sous-tâche est indépendante des autres)
+- Pour appliquer la même action à une liste d'éléments, utilise une seule sous-tâche
+  "type": "map" avec "map": {"items": [...] ou {"$ref": "..."}, "prompt": "... {item} ...",
+  "concurrency": 5, "batch_size": 10, "reduce": "collect|concat|count|sum|merge|prompt"}
+  (avec un outil, utilise {item} dans les inputs)
+"""
+
 
 class TaskPlanner:
     """
     Planificateur de tâches hiérarchique avec capacité de raisonnement
     """
     
-    def __init__(self, agent):
+    def __init__(self, agent, history_size: int = 100):
         self.agent = agent
-        self.planning_history = []
+        self.planning_history = deque(maxlen=history_size)
+        self.template_store = PlanTemplateStore()
+        self.fast_path = FastPathPlanner()
     
     async def create_plan(
         self,
         task_description: str,
-        context: Optional[Dict] = None
+        context: Optional[Dict] = None,
+        on_subtask: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        profile: str = "full"
     ) -> Dict[str, Any]:
         """
         Crée un plan d'exécution détaillé pour une tâche
@@ -30,17 +67,36 @@ class TaskPlanner:
         Args:
             task_description: Description de la tâche
             context: Contexte additionnel
+            on_subtask: Appelé avec chaque étape dès qu'elle est lue dans la
+                décomposition en streaming (avant la fin de la planification)
+            profile: "light" pour analyser et décomposer en un seul appel
             
         Returns:
             Plan d'exécution structuré
         """
         logger.info("🧠 Création du plan d'exécution...")
         
-        # Analyser la tâche
-        task_analysis = await self._analyze_task(task_description, context)
+        # Tâches triviales: plan direct sans appel au modèle
+        fast_plan = await self._plan_from_fast_path(task_description, context)
+        if fast_plan:
+            return fast_plan
         
-        # Décomposer en sous-tâches
-        subtasks = await self._decompose_task(task_description, task_analysis)
+        # Réutiliser un plan éprouvé pour une tâche similaire
+        template_plan = self._plan_from_template(task_description, context)
+        if template_plan:
+            return template_plan
+        
+        if profile == "light":
+            # Analyse et décomposition fusionnées
+            task_analysis, subtasks = await self._analyze_and_decompose(
+                task_description, context, on_subtask
+            )
+        else:
+            # Analyser la tâche
+            task_analysis = await self._analyze_task(task_description, context)
+            
+            # Décomposer en sous-tâches
+            subtasks = await self._decompose_task(task_description, task_analysis, on_subtask)
         
         # Créer les étapes d'exécution
         steps = await self._create_execution_steps(subtasks)
@@ -53,20 +109,104 @@ class TaskPlanner:
             "analysis": task_analysis,
             "steps": steps,
             "dependencies": dependencies,
-            "estimated_duration": self._estimate_duration(steps),
             "created_at": datetime.now().isoformat(),
             "metadata": {
                 "complexity": task_analysis.get("complexity", "medium"),
                 "requires_tools": task_analysis.get("requires_tools", []),
-                "risk_level": task_analysis.get("risk_level", "low")
+                "risk_level": task_analysis.get("risk_level", "low"),
+                "agent": (context or {}).get("agent_name"),
+                "profile": profile
             }
         }
+        self.update_estimate(plan)
         
         self.planning_history.append(plan)
         logger.info(f"📋 Plan créé avec {len(steps)} étapes")
         
         return plan
     
+    async def _plan_from_fast_path(
+        self,
+        task_description: str,
+        context: Optional[Dict] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Construit le plan d'une tâche triviale (calcul, recherche ou fichier unique)
+        """
+        match = self.fast_path.match(task_description)
+        if not match:
+            return None
+        
+        steps = await self._create_execution_steps(match["subtasks"])
+        plan = {
+            "task": task_description,
+            "analysis": {
+                "main_objective": task_description,
+                "type": match["kind"],
+                "complexity": "simple",
+                "requires_tools": [match["tool"]],
+                "risk_level": "low"
+            },
+            "steps": steps,
+            "dependencies": self._identify_dependencies(steps),
+            "fast_path": match["kind"],
+            "direct_answer": len(steps) == 1,
+            "created_at": datetime.now().isoformat(),
+            "metadata": {
+                "complexity": "simple",
+                "requires_tools": [match["tool"]],
+                "risk_level": "low",
+                "agent": (context or {}).get("agent_name")
+            }
+        }
+        self.update_estimate(plan)
+        
+        self.planning_history.append(plan)
+        logger.info(f"⚡ Plan direct créé ({match['kind']})")
+        
+        return plan
+    
+    def _plan_from_template(
+        self,
+        task_description: str,
+        context: Optional[Dict] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Construit le plan à partir d'un template similaire (sans appel au modèle)
+        """
+        agent_name = (context or {}).get("agent_name")
+        match = self.template_store.match(task_description, agent_name)
+        if not match:
+            return None
+        
+        plan = {
+            "task": task_description,
+            "analysis": match["analysis"],
+            "steps": match["steps"],
+            "dependencies": match["dependencies"],
+            "template_id": match["template_id"],
+            "created_at": datetime.now().isoformat(),
+            "metadata": {**match["metadata"], "agent": agent_name}
+        }
+        self.update_estimate(plan)
+        
+        self.planning_history.append(plan)
+        logger.info(f"📋 Plan créé depuis un template avec {len(plan['steps'])} étapes")
+        
+        return plan
+    
+    def learn_from_plan(self, plan: Dict[str, Any], results: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Enregistre le plan comme template si toutes ses étapes ont réussi
+        """
+        # Les plans directs sont déjà gratuits: inutile d'en faire des templates
+        if not results or plan.get("fast_path") or plan.get("metadata", {}).get("profile") == "direct":
+            return None
+        latest = {result["step_id"]: result for result in results}
+        if not all(result.get("success") for result in latest.values()):
+            return None
+        return self.template_store.add(plan)
+    
     async def _analyze_task(
         self,
         task_description: str,
@@ -79,7 +219,7 @@ class TaskPlanner:
 
 Tâche: {task_description}
 
-Contexte: {json.dumps(context) if context else "Aucun"}
+Contexte: {self._budgeted(compact_json(context), 0.25, "analysis") if context else "Aucun"}
 
 Fournis une analyse structurée (JSON):
 {{
@@ -93,25 +233,27 @@ Fournis une analyse structurée (JSON):
 }}
 """
         
-        response = await self.agent.think(analysis_prompt)
+        response = await self.agent.think(analysis_prompt, schema="analysis")
         
-        try:
-            return json.loads(response)
-        except:
-            # Fallback en cas d'échec de parsing
-            return {
-                "type": "general",
-                "complexity": "medium",
-                "requires_tools": [],
-                "estimated_steps": 3,
-                "risk_level": "low",
-                "raw_analysis": response
-            }
+        analysis = parse_json(response, "analysis", expect=dict)
+        if analysis is not None:
+            return analysis
+        
+        # Fallback en cas d'échec de parsing
+        return {
+            "type": "general",
+            "complexity": "medium",
+            "requires_tools": [],
+            "estimated_steps": 3,
+            "risk_level": "low",
+            "raw_analysis": response
+        }
     
     async def _decompose_task(
         self,
         task_description: str,
-        analysis: Dict[str, Any]
+        analysis: Dict[str, Any],
+        on_subtask: Optional[Callable[[Dict[str, Any]], Any]] = None
     ) -> List[Dict[str, Any]]:
         """
         Décompose la tâche en sous-tâches gérables
@@ -120,43 +262,129 @@ Fournis une analyse structurée (JSON):
 
 Tâche principale: {task_description}
 
-Analyse: {json.dumps(analysis, indent=2)}
+Analyse: {self._budgeted(compact_json(analysis), 0.2, "decomposition")}
 
 Fournis une décomposition structurée (JSON):
 {{
-    "subtasks": [
-        {{
-            "id": "step_1",
-            "description": "Description de la sous-tâche",
-            "action": "action spécifique à effectuer",
-            "tool": "outil à utiliser (ou null)",
-            "inputs": {{}},
-            "expected_output": "ce qui devrait être produit"
-        }}
-    ]
+    "subtasks": [{SUBTASK_FORMAT}]
 }}
 
-Principes:
-- Chaque sous-tâche doit être simple et claire
-- Ordre logique d'exécution
-- Chaque sous-tâche doit avoir un résultat mesurable
+{DECOMPOSITION_PRINCIPLES}"""
+        
+        _, subtasks = await self._request_subtasks(
+            decomposition_prompt, task_description, on_subtask, schema="decomposition"
+        )
+        return subtasks
+    
+    async def _analyze_and_decompose(
+        self,
+        task_description: str,
+        context: Optional[Dict],
+        on_subtask: Optional[Callable[[Dict[str, Any]], Any]] = None
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Analyse et décompose la tâche en un seul appel au modèle (profil léger)
+        """
+        planning_prompt = f"""Décompose cette tâche en sous-tâches simples et actionnables:
+
+Tâche principale: {task_description}
+
+Contexte: {self._budgeted(compact_json(context), 0.25, "planning") if context else "Aucun"}
+
+Fournis l'analyse et la décomposition (JSON):
+{{
+    "analysis": {{
+        "type": "type de tâche (recherche, analyse, création, etc.)",
+        "complexity": "simple|medium|complex",
+        "requires_tools": ["liste des outils nécessaires"],
+        "risk_level": "low|medium|high",
+        "success_criteria": ["critère 1", "critère 2"]
+    }},
+    "subtasks": [{SUBTASK_FORMAT}]
+}}
+
+{DECOMPOSITION_PRINCIPLES}
+- La dernière sous-tâche doit produire la réponse finale à la tâche
 """
         
-        response = await self.agent.think(decomposition_prompt)
+        data, subtasks = await self._request_subtasks(
+            planning_prompt, task_description, on_subtask, schema="planning"
+        )
+        analysis = data.get("analysis") if isinstance(data.get("analysis"), dict) else {}
+        analysis.setdefault("complexity", "simple")
+        
+        return analysis, subtasks
+    
+    async def _request_subtasks(
+        self,
+        prompt: str,
+        task_description: str,
+        on_subtask: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        schema: str = "decomposition"
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Envoie un prompt de décomposition et retourne (réponse JSON, sous-tâches)
+        
+        Avec on_subtask, la réponse est lue en streaming et chaque étape est
+        transmise dès qu'elle est complète.
+        """
+        streamed: List[Dict[str, Any]] = []
+        if on_subtask is None:
+            response = await self.agent.think(prompt, schema=schema)
+        else:
+            response, streamed = await self._stream_decomposition(prompt, on_subtask, schema)
+        
+        data = parse_json(response, schema, expect=dict)
+        if data is not None and isinstance(data.get("subtasks"), list):
+            return data, data["subtasks"]
+        
+        # Réponse incomplète: garder ce qui a été lu
+        if streamed:
+            return data or {}, streamed
+        
+        # Fallback: créer une sous-tâche simple
+        return data or {}, [{
+            "id": "step_1",
+            "description": task_description,
+            "action": "execute",
+            "tool": None,
+            "inputs": {},
+            "expected_output": "Résultat de la tâche"
+        }]
+    
+    async def _stream_decomposition(
+        self,
+        decomposition_prompt: str,
+        on_subtask: Callable[[Dict[str, Any]], Any],
+        schema: Optional[str] = None
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Lit la décomposition en streaming et transmet chaque étape complétée
+
+        Si le flux s'interrompt, les étapes déjà transmises sont conservées;
+        si aucune ne l'a été, la décomposition est redemandée sans streaming.
+        """
+        parser = SubtaskStreamParser()
         
         try:
-            data = json.loads(response)
-            return data.get("subtasks", [])
-        except:
-            # Fallback: créer une sous-tâche simple
-            return [{
-                "id": "step_1",
-                "description": task_description,
-                "action": "execute",
-                "tool": None,
-                "inputs": {},
-                "expected_output": "Résultat de la tâche"
-            }]
+            async for chunk in self.agent.think_stream(decomposition_prompt, schema=schema):
+                completed = parser.feed(chunk)
+                # Position de chaque sous-tâche dans la décomposition complète
+                first = len(parser.items) - len(completed)
+                for i, subtask in enumerate(completed, start=first):
+                    step = self._build_step(subtask, i)
+                    try:
+                        on_subtask(step)
+                    except Exception as e:
+                        logger.warning(f"⚠️  Étape {step['id']} non transmise: {str(e)}")
+        except Exception as e:
+            if parser.items:
+                logger.warning(f"⚠️  Décomposition interrompue après {len(parser.items)} étape(s): {str(e)}")
+                return parser.text, parser.items
+            logger.warning(f"⚠️  Décomposition en streaming impossible, nouvel essai sans streaming: {str(e)}")
+            return await self.agent.think(decomposition_prompt, schema=schema), []
+        
+        return parser.text, parser.items
     
     async def _create_execution_steps(
         self,
@@ -165,88 +393,266 @@ Principes:
         """
         Crée les étapes d'exécution détaillées à partir des sous-tâches
         """
-        steps = []
-        
-        for i, subtask in enumerate(subtasks):
-            step = {
-                "id": subtask.get("id", f"step_{i+1}"),
-                "order": i + 1,
-                "description": subtask.get("description", ""),
-                "action": subtask.get("action", "execute"),
-                "tool": subtask.get("tool"),
-                "inputs": subtask.get("inputs", {}),
-                "expected_output": subtask.get("expected_output", ""),
-                "status": "pending",
-                "retries": 0,
-                "max_retries": 3
-            }
-            steps.append(step)
+        return [self._build_step(subtask, i) for i, subtask in enumerate(subtasks)]
+    
+    def _budgeted(self, text: str, fraction: float, call_type: str) -> str:
+        """
+        Tronque une section de prompt à sa part du budget de tokens
+        """
+        return self.agent.budget.truncate(text, self.agent.budget.share(fraction, call_type))
+    
+    def _build_step(self, subtask: Dict[str, Any], i: int) -> Dict[str, Any]:
+        """
+        Crée l'étape d'exécution correspondant à la i-ème sous-tâche
+        """
+        step = {
+            "id": subtask.get("id", f"step_{i+1}"),
+            "order": i + 1,
+            "description": subtask.get("description", ""),
+            "action": subtask.get("action", "execute"),
+            "tool": subtask.get("tool"),
+            "inputs": subtask.get("inputs", {}),
+            "expected_output": subtask.get("expected_output", ""),
+            "type": subtask.get("type", "single"),
+            "status": "pending",
+            "retries": 0,
+            "max_retries": 3
+        }
+        if step["type"] == "map":
+            step["map"] = subtask.get("map", {})
+        if isinstance(subtask.get("depends_on"), list):
+            step["depends_on"] = [str(dep) for dep in subtask["depends_on"]]
         
-        return steps
+        return step
     
     def _identify_dependencies(self, steps: List[Dict[str, Any]]) -> Dict[str, List[str]]:
         """
         Identifie les dépendances entre les étapes
         
-        Pour l'instant, assume une exécution séquentielle simple
-        Dans une version avancée, on pourrait analyser les inputs/outputs
+        Une étape dépend des étapes dont elle référence la sortie ($ref dans
+        ses inputs ou sa définition map) et de celles déclarées dans
+        depends_on; sans depends_on, elle dépend aussi de l'étape précédente
+        (exécution séquentielle par défaut). Seules les étapes précédentes
+        sont retenues.
         """
         dependencies = {}
+        previous_ids = set()
         
         for i, step in enumerate(steps):
-            step_id = step["id"]
-            # Chaque étape dépend de la précédente
-            if i > 0:
-                dependencies[step_id] = [steps[i-1]["id"]]
-            else:
-                dependencies[step_id] = []
+            candidates = find_references(step.get("inputs", {})) + find_references(step.get("map", {}))
+            if isinstance(step.get("depends_on"), list):
+                candidates += step["depends_on"]
+            elif i > 0:
+                candidates.append(steps[i-1]["id"])
+            
+            deps = []
+            for dep in candidates:
+                if dep in previous_ids and dep not in deps:
+                    deps.append(dep)
+            dependencies[step["id"]] = deps
+            previous_ids.add(step["id"])
         
         return dependencies
     
-    def _estimate_duration(self, steps: List[Dict[str, Any]]) -> int:
+    def update_estimate(self, plan: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Estime la durée d'exécution en secondes
+        Met à jour la durée (secondes) et le coût estimés du plan à partir
+        de l'historique d'exécution (valeurs par défaut sans historique)
         """
-        # Estimation simple: 30 secondes par étape
-        base_time = len(steps) * 30
+        metadata = plan.get("metadata", {})
+        estimate = self.agent.estimator.estimate_plan(
+            plan["steps"],
+            agent=metadata.get("agent"),
+            complexity=metadata.get("complexity"),
+            model=self.agent.model
+        )
         
-        # Ajouter du temps pour les outils complexes
-        for step in steps:
-            tool = step.get("tool")
-            if tool in ["web_search", "code_execution"]:
-                base_time += 20
+        plan["estimated_duration"] = estimate["duration"]
+        plan["estimated_cost"] = estimate["cost_usd"]
+        plan["estimate"] = estimate
         
-        return base_time
+        return estimate
     
     async def replan(
         self,
         current_plan: Dict[str, Any],
         failed_step: Dict[str, Any],
-        error: str
+        error: str,
+        results: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         """
         Replanifie après un échec
+        
+        Seul le sous-graphe en échec (l'étape échouée et les étapes qui en
+        dépendent) est envoyé au modèle; les étapes de remplacement sont
+        insérées à sa place et les étapes déjà complétées sont conservées.
+        Retourne un nouveau plan avec "replanned" à False si la réponse
+        du modèle est inexploitable.
         """
         logger.warning(f"⚠️  Replanification nécessaire après échec de {failed_step['id']}")
         
-        replan_prompt = f"""Une étape a échoué. Crée un nouveau plan:
+        steps = current_plan["steps"]
+        dependencies = current_plan.get("dependencies", {})
+        subgraph_ids = self._failed_subgraph(steps, dependencies, failed_step["id"])
+        subgraph = [step for step in steps if step["id"] in subgraph_ids]
+        
+        # Entrées disponibles: sorties des étapes complétées dont dépend le sous-graphe
+        index = ResultIndex(results or [])
+        builder = StepContextBuilder()
+        available_inputs = {}
+        for step in subgraph:
+            for step_id in builder.relevant_step_ids(step, dependencies.get(step["id"], [])):
+                result = index.get(step_id)
+                if step_id not in subgraph_ids and result and result.get("success"):
+                    available_inputs[step_id] = builder.reduce_output(result.get("output"))
+        
+        # Les étapes à remplacer passent avant les résultats disponibles
+        subgraph_section, inputs_section = self.agent.budget.fit([
+            (compact_json([self._describe_step(step) for step in subgraph]), 1),
+            (compact_json(available_inputs) if available_inputs else "Aucun", 2)
+        ], self.agent.budget.share(0.6, "replan"))
+        
+        replan_prompt = f"""Une étape a échoué. Propose des étapes de remplacement pour la partie du plan concernée.
 
-Plan original: {json.dumps(current_plan, indent=2)}
+Tâche: {current_plan.get("task", "")}
 
-Étape échouée: {json.dumps(failed_step, indent=2)}
+Étapes à remplacer:
+{subgraph_section}
 
+Étape échouée: {failed_step['id']}
 Erreur: {error}
 
-Propose une approche alternative ou une correction.
+Résultats disponibles (réutilisables avec {{"$ref": "step_id.output"}}):
+{inputs_section or "Aucun"}
+
+Fournis les étapes de remplacement (JSON), dans le même format que les sous-tâches:
+{{
+    "subtasks": [
+        {{
+            "id": "step_x",
+            "description": "Description de la sous-tâche",
+            "action": "action spécifique à effectuer",
+            "tool": "outil à utiliser (ou null)",
+            "inputs": {{}},
+            "expected_output": "ce qui devrait être produit"
+        }}
+    ]
+}}
 """
         
-        response = await self.agent.think(replan_prompt)
+        response = await self.agent.think(replan_prompt, schema="replan")
         
-        # Pour l'instant, retourne le plan original avec l'étape modifiée
-        # Dans une version avancée, on recréerait le plan complètement
         new_plan = current_plan.copy()
-        new_plan["replanned"] = True
         new_plan["replan_reason"] = error
         
+        data = parse_json(response, "replan", expect=dict)
+        subtasks = data.get("subtasks", []) if data else []
+        
+        if not subtasks:
+            logger.warning("⚠️  Replanification impossible: réponse inexploitable")
+            new_plan["replanned"] = False
+            return new_plan
+        
+        replacement = await self._splice_steps(new_plan, subgraph_ids, failed_step, subtasks)
+        
+        new_plan["replanned"] = True
+        new_plan["replan_history"] = current_plan.get("replan_history", []) + [{
+            "failed_step": failed_step["id"],
+            "error": error,
+            "replaced": [step["id"] for step in subgraph],
+            "added": [step["id"] for step in replacement],
+            "position": new_plan["steps"].index(replacement[0]),
+            "timestamp": datetime.now().isoformat()
+        }]
+        
+        logger.info(
+            f"📋 Replanification: {len(subgraph)} étape(s) remplacée(s) par {len(replacement)}"
+        )
+        
         return new_plan
-
+    
+    def _failed_subgraph(
+        self,
+        steps: List[Dict[str, Any]],
+        dependencies: Dict[str, List[str]],
+        failed_id: str
+    ) -> set:
+        """
+        Retourne l'étape échouée et toutes les étapes qui en dépendent
+        (via les dépendances du plan ou les références $ref)
+        """
+        subgraph = {failed_id}
+        changed = True
+        
+        while changed:
+            changed = False
+            for step in steps:
+                if step["id"] in subgraph:
+                    continue
+                upstream = set(dependencies.get(step["id"], []))
+                upstream.update(find_references(step.get("inputs", {})))
+                upstream.update(find_references(step.get("map", {})))
+                if upstream & subgraph:
+                    subgraph.add(step["id"])
+                    changed = True
+        
+        return subgraph
+    
+    def _describe_step(self, step: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Représentation minimale d'une étape pour un prompt
+        """
+        description = {
+            key: step[key]
+            for key in ("id", "description", "action", "tool", "inputs", "expected_output", "type", "map")
+            if step.get(key) not in (None, "", {})
+        }
+        if step.get("batch"):
+            description["batch"] = [self._describe_step(member) for member in step["batch"]]
+        return description
+    
+    async def _splice_steps(
+        self,
+        plan: Dict[str, Any],
+        subgraph_ids: set,
+        failed_step: Dict[str, Any],
+        subtasks: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Remplace le sous-graphe en échec par les nouvelles étapes (sur place)
+        et recalcule les dépendances des étapes insérées
+        """
+        old_steps = plan["steps"]
+        old_dependencies = plan.get("dependencies", {})
+        
+        # Les ids du sous-graphe remplacé peuvent être réutilisés, pas ceux des autres étapes
+        taken = {step["id"] for step in old_steps if step["id"] not in subgraph_ids}
+        attempt = len(plan.get("replan_history", [])) + 1
+        replacement = []
+        for i, step in enumerate(await self._create_execution_steps(subtasks)):
+            if step["id"] in taken:
+                step["id"] = f"{step['id']}_r{attempt}"
+            if step["id"] in taken:
+                step["id"] = f"{failed_step['id']}_r{attempt}_{i + 1}"
+            taken.add(step["id"])
+            replacement.append(step)
+        
+        position = next(i for i, step in enumerate(old_steps) if step["id"] == failed_step["id"])
+        kept_before = [step for step in old_steps[:position] if step["id"] not in subgraph_ids]
+        kept_after = [step for step in old_steps[position:] if step["id"] not in subgraph_ids]
+        
+        plan["steps"] = kept_before + replacement + kept_after
+        for order, step in enumerate(plan["steps"], start=1):
+            step["order"] = order
+        
+        dependencies = {
+            step_id: deps for step_id, deps in old_dependencies.items()
+            if step_id not in subgraph_ids
+        }
+        previous = [dep for dep in old_dependencies.get(failed_step["id"], []) if dep not in subgraph_ids]
+        for step in replacement:
+            dependencies[step["id"]] = previous
+            previous = [step["id"]]
+        plan["dependencies"] = dependencies
+        
+        return replacement
@@ -0,0 +1,108 @@
+"""
+Profils d'exécution selon la complexité de la tâche
+"""
+
+import logging
+import re
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# direct: un seul appel think() qui répond à la tâche
+# light: planification fusionnée (analyse + décomposition), sans synthèse
+# full: analyse, décomposition, exécution et synthèse
+# loop: boucle d'appel d'outils natif, sans plan (uniquement sur demande)
+PROFILES = ("direct", "light", "full", "loop")
+
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Enchaînements d'actions ("puis", "ensuite", énumérations)
+_SEQUENCE_PATTERN = re.compile(
+    r"\b(?:puis|ensuite|enfin|après quoi|and then|then|finally|afterwards)\b|[;\n]|^\s*(?:\d+[.)]|[-*•])\s",
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Besoin d'outils ou de données externes
+_TOOL_PATTERN = re.compile(
+    r"\b(?:recherche[rsz]?|cherche[rsz]?|web|internet|google|search|fichiers?|files?|dossier|"
+    r"folder|code|script|exécute[rz]?|execute|run|calcule[rz]?|calculate|compute|télécharge[rz]?|"
+    r"download|sauvegarde[rz]?|enregistre[rz]?|save|écris (?:dans|un fichier)|write to|url|https?)\b",
+    re.IGNORECASE
+)
+
+# Production de plusieurs livrables ("5 posts", "chaque", "liste de")
+_VOLUME_PATTERN = re.compile(
+    r"\b(?:\d+\s+\w+s\b|chaque|chacun|each|every|plusieurs|several|liste de|list of|"
+    r"rapport|report|complète|complet|détaillée?|detailed|comprehensive|stratégie|strategy|"
+    r"plan d'action|campagne|campaign)\b",
+    re.IGNORECASE
+)
+
+# Questions ou demandes auxquelles une seule réponse suffit
+_QUESTION_PATTERN = re.compile(
+    r"^(?:qu'est-ce|qu’est-ce|que|quel|quelle|quels|quelles|qui|quand|où|pourquoi|comment|combien|"
+    r"explique|définis|définir|décris|résume|traduis|reformule|corrige|donne|cite|"
+    r"what|who|when|where|why|how|explain|define|describe|summarize|translate|rephrase|fix|give|name)\b",
+    re.IGNORECASE
+)
+
+
+class ProfileClassifier:
+    """
+    Pré-classifieur par règles (sans appel au modèle) qui choisit le
+    profil d'exécution d'une tâche
+    """
+
+    def __init__(self, direct_max_words: int = 25, full_min_words: int = 60):
+        self.direct_max_words = direct_max_words
+        self.full_min_words = full_min_words
+
+    def features(self, task_description: str) -> Dict[str, Any]:
+        text = task_description.strip()
+        return {
+            "words": len(_WORD_PATTERN.findall(text)),
+            "sequences": len(_SEQUENCE_PATTERN.findall(text)),
+            "tools": len(_TOOL_PATTERN.findall(text)),
+            "volume": len(_VOLUME_PATTERN.findall(text)),
+            "question": bool(_QUESTION_PATTERN.match(text)) or text.endswith("?")
+        }
+
+    def classify(self, task_description: str) -> str:
+        """
+        Retourne "direct", "light" ou "full"
+        """
+        features = self.features(task_description)
+
+        if (
+            features["words"] >= self.full_min_words
+            or features["sequences"] >= 2
+            or features["volume"] >= 2
+            or (features["tools"] and features["volume"])
+        ):
+            return "full"
+
+        if (
+            features["question"]
+            and features["words"] <= self.direct_max_words
+            and not features["sequences"]
+            and not features["tools"]
+            and not features["volume"]
+        ):
+            return "direct"
+
+        return "light"
+
+    def resolve(self, requested: Optional[str], task_description: str) -> str:
+        """
+        Profil demandé s'il est valide, sinon profil déterminé automatiquement
+        """
+        if requested:
+            profile = requested.strip().lower()
+            if profile in PROFILES:
+                return profile
+            if profile != "auto":
+                logger.warning(f"⚠️  Profil inconnu '{requested}', sélection automatique")
+
+        profile = self.classify(task_description)
+        logger.info(f"🎚️  Profil d'exécution: {profile}")
+        return profile
@@ -0,0 +1,261 @@
+"""
+Résolution des références entre étapes
+"""
+
+import logging
+import re
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Marqueur interne pour distinguer "valeur absente" de None
+_MISSING = object()
+
+# Segments d'un chemin: clé, [index], [*], ['clé avec espaces']
+_SEGMENT_PATTERN = re.compile(
+    r"""
+    \.?(?P<key>[^.\[\]]+)           # clé simple
+    | \[(?P<index>-?\d+)\]           # index de liste
+    | \[(?P<wildcard>\*)\]           # joker
+    | \[['"](?P<quoted>[^'"]+)['"]\] # clé entre guillemets
+    """,
+    re.VERBOSE
+)
+
+
+class ResultIndex(list):
+    """
+    Liste des résultats d'exécution indexée par step_id
+
+    Se comporte comme une liste (sérialisable, itérable) tout en offrant
+    un accès O(1) au dernier résultat de chaque étape.
+    """
+
+    def __init__(self, results: Optional[List[Dict[str, Any]]] = None):
+        super().__init__()
+        self._by_step: Dict[str, Dict[str, Any]] = {}
+        for result in results or []:
+            self.append(result)
+
+    def append(self, result: Dict[str, Any]):
+        super().append(result)
+        self._by_step[result["step_id"]] = result
+
+    def extend(self, results):
+        for result in results:
+            self.append(result)
+
+    def __setitem__(self, position, result):
+        super().__setitem__(position, result)
+        if isinstance(position, slice):
+            self._reindex()
+        else:
+            self._by_step[result["step_id"]] = result
+
+    def _reindex(self):
+        self._by_step = {result["step_id"]: result for result in self}
+
+    def get(self, step_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retourne le résultat d'une étape (ou None)
+        """
+        return self._by_step.get(step_id)
+
+    def step_ids(self) -> List[str]:
+        """
+        Retourne les identifiants des étapes ayant un résultat
+        """
+        return list(self._by_step.keys())
+
+
+@lru_cache(maxsize=1024)
+def compile_reference(ref_path: str) -> Tuple[str, Tuple[Tuple[str, Any], ...]]:
+    """
+    Compile un chemin de référence en (step_id, segments)
+
+    Formats supportés:
+        "step_1.output.results"
+        "step_1.output.results[0].url"
+        "step_1.output.results[*].url"
+        "$.step_1.output['clé avec espaces']"
+        "step_1.output.results.0.title"   (index numérique en notation pointée)
+
+    Le résultat est mis en cache: chaque chemin n'est analysé qu'une fois.
+    """
+    path = ref_path.strip()
+    if path.startswith("$."):
+        path = path[2:]
+    elif path.startswith("$"):
+        path = path[1:]
+
+    segments: List[Tuple[str, Any]] = []
+    position = 0
+
+    while position < len(path):
+        match = _SEGMENT_PATTERN.match(path, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Référence invalide: {ref_path}")
+
+        if match.group("key") is not None:
+            key = match.group("key")
+            if key == "*":
+                segments.append(("wildcard", None))
+            elif key.lstrip("-").isdigit():
+                segments.append(("index", int(key)))
+            else:
+                segments.append(("key", key))
+        elif match.group("index") is not None:
+            segments.append(("index", int(match.group("index"))))
+        elif match.group("quoted") is not None:
+            segments.append(("key", match.group("quoted")))
+        else:
+            segments.append(("wildcard", None))
+
+        position = match.end()
+
+    if not segments or segments[0][0] != "key":
+        raise ValueError(f"Référence invalide (step_id manquant): {ref_path}")
+
+    step_id = segments[0][1]
+    return step_id, tuple(segments[1:])
+
+
+def _walk(value: Any, segments: Tuple[Tuple[str, Any], ...]) -> Any:
+    """
+    Parcourt une valeur selon les segments compilés
+
+    Retourne _MISSING si le chemin n'existe pas. Les valeurs ne sont jamais
+    copiées: l'objet référencé est retourné tel quel.
+    """
+    for position, (kind, arg) in enumerate(segments):
+        if kind == "key":
+            if isinstance(value, dict):
+                if arg not in value:
+                    return _MISSING
+                value = value[arg]
+            elif isinstance(value, list) and arg.lstrip("-").isdigit():
+                value = _walk(value, (("index", int(arg)),))
+                if value is _MISSING:
+                    return _MISSING
+            else:
+                return _MISSING
+
+        elif kind == "index":
+            if isinstance(value, dict):
+                # Les clés numériques de dictionnaire restent accessibles
+                if str(arg) not in value:
+                    return _MISSING
+                value = value[str(arg)]
+            elif isinstance(value, (list, tuple)):
+                if not -len(value) <= arg < len(value):
+                    return _MISSING
+                value = value[arg]
+            else:
+                return _MISSING
+
+        else:  # wildcard
+            if isinstance(value, dict):
+                items = list(value.values())
+            elif isinstance(value, (list, tuple)):
+                items = value
+            else:
+                return _MISSING
+
+            remaining = segments[position + 1:]
+            collected = []
+            for item in items:
+                resolved = _walk(item, remaining)
+                if resolved is not _MISSING:
+                    collected.append(resolved)
+            return collected
+
+    return value
+
+
+def resolve_reference(ref_path: str, results: ResultIndex) -> Any:
+    """
+    Résout une référence contre l'index des résultats
+
+    Retourne None (et journalise un avertissement) si la référence ne peut
+    pas être résolue.
+    """
+    try:
+        step_id, segments = compile_reference(ref_path)
+    except ValueError as e:
+        logger.warning(f"⚠️  {e}")
+        return None
+
+    result = results.get(step_id)
+    if result is None:
+        logger.warning(f"⚠️  Référence vers une étape sans résultat: {ref_path}")
+        return None
+
+    value = _walk(result, segments)
+    if value is _MISSING:
+        logger.warning(f"⚠️  Chemin introuvable dans le résultat: {ref_path}")
+        return None
+
+    return value
+
+
+def is_reference(value: Any) -> bool:
+    """
+    Indique si une valeur est une référence {"$ref": "..."}
+    """
+    return isinstance(value, dict) and "$ref" in value and isinstance(value["$ref"], str)
+
+
+def resolve_value(value: Any, results: ResultIndex) -> Any:
+    """
+    Résout récursivement les références contenues dans une valeur
+
+    Les structures sans référence sont retournées telles quelles (sans copie);
+    seuls les conteneurs contenant une référence sont reconstruits.
+    """
+    if is_reference(value):
+        return resolve_reference(value["$ref"], results)
+
+    if isinstance(value, dict):
+        resolved = None
+        for key, item in value.items():
+            new_item = resolve_value(item, results)
+            if new_item is not item:
+                if resolved is None:
+                    resolved = dict(value)
+                resolved[key] = new_item
+        return value if resolved is None else resolved
+
+    if isinstance(value, list):
+        resolved = None
+        for position, item in enumerate(value):
+            new_item = resolve_value(item, results)
+            if new_item is not item:
+                if resolved is None:
+                    resolved = list(value)
+                resolved[position] = new_item
+        return value if resolved is None else resolved
+
+    return value
+
+
+def find_references(value: Any) -> List[str]:
+    """
+    Liste les step_id référencés dans une valeur (récursivement)
+    """
+    found: List[str] = []
+
+    if is_reference(value):
+        try:
+            step_id, _ = compile_reference(value["$ref"])
+            found.append(step_id)
+        except ValueError:
+            pass
+    elif isinstance(value, dict):
+        for item in value.values():
+            found.extend(find_references(item))
+    elif isinstance(value, list):
+        for item in value:
+            found.extend(find_references(item))
+
+    return found
@@ -0,0 +1,212 @@
+"""
+Enregistrement et rejeu des appels LLM (cassettes) pour mesurer et profiler
+les tâches hors ligne, de façon déterministe
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Horodatages, UUID, durées et tokens mesurés des étapes: varient d'une
+# exécution à l'autre, exclus de la clé
+_VOLATILE = re.compile(
+    r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?"
+    r"|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+    r"|\"duration\":\s*[-\d.e]+"
+    r"|\"tokens\":\s*\{[^{}]*\}"
+)
+
+
+def cassette_key(prompt: str, system: Optional[str] = None, schema: Optional[str] = None) -> str:
+    """
+    Clé d'une interaction: empreinte du prompt complet (hors parties volatiles)
+    """
+    normalized = _VOLATILE.sub("<volatile>", f"{system or ''}\x00{prompt}\x00{schema or ''}")
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    Paires prompt → réponse dans un fichier JSONL: une interaction par
+    ligne, ajoutée au fichier dès qu'elle est enregistrée
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: List[Dict[str, Any]] = []
+        self.by_key: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.by_call_type: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._index(json.loads(line))
+            logger.info(f"📼 Cassette {path}: {len(self.entries)} interactions")
+
+    def _index(self, entry: Dict[str, Any]):
+        self.entries.append(entry)
+        self.by_key[entry["key"]].append(entry)
+        self.by_call_type[entry.get("call_type") or "default"].append(entry)
+
+    def append(self, entry: Dict[str, Any]):
+        self._index(entry)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def clear(self):
+        """
+        Vide la cassette (nouvel enregistrement)
+        """
+        self.entries = []
+        self.by_key.clear()
+        self.by_call_type.clear()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class RecordingProvider:
+    """
+    Appelle réellement les fournisseurs et enregistre chaque réponse
+    (et sa latence) dans la cassette
+    """
+
+    def __init__(self, agent, cassette: Cassette):
+        self.agent = agent
+        self.cassette = cassette
+        self.stats = {"recorded": 0}
+
+    def supports(self, model: str) -> bool:
+        return self.agent.has_api_client(model)
+
+    async def complete(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        schema: Optional[str] = None,
+        route: Optional[Dict[str, Any]] = None
+    ) -> str:
+        route = route or self.agent.router.resolve()
+        started = time.perf_counter()
+        response = await self.agent._api_completion_for(route["model"])(prompt, system, schema, route)
+
+        self.cassette.append({
+            "key": cassette_key(prompt, system, schema),
+            "call_type": route.get("call_type"),
+            "model": route["model"],
+            "schema": schema,
+            "prompt": prompt,
+            "response": response,
+            "latency": round(time.perf_counter() - started, 4)
+        })
+        self.stats["recorded"] += 1
+        return response
+
+
+class ReplayProvider:
+    """
+    Sert les réponses d'une cassette sans appeler de fournisseur
+
+    Les réponses d'un même prompt sont rejouées dans l'ordre de
+    l'enregistrement (la dernière est répétée ensuite). Un prompt absent de
+    la cassette reçoit la réponse suivante du même type d'appel, ou lève
+    LookupError si strict.
+
+    latency: délai simulé fixe en secondes (None: latence enregistrée,
+    multipliée par latency_scale)
+    """
+
+    def __init__(
+        self,
+        agent,
+        cassette: Cassette,
+        latency: Optional[float] = None,
+        latency_scale: float = 1.0,
+        strict: bool = False
+    ):
+        self.agent = agent
+        self.cassette = cassette
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self._served: Dict[str, int] = defaultdict(int)
+        self.stats = {"hits": 0, "misses": 0}
+
+    def supports(self, model: str) -> bool:
+        return model.startswith(("gpt", "claude"))
+
+    def _lookup(self, key: str, call_type: Optional[str]) -> Dict[str, Any]:
+        entries = self.cassette.by_key.get(key)
+        if entries:
+            self.stats["hits"] += 1
+            served = self._served[key]
+            self._served[key] += 1
+            return entries[min(served, len(entries) - 1)]
+
+        self.stats["misses"] += 1
+        entries = self.cassette.by_call_type.get(call_type or "default")
+        if self.strict or not entries:
+            raise LookupError(f"Aucune réponse enregistrée pour cet appel ({call_type or 'default'})")
+
+        logger.debug(f"📼 Prompt absent de la cassette, réponse {call_type} suivante rejouée")
+        served = self._served[f"type:{call_type}"]
+        self._served[f"type:{call_type}"] += 1
+        return entries[served % len(entries)]
+
+    async def complete(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        schema: Optional[str] = None,
+        route: Optional[Dict[str, Any]] = None
+    ) -> str:
+        route = route or self.agent.router.resolve()
+        started = time.perf_counter()
+        entry = self._lookup(cassette_key(prompt, system, schema), route.get("call_type"))
+
+        delay = self.latency if self.latency is not None else entry.get("latency", 0.0) * self.latency_scale
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        # Tokens estimés: la cassette ne conserve que le texte
+        self.agent._record_call_usage(route, None, started, f"{system or ''}{prompt}", entry["response"])
+        return entry["response"]
+
+
+def use_cassette(
+    agent,
+    path: str,
+    mode: str = "replay",
+    **options
+):
+    """
+    Branche l'agent sur une cassette: "record" (nouvel enregistrement
+    depuis les fournisseurs) ou "replay" (options de ReplayProvider)
+
+    Returns:
+        Le fournisseur installé (stats)
+    """
+    cassette = Cassette(path)
+    if mode == "record":
+        cassette.clear()
+        agent.llm_provider = RecordingProvider(agent, cassette)
+    elif mode == "replay":
+        if not cassette.entries:
+            raise ValueError(f"Cassette vide ou introuvable: {path}")
+        agent.llm_provider = ReplayProvider(agent, cassette, **options)
+    else:
+        raise ValueError(f"Mode de cassette inconnu: {mode}")
+
+    logger.info(f"📼 Cassette {path} ({mode})")
+    return agent.llm_provider
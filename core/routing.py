@@ -0,0 +1,97 @@
+"""
+Routage des appels LLM par type d'appel (modèle, max_tokens, température)
+"""
+
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+from .llm_gateway import current_call_class
+
+logger = logging.getLogger(__name__)
+
+# Réglages par défaut par type d'appel; "model" absent = modèle de l'agent
+# Les classifications et les réponses JSON courtes reçoivent des max_tokens serrés
+DEFAULT_ROUTES: Dict[str, Dict[str, Any]] = {
+    "analysis": {"max_tokens": 800, "temperature": 0.2},
+    "decomposition": {"max_tokens": 2500, "temperature": 0.3},
+    "planning": {"max_tokens": 3000, "temperature": 0.3},
+    "replan": {"max_tokens": 2000, "temperature": 0.3},
+    "evaluation": {"max_tokens": 200, "temperature": 0.0},
+    "step": {"max_tokens": 2000},
+    "batch": {"max_tokens": 4000},
+    "synthesis": {"max_tokens": 2500, "temperature": 0.5},
+    "summary": {"max_tokens": 1500, "temperature": 0.2},
+    "direct": {"max_tokens": 2000},
+    "tool_loop": {"max_tokens": 4000}
+}
+
+DEFAULT_MAX_TOKENS = 4000
+
+# Surcharges de l'agent spécialisé en cours (type d'appel → réglages)
+_route_overrides: ContextVar[Dict[str, Dict[str, Any]]] = ContextVar("llm_route_overrides", default={})
+
+
+@contextmanager
+def route_overrides(overrides: Optional[Dict[str, Dict[str, Any]]]) -> Iterator[None]:
+    """
+    Applique des réglages par type d'appel aux appels LLM faits dans ce bloc
+    """
+    current = _route_overrides.get()
+    merged = {call_type: dict(route) for call_type, route in current.items()}
+    for call_type, route in (overrides or {}).items():
+        merged.setdefault(call_type, {}).update(route)
+
+    token = _route_overrides.set(merged)
+    try:
+        yield
+    finally:
+        _route_overrides.reset(token)
+
+
+class ModelRouter:
+    """
+    Résout les réglages d'un appel, par ordre de priorité croissante:
+    agent (modèle, température), DEFAULT_ROUTES, Settings.llm_routes,
+    Settings.llm_agent_routes de l'agent spécialisé, route_overrides()
+    """
+
+    def __init__(
+        self,
+        agent,
+        routes: Optional[Dict[str, Dict[str, Any]]] = None,
+        agent_routes: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None
+    ):
+        self.agent = agent
+        self.routes = {call_type: dict(route) for call_type, route in DEFAULT_ROUTES.items()}
+        for call_type, route in (routes or {}).items():
+            self.routes.setdefault(call_type, {}).update(route)
+        self.agent_routes = {name.lower(): value for name, value in (agent_routes or {}).items()}
+
+    @classmethod
+    def from_settings(cls, agent) -> "ModelRouter":
+        from config import settings
+        return cls(agent, routes=settings.llm_routes, agent_routes=settings.llm_agent_routes)
+
+    def resolve(self, call_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Retourne {"model", "max_tokens", "temperature", "call_type"} pour ce type d'appel
+        """
+        route = {
+            "model": self.agent.model,
+            "max_tokens": DEFAULT_MAX_TOKENS,
+            "temperature": self.agent.temperature,
+            "call_type": call_type
+        }
+        if not call_type:
+            return route
+
+        specialized = self.agent_routes.get(current_call_class()["agent"].lower(), {})
+        for layer in (self.routes, specialized, _route_overrides.get()):
+            route.update(layer.get(call_type, {}))
+
+        if route["model"] != self.agent.model and not self.agent.has_client(route["model"]):
+            logger.debug(f"Client absent pour {route['model']} ({call_type}), modèle de l'agent utilisé")
+            route["model"] = self.agent.model
+        return route
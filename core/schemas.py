@@ -0,0 +1,170 @@
+"""
+Schémas des réponses structurées et extraction tolérante du JSON
+"""
+
+import json
+import logging
+import re
+from collections import defaultdict
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+_SUBTASK = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "string"},
+        "description": {"type": "string"},
+        "action": {"type": "string"},
+        "tool": {"type": ["string", "null"]},
+        "inputs": {"type": "object"},
+        "expected_output": {"type": "string"},
+        "type": {"type": "string", "enum": ["single", "map"]},
+        "map": {"type": "object"},
+        "depends_on": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["id", "description", "action", "tool", "inputs", "expected_output"]
+}
+
+_ANALYSIS = {
+    "type": "object",
+    "properties": {
+        "type": {"type": "string"},
+        "complexity": {"type": "string", "enum": ["simple", "medium", "complex"]},
+        "requires_tools": {"type": "array", "items": {"type": "string"}},
+        "estimated_steps": {"type": ["integer", "string"]},
+        "risk_level": {"type": "string", "enum": ["low", "medium", "high"]},
+        "key_challenges": {"type": "array", "items": {"type": "string"}},
+        "success_criteria": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["type", "complexity", "requires_tools", "risk_level", "success_criteria"]
+}
+
+_DECOMPOSITION = {
+    "type": "object",
+    "properties": {
+        "subtasks": {"type": "array", "items": _SUBTASK}
+    },
+    "required": ["subtasks"]
+}
+
+# Schémas des appels dont la réponse est du JSON (nom → schéma JSON)
+SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "analysis": _ANALYSIS,
+    "decomposition": _DECOMPOSITION,
+    "planning": {
+        "type": "object",
+        "properties": {
+            "analysis": _ANALYSIS,
+            "subtasks": {"type": "array", "items": _SUBTASK}
+        },
+        "required": ["analysis", "subtasks"]
+    },
+    "replan": _DECOMPOSITION,
+    "synthesis": {
+        "type": "object",
+        "properties": {
+            "summary": {"type": "string"},
+            "key_findings": {"type": "array", "items": {"type": "string"}},
+            "data": {"type": "object"},
+            "next_steps": {"type": "array", "items": {"type": "string"}}
+        },
+        "required": ["summary", "key_findings", "data", "next_steps"]
+    },
+    "evaluation": {
+        "type": "object",
+        "properties": {
+            "satisfied": {"type": "boolean"},
+            "unmet": {"type": "array", "items": {"type": "string"}}
+        },
+        "required": ["satisfied"]
+    }
+}
+
+SCHEMA_DESCRIPTIONS = {
+    "analysis": "Analyse structurée de la tâche",
+    "decomposition": "Décomposition de la tâche en sous-tâches",
+    "planning": "Analyse et décomposition de la tâche",
+    "replan": "Étapes de remplacement",
+    "synthesis": "Synthèse finale des résultats",
+    "evaluation": "Vérification des critères de succès"
+}
+
+_FENCE_PATTERN = re.compile(r"```(?:json|JSON)?\s*\n?(.*?)```", re.DOTALL)
+_DECODER = json.JSONDecoder()
+
+
+class JsonParseMetrics:
+    """
+    Compteurs de parsing des réponses JSON par type d'appel:
+    direct (JSON valide), recovered (extrait du texte), failed
+    """
+
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"direct": 0, "recovered": 0, "failed": 0}
+        )
+
+    def record(self, name: str, outcome: str):
+        self._counts[name][outcome] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        stats = {}
+        for name, counts in self._counts.items():
+            total = sum(counts.values())
+            stats[name] = {**counts, "failure_rate": counts["failed"] / total if total else 0.0}
+        return stats
+
+
+parse_metrics = JsonParseMetrics()
+
+
+def extract_json(text: Any) -> Any:
+    """
+    Extrait la première valeur JSON d'une réponse (blocs ```json, texte
+    avant ou après, objet ou tableau); lève ValueError sinon
+    """
+    if not isinstance(text, str):
+        raise ValueError("Réponse non textuelle")
+
+    candidates = [match.group(1) for match in _FENCE_PATTERN.finditer(text)] + [text]
+    for candidate in candidates:
+        candidate = candidate.strip()
+        for position, char in enumerate(candidate):
+            if char not in "{[":
+                continue
+            try:
+                value, _ = _DECODER.raw_decode(candidate, position)
+                return value
+            except ValueError:
+                continue
+
+    raise ValueError("Aucun JSON trouvé dans la réponse")
+
+
+def parse_json(text: Any, name: str = "default", expect: Optional[type] = None) -> Any:
+    """
+    Parse une réponse JSON du modèle avec repli sur l'extraction tolérante
+
+    Retourne None (et compte un échec) si aucune valeur du type attendu
+    n'est trouvée.
+    """
+    try:
+        value = json.loads(text)
+        outcome = "direct"
+    except (TypeError, ValueError):
+        try:
+            value = extract_json(text)
+            outcome = "recovered"
+        except ValueError:
+            value, outcome = None, "failed"
+
+    if value is not None and expect is not None and not isinstance(value, expect):
+        value, outcome = None, "failed"
+
+    parse_metrics.record(name, outcome)
+    if outcome == "failed":
+        logger.warning(f"⚠️  Réponse JSON inexploitable ({name})")
+    elif outcome == "recovered":
+        logger.debug(f"JSON extrait d'une réponse non conforme ({name})")
+    return value
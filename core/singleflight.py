@@ -0,0 +1,67 @@
+"""
+Regroupement des appels identiques en cours (singleflight)
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Les appels concurrents de même clé partagent une seule exécution et
+    reçoivent tous son résultat (ou son exception)
+
+    L'exécution partagée n'est annulée que si tous les appelants qui
+    l'attendent sont annulés.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Retourne (résultat, partagé): partagé est vrai si le résultat vient
+        d'un appel lancé par un autre appelant
+        """
+        task = self._flights.get(key)
+        shared = task is not None
+        if shared:
+            self.stats["coalesced"] += 1
+            logger.debug("🔗 Appel identique déjà en cours, résultat partagé")
+        else:
+            self.stats["leaders"] += 1
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda _: self._forget(key, task))
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters.get(key) == 1:
+                task.cancel()
+            raise
+        finally:
+            if key in self._waiters and self._flights.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+            del self._waiters[key]
+        if not task.cancelled():
+            # Exception déjà transmise aux appelants: évite l'avertissement asyncio
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+
+# Partagé par tous les agents du processus
+completion_flights = SingleFlight()
@@ -13,6 +13,8 @@ from .integrations.analytics import GoogleAnalyticsIntegration, MixpanelIntegrat
 from .integrations.crm import SalesforceIntegration, HubSpotIntegration, PipedriveIntegration
 from .integrations.email import MailchimpIntegration, SendGridIntegration, BrevoIntegration
 from .integrations.content import GrammarlyIntegration, CopyAIIntegration, JasperIntegration
+from .llm_gateway import llm_call_class
+from .routing import route_overrides
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +33,7 @@ class SpecializedAgent:
         self.personality_traits = []
         self.task_count = 0
         self.integrations = []  # Liste des intégrations disponibles pour cet agent
+        self.model_routes = {}  # Réglages LLM par type d'appel (voir core.routing)
     
     def get_system_prompt(self) -> str:
         """Génère le prompt système personnalisé pour cet agent"""
@@ -64,16 +67,24 @@ Tu es expert dans ton domaine et tu abordes chaque tâche avec professionnalisme
         
         return min(score, 1.0)
     
-    async def execute_task(self, task_description: str, context: Optional[Dict] = None) -> Dict[str, Any]:
+    async def execute_task(
+        self,
+        task_description: str,
+        context: Optional[Dict] = None,
+        profile: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Exécute une tâche avec la personnalité de cet agent"""
         self.task_count += 1
         
         # Injecter le prompt système personnalisé
         enhanced_context = context or {}
         enhanced_context["agent_personality"] = self.get_system_prompt()
+        enhanced_context["agent_name"] = self.name
         
         # Utiliser l'agent core avec le contexte personnalisé
-        result = await self.agent_core.run_task(task_description, enhanced_context)
+        # (appels LLM comptés sous cet agent pour le partage équitable de la passerelle)
+        with llm_call_class(agent=self.name), route_overrides(self.model_routes):
+            result = await self.agent_core.run_task(task_description, enhanced_context, profile=profile)
         
         return result
     
@@ -280,6 +291,12 @@ class DexterAgent(SpecializedAgent):
         
         self.preferred_tools = ["calculator", "code_executor"]
         
+        # Chiffres et conclusions reproductibles
+        self.model_routes = {
+            "step": {"temperature": 0.2},
+            "synthesis": {"temperature": 0.2}
+        }
+        
         # Intégrations spécifiques pour Data Analysis
         self.integrations = [
             GoogleAnalyticsIntegration(),
@@ -429,6 +446,12 @@ class PennAgent(SpecializedAgent):
         
         self.preferred_tools = ["web_search"]
         
+        # Textes longs et plus créatifs
+        self.model_routes = {
+            "step": {"max_tokens": 3000, "temperature": 0.9},
+            "synthesis": {"max_tokens": 4000, "temperature": 0.8}
+        }
+        
         # Intégrations spécifiques pour Copywriting
         self.integrations = [
             GrammarlyIntegration(),
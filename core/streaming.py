@@ -0,0 +1,91 @@
+"""
+Lecture incrémentale des réponses JSON en streaming
+"""
+
+import json
+import logging
+import re
+from typing import Dict, List, Any
+
+logger = logging.getLogger(__name__)
+
+
+class SubtaskStreamParser:
+    """
+    Extrait les objets du tableau "subtasks" au fur et à mesure que la
+    réponse de décomposition arrive, sans attendre la fin du JSON
+
+    Chaque objet est retourné dès que son accolade fermante est reçue.
+    """
+
+    def __init__(self, key: str = "subtasks"):
+        self._array_pattern = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+        self.buffer = ""
+        self.items: List[Dict[str, Any]] = []
+        self._position = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = None
+        self._closed = False
+
+    @property
+    def text(self) -> str:
+        """
+        Texte complet reçu jusqu'ici
+        """
+        return self.buffer
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Ajoute un fragment de réponse et retourne les sous-tâches complétées
+        """
+        self.buffer += chunk
+        completed: List[Dict[str, Any]] = []
+
+        if self._position is None:
+            match = self._array_pattern.search(self.buffer)
+            if not match:
+                return completed
+            self._position = match.end()
+
+        while self._position < len(self.buffer) and not self._closed:
+            char = self.buffer[self._position]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0 and char == "{":
+                    self._object_start = self._position
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # Fin du tableau des sous-tâches
+                    self._closed = True
+                else:
+                    self._depth -= 1
+                    if self._depth == 0 and char == "}" and self._object_start is not None:
+                        item = self._parse(self.buffer[self._object_start:self._position + 1])
+                        if item is not None:
+                            self.items.append(item)
+                            completed.append(item)
+                        self._object_start = None
+
+            self._position += 1
+
+        return completed
+
+    def _parse(self, fragment: str) -> Any:
+        try:
+            item = json.loads(fragment)
+        except json.JSONDecodeError:
+            logger.debug(f"Sous-tâche illisible dans le flux: {fragment[:80]}")
+            return None
+        return item if isinstance(item, dict) else None
@@ -0,0 +1,276 @@
+"""
+Bibliothèque de plans réutilisables pour les tâches similaires
+"""
+
+import copy
+import logging
+import re
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Valeurs variables d'une description: nombres, textes entre guillemets, sujet
+_NUMBER_PATTERN = re.compile(r"(?<![\w.])\d+(?:[.,]\d+)?(?![\w])")
+_QUOTED_PATTERN = re.compile(r"\"([^\"]+)\"|«\s*([^»]+?)\s*»|“([^”]+)”")
+_TOPIC_PATTERN = re.compile(
+    r"\b(?:about|on|sur|concernant|à propos de|au sujet de)\s+(?P<topic>[^,.;:!?\n]+)$",
+    re.IGNORECASE
+)
+
+
+class PlanTemplateStore:
+    """
+    Normalise les plans réussis en templates paramétrés et les réutilise
+    pour les tâches de même squelette
+
+    "Écris 5 posts Instagram sur le café" devient le template
+    "écris {slot_0} posts instagram sur {slot_1}" avec les slots
+    ["5", "le café"]; une nouvelle tâche n'a plus qu'à remplir les slots.
+    Seules les valeurs des slots peuvent différer: "Écris un email de refus"
+    ne réutilise pas le plan de "Écris un email de relance".
+    """
+
+    # État d'exécution remis à zéro dans les templates
+    RUNTIME_STEP_FIELDS = {"status": "pending", "retries": 0}
+    # Champs jamais paramétrés: identifiants, références et entrées évaluées
+    LITERAL_FIELDS = {"id", "$ref", "expression", "code"}
+
+    def __init__(self, max_templates: int = 200):
+        self.max_templates = max_templates
+        self._templates: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # (agent, squelette) -> identifiant du template
+        self._index: Dict[Tuple[Optional[str], str], str] = {}
+        self._counter = 0
+        self.stats = {"hits": 0, "misses": 0, "stored": 0}
+
+    def extract_slots(self, description: str) -> Tuple[str, List[str]]:
+        """
+        Sépare une description en squelette normalisé et valeurs de slots
+        """
+        slots: List[str] = []
+        text = " ".join(description.split())
+
+        def to_slot(value: str) -> str:
+            slots.append(value)
+            return f"{{slot_{len(slots) - 1}}}"
+
+        topic = _TOPIC_PATTERN.search(text)
+        if topic:
+            start, end = topic.span("topic")
+            text = text[:start] + to_slot(topic.group("topic").strip()) + text[end:]
+
+        text = _QUOTED_PATTERN.sub(
+            lambda match: to_slot(next(group for group in match.groups() if group)),
+            text
+        )
+        text = _NUMBER_PATTERN.sub(lambda match: to_slot(match.group(0)), text)
+
+        # Renuméroter les slots dans l'ordre d'apparition
+        order = [int(number) for number in re.findall(r"\{slot_(\d+)\}", text)]
+        ordered_slots = [slots[number] for number in order]
+        position = iter(range(len(order)))
+        text = re.sub(r"\{slot_\d+\}", lambda _: f"{{slot_{next(position)}}}", text)
+
+        return text.lower(), ordered_slots
+
+    def add(self, plan: Dict[str, Any]) -> Optional[str]:
+        """
+        Enregistre un plan réussi comme template (retourne son identifiant)
+        """
+        if plan.get("template_id") or not plan.get("steps"):
+            return None
+
+        skeleton, slots = self.extract_slots(plan["task"])
+        agent = plan.get("metadata", {}).get("agent")
+
+        # Un template équivalent existe déjà: simplement le rafraîchir
+        existing = self._find(skeleton, agent)
+        if existing:
+            self._templates.move_to_end(existing)
+            return existing
+
+        contexts = self._number_contexts(plan["task"], slots)
+        template_steps = [
+            self._parameterize(self._clean_step(step), slots, contexts) for step in plan["steps"]
+        ]
+
+        self._counter += 1
+        template_id = f"template_{self._counter}"
+        self._templates[template_id] = {
+            "id": template_id,
+            "skeleton": skeleton,
+            "slot_count": len(slots),
+            "agent": agent,
+            "analysis": self._parameterize(copy.deepcopy(plan.get("analysis", {})), slots, contexts),
+            "steps": template_steps,
+            "dependencies": copy.deepcopy(plan.get("dependencies", {})),
+            "metadata": copy.deepcopy(plan.get("metadata", {})),
+            "uses": 0,
+            "created_at": datetime.now().isoformat()
+        }
+        self._index[(agent, skeleton)] = template_id
+
+        self.stats["stored"] += 1
+        self._evict()
+
+        logger.info(f"🧩 Template de plan enregistré: {skeleton}")
+        return template_id
+
+    def match(self, description: str, agent: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Retourne les étapes du template le plus proche, slots remplis (ou None)
+        """
+        skeleton, slots = self.extract_slots(description)
+        template_id = self._find(skeleton, agent)
+
+        if template_id is None:
+            self.stats["misses"] += 1
+            return None
+
+        template = self._templates[template_id]
+        template["uses"] += 1
+        self._templates.move_to_end(template_id)
+        self.stats["hits"] += 1
+
+        logger.info(f"🧩 Plan réutilisé depuis {template_id}")
+
+        return {
+            "template_id": template_id,
+            "analysis": self._fill(copy.deepcopy(template["analysis"]), slots),
+            "steps": [self._fill(copy.deepcopy(step), slots) for step in template["steps"]],
+            "dependencies": copy.deepcopy(template["dependencies"]),
+            "metadata": copy.deepcopy(template["metadata"])
+        }
+
+    def _find(self, skeleton: str, agent: Optional[str]) -> Optional[str]:
+        """
+        Cherche le template de même squelette (seuls les slots diffèrent)
+        """
+        return self._index.get((agent, skeleton))
+
+    def _clean_step(self, step: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Retire l'état d'exécution d'une étape
+        """
+        cleaned = copy.deepcopy(step)
+        for target in [cleaned] + cleaned.get("batch", []):
+            for field, initial in self.RUNTIME_STEP_FIELDS.items():
+                if field in target:
+                    target[field] = initial
+        return cleaned
+
+    def _number_contexts(self, description: str, slots: List[str]) -> Dict[int, Set[str]]:
+        """
+        Mots voisins de chaque slot numérique dans la description de la tâche
+        ("5" dans "écris 5 posts" → {"écris", "posts"})
+        """
+        text = " ".join(description.split()).lower()
+        contexts: Dict[int, Set[str]] = {}
+        for position, value in enumerate(slots):
+            if not _NUMBER_PATTERN.fullmatch(value):
+                continue
+            pattern = r"(?:(\w+)\W+)?(?<![\w.])" + re.escape(value) + r"(?![\w])(?:\W+(\w+))?"
+            contexts[position] = {
+                word for match in re.finditer(pattern, text) for word in match.groups() if word
+            }
+        return contexts
+
+    def _parameterize(
+        self,
+        value: Any,
+        slots: List[str],
+        contexts: Optional[Dict[int, Set[str]]] = None
+    ) -> Any:
+        """
+        Remplace les valeurs des slots par leurs marqueurs dans une étape
+
+        Un nombre n'est remplacé que là où il apparaît à côté d'un de ses mots
+        voisins dans la tâche: les autres nombres du plan (numéros d'étapes,
+        paramètres) ne viennent pas de la description.
+        """
+        contexts = contexts or {}
+        if isinstance(value, str):
+            # Les valeurs les plus longues d'abord pour éviter les remplacements partiels
+            for position in sorted(range(len(slots)), key=lambda i: -len(slots[i])):
+                marker = f"{{slot_{position}}}"
+                if position in contexts:
+                    value = self._parameterize_number(value, slots[position], marker, contexts[position])
+                    continue
+                pattern = r"(?<!\w)" + re.escape(slots[position]) + r"(?!\w)"
+                value = re.sub(pattern, marker, value, flags=re.IGNORECASE)
+            return value
+        if isinstance(value, dict):
+            # Les identifiants, références et expressions restent inchangés
+            return {
+                key: item if key in self.LITERAL_FIELDS else self._parameterize(item, slots, contexts)
+                for key, item in value.items()
+            }
+        if isinstance(value, list):
+            return [self._parameterize(item, slots, contexts) for item in value]
+        return value
+
+    def _parameterize_number(self, text: str, number: str, marker: str, context: Set[str]) -> str:
+        """
+        Remplace un nombre par son marqueur là où l'un de ses voisins est un mot
+        voisin du nombre dans la tâche
+        """
+        pattern = re.compile(
+            r"(?:(?P<before>\w+)(?P<left>\W+))?(?<![\w.])" + re.escape(number)
+            + r"(?![\w])(?=(?P<right>\W+)(?P<after>\w+))?"
+        )
+
+        def replace(match: "re.Match") -> str:
+            before, after = match.group("before"), match.group("after")
+            if (before or "").lower() in context or (after or "").lower() in context:
+                return f"{before or ''}{match.group('left') or ''}{marker}"
+            return match.group(0)
+
+        return pattern.sub(replace, text)
+
+    def _fill(self, value: Any, slots: List[str]) -> Any:
+        """
+        Remplit les marqueurs de slots avec les valeurs de la nouvelle tâche
+        """
+        if isinstance(value, str):
+            return re.sub(
+                r"\{slot_(\d+)\}",
+                lambda match: slots[int(match.group(1))] if int(match.group(1)) < len(slots) else match.group(0),
+                value
+            )
+        if isinstance(value, dict):
+            return {
+                key: item if key in self.LITERAL_FIELDS else self._fill(item, slots)
+                for key, item in value.items()
+            }
+        if isinstance(value, list):
+            return [self._fill(item, slots) for item in value]
+        return value
+
+    def _evict(self):
+        """
+        Supprime les templates les moins récemment utilisés au-delà de la limite
+        """
+        while len(self._templates) > self.max_templates:
+            _, template = self._templates.popitem(last=False)
+            self._index.pop((template["agent"], template["skeleton"]), None)
+
+    def list_templates(self) -> List[Dict[str, Any]]:
+        """
+        Liste les templates (sans les étapes)
+        """
+        return [
+            {
+                "id": template["id"],
+                "skeleton": template["skeleton"],
+                "agent": template["agent"],
+                "steps": len(template["steps"]),
+                "uses": template["uses"],
+                "created_at": template["created_at"]
+            }
+            for template in self._templates.values()
+        ]
+
+    def size(self) -> int:
+        return len(self._templates)
@@ -0,0 +1,87 @@
+"""
+Comptage des tokens
+"""
+
+import logging
+from functools import lru_cache
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # Dépendance optionnelle: estimation approximative sinon
+    tiktoken = None
+
+# Approximation moyenne pour du texte français/anglais
+CHARS_PER_TOKEN = 4
+
+# Taille de la fenêtre de contexte par préfixe de modèle (tokens)
+CONTEXT_WINDOWS = {
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4-1106": 128000,
+    "gpt-4-0125": 128000,
+    "gpt-4-32k": 32768,
+    "gpt-4": 8192,
+    "gpt-3.5": 16385,
+    "claude": 200000
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    """
+    Retourne l'encodeur tiktoken du modèle (ou None)
+    """
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: Any, model: str = "gpt-4") -> int:
+    """
+    Compte (ou estime) le nombre de tokens d'un texte
+    """
+    if not text:
+        return 0
+    if not isinstance(text, str):
+        text = str(text)
+
+    encoding = _get_encoding(model) if model.startswith("gpt") else None
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def context_window(model: Optional[str]) -> int:
+    """
+    Taille de la fenêtre de contexte du modèle (préfixe le plus long correspondant)
+    """
+    matches = [prefix for prefix in CONTEXT_WINDOWS if model and model.startswith(prefix)]
+    if not matches:
+        return DEFAULT_CONTEXT_WINDOW
+    return CONTEXT_WINDOWS[max(matches, key=len)]
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4", marker: str = "") -> str:
+    """
+    Tronque un texte à max_tokens tokens (marqueur inclus)
+    """
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    limit = max(0, max_tokens - count_tokens(marker, model))
+    encoding = _get_encoding(model) if model.startswith("gpt") else None
+    if encoding is not None:
+        truncated = encoding.decode(encoding.encode(text, disallowed_special=())[:limit])
+    else:
+        truncated = text[:limit * CHARS_PER_TOKEN]
+    return truncated + marker
@@ -0,0 +1,329 @@
+"""
+Boucle d'appel d'outils natif (function calling) avec exécution parallèle
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+from .context import compact_json
+
+logger = logging.getLogger(__name__)
+
+
+class ToolCallingLoop:
+    """
+    Mode d'exécution itératif: le modèle choisit lui-même les outils à
+    appeler (schémas du ToolRegistry), tous les appels d'un même tour sont
+    exécutés en parallèle et leurs résultats lui sont renvoyés, jusqu'à une
+    réponse finale ou max_iterations tours
+    """
+
+    FINAL_ANSWER_PROMPT = "Nombre maximal d'itérations atteint: donne maintenant ta réponse finale."
+    CALL_TYPE = "tool_loop"
+
+    def __init__(self, agent, max_iterations: Optional[int] = None, tool_timeout: float = 60.0):
+        self.agent = agent
+        self.max_iterations = max_iterations or agent.max_iterations
+        self.tool_timeout = tool_timeout
+
+    async def run(self, task_description: str, context: Optional[Dict] = None) -> Dict[str, Any]:
+        """
+        Exécute la tâche et retourne {"answer", "iterations", "tool_calls", "stopped"}
+        """
+        memories = await self.agent.memory.retrieve_relevant(task_description, limit=5)
+        system_prefix, user_prompt = self.agent._build_prompt(task_description, context, memories, self.CALL_TYPE)
+
+        # Réglages routés; le format des messages suit le fournisseur du modèle
+        route = self.agent.router.resolve(self.CALL_TYPE)
+        if route["model"].startswith("gpt"):
+            provider = _OpenAIProvider(self.agent)
+        elif route["model"].startswith("claude"):
+            provider = _AnthropicProvider(self.agent)
+        else:
+            raise ValueError(f"Modèle non supporté: {route['model']}")
+
+        tools = self.agent.tool_registry.get_function_schemas()
+        messages = provider.initial_messages(user_prompt)
+        tool_calls: List[Dict[str, Any]] = []
+        answer = ""
+
+        for iteration in range(1, self.max_iterations + 1):
+            text, calls = await self._complete(provider, route, system_prefix, messages, tools)
+            answer = text or answer
+
+            if not calls:
+                logger.info(f"🔁 Réponse finale après {iteration} itération(s)")
+                return {"answer": answer, "iterations": iteration, "tool_calls": tool_calls, "stopped": "final_answer"}
+
+            logger.info(f"🔁 Itération {iteration}: {len(calls)} appel(s) d'outil en parallèle")
+            outputs = await asyncio.gather(*(self._call_tool(call) for call in calls))
+
+            for call, output in zip(calls, outputs):
+                tool_calls.append({
+                    "iteration": iteration,
+                    "id": call["id"],
+                    "tool": call["name"],
+                    "arguments": call["arguments"],
+                    "output": output
+                })
+            provider.add_tool_results(messages, calls, [self._format_output(output) for output in outputs])
+
+        # Limite atteinte: un dernier tour pour conclure, outils déclarés
+        # (la conversation contient des appels d'outils) mais interdits
+        last = messages[-1]
+        if last["role"] == "user" and isinstance(last["content"], list):
+            last["content"].append({"type": "text", "text": self.FINAL_ANSWER_PROMPT})
+        else:
+            messages.append({"role": "user", "content": self.FINAL_ANSWER_PROMPT})
+        text, _ = await self._complete(provider, route, system_prefix, messages, tools, final=True)
+        logger.warning(f"⚠️  Boucle d'outils arrêtée après {self.max_iterations} itérations")
+
+        return {
+            "answer": text or answer,
+            "iterations": self.max_iterations,
+            "tool_calls": tool_calls,
+            "stopped": "max_iterations"
+        }
+
+    async def _complete(
+        self,
+        provider,
+        route: Dict[str, Any],
+        system_prefix: str,
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        final: bool = False
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Un tour de la conversation, par le même chemin que think(): une seule
+        requête pour les tours identiques en cours, repli sur les modèles du
+        même fournisseur, passerelle et imputation de l'usage par route
+
+        final: aucun nouvel appel d'outil autorisé (tool_choice "none")
+        """
+        def completion_for(model: str):
+            return provider.completion(messages, tools, final) if provider.supports(model) else None
+
+        agent = self.agent
+        key = (
+            self.CALL_TYPE, route["model"], route["temperature"], route["max_tokens"],
+            system_prefix, compact_json(messages), compact_json(tools), final
+        )
+        response, _ = await agent.flights.do(
+            key, lambda: agent.fallback.complete("", system_prefix, None, route, completion_for)
+        )
+        return provider.read(response, messages)
+
+    async def _call_tool(self, call: Dict[str, Any]) -> Any:
+        """
+        Exécute un appel d'outil; les erreurs sont renvoyées au modèle
+        """
+        if not isinstance(call["arguments"], dict):
+            return {"success": False, "error": "Arguments JSON invalides"}
+        try:
+            return await asyncio.wait_for(
+                self.agent.tool_registry.execute_tool(call["name"], **call["arguments"]),
+                timeout=self.tool_timeout
+            )
+        except asyncio.TimeoutError:
+            return {"success": False, "error": f"Délai dépassé ({self.tool_timeout}s)"}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def _format_output(self, output: Any) -> str:
+        text = output if isinstance(output, str) else compact_json(output)
+        return self.agent.budget.truncate(text, self.agent.budget.share(0.15, self.CALL_TYPE))
+
+
+class _OpenAIProvider:
+    """
+    Appels d'outils via le function calling OpenAI (tool_calls)
+    """
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    def initial_messages(self, user_prompt: str) -> List[Dict[str, Any]]:
+        return [{"role": "user", "content": user_prompt}]
+
+    def supports(self, model: str) -> bool:
+        return model.startswith("gpt") and self.agent.has_api_client(model)
+
+    def completion(self, messages: List[Dict[str, Any]], tools: List[Dict[str, Any]], final: bool = False):
+        """
+        Méthode de complétion (signature de ModelFallback) pour ce tour
+        """
+        async def complete(prompt: str, system: Optional[str], schema: Optional[str], route: Dict[str, Any]):
+            return await self.request(system or "", messages, tools, route, final)
+        return complete
+
+    async def request(
+        self,
+        system_prefix: str,
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        route: Dict[str, Any],
+        final: bool = False
+    ) -> Any:
+        agent = self.agent
+        if not agent.openai_client:
+            raise ValueError("Client OpenAI non initialisé")
+
+        options: Dict[str, Any] = {}
+        if tools:
+            options["tools"] = [{"type": "function", "function": tool} for tool in tools]
+            if final:
+                options["tool_choice"] = "none"
+            else:
+                options["parallel_tool_calls"] = True
+
+        started = time.perf_counter()
+        response = await agent.gateway.call(
+            "openai",
+            route["model"],
+            lambda: agent.openai_client.chat.completions.create(
+                model=route["model"],
+                messages=[{"role": "system", "content": system_prefix}] + messages,
+                temperature=route["temperature"],
+                max_tokens=route["max_tokens"],
+                **options
+            ),
+            agent._estimated_tokens(compact_json(messages), system_prefix, route["max_tokens"])
+        )
+        usage = getattr(response, "usage", None)
+        agent._record_openai_usage(usage)
+        agent._record_call_usage(route, usage, started)
+        return response
+
+    def read(self, response: Any, messages: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Texte et appels d'outils de la réponse, ajoutés à la conversation
+        """
+        message = response.choices[0].message
+        calls = []
+        for tool_call in message.tool_calls or []:
+            try:
+                arguments = json.loads(tool_call.function.arguments or "{}")
+            except ValueError:
+                arguments = None
+            calls.append({
+                "id": tool_call.id,
+                "name": tool_call.function.name,
+                "arguments": arguments,
+                "raw_arguments": tool_call.function.arguments
+            })
+
+        if calls:
+            messages.append({
+                "role": "assistant",
+                "content": message.content,
+                "tool_calls": [
+                    {
+                        "id": call["id"],
+                        "type": "function",
+                        "function": {"name": call["name"], "arguments": call["raw_arguments"] or "{}"}
+                    }
+                    for call in calls
+                ]
+            })
+        elif message.content:
+            messages.append({"role": "assistant", "content": message.content})
+
+        return message.content or "", calls
+
+    def add_tool_results(self, messages: List[Dict[str, Any]], calls: List[Dict[str, Any]], outputs: List[str]):
+        for call, output in zip(calls, outputs):
+            messages.append({"role": "tool", "tool_call_id": call["id"], "content": output})
+
+
+class _AnthropicProvider:
+    """
+    Appels d'outils via le tool use Anthropic (blocs tool_use / tool_result)
+    """
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    def initial_messages(self, user_prompt: str) -> List[Dict[str, Any]]:
+        return [{"role": "user", "content": user_prompt}]
+
+    def supports(self, model: str) -> bool:
+        return model.startswith("claude") and self.agent.has_api_client(model)
+
+    def completion(self, messages: List[Dict[str, Any]], tools: List[Dict[str, Any]], final: bool = False):
+        """
+        Méthode de complétion (signature de ModelFallback) pour ce tour
+        """
+        async def complete(prompt: str, system: Optional[str], schema: Optional[str], route: Dict[str, Any]):
+            return await self.request(system or "", messages, tools, route, final)
+        return complete
+
+    async def request(
+        self,
+        system_prefix: str,
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        route: Dict[str, Any],
+        final: bool = False
+    ) -> Any:
+        agent = self.agent
+        if not agent.anthropic_client:
+            raise ValueError("Client Anthropic non initialisé")
+
+        options: Dict[str, Any] = {}
+        if tools:
+            options["tools"] = [
+                {"name": tool["name"], "description": tool["description"], "input_schema": tool["parameters"]}
+                for tool in tools
+            ]
+            if final:
+                options["tool_choice"] = {"type": "none"}
+
+        started = time.perf_counter()
+        response = await agent.gateway.call(
+            "anthropic",
+            route["model"],
+            lambda: agent.anthropic_client.messages.create(
+                model=route["model"],
+                max_tokens=route["max_tokens"],
+                temperature=route["temperature"],
+                system=agent._anthropic_system(system_prefix),
+                messages=messages,
+                **options
+            ),
+            agent._estimated_tokens(compact_json(messages), system_prefix, route["max_tokens"])
+        )
+        usage = getattr(response, "usage", None)
+        agent._record_anthropic_usage(usage)
+        agent._record_call_usage(route, usage, started)
+        return response
+
+    def read(self, response: Any, messages: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Texte et appels d'outils de la réponse, ajoutés à la conversation
+        """
+        text_parts = []
+        calls = []
+        content = []
+        for block in response.content:
+            if block.type == "tool_use":
+                calls.append({"id": block.id, "name": block.name, "arguments": block.input})
+                content.append({"type": "tool_use", "id": block.id, "name": block.name, "input": block.input})
+            elif block.type == "text":
+                text_parts.append(block.text)
+                content.append({"type": "text", "text": block.text})
+
+        messages.append({"role": "assistant", "content": content})
+        return "".join(text_parts), calls
+
+    def add_tool_results(self, messages: List[Dict[str, Any]], calls: List[Dict[str, Any]], outputs: List[str]):
+        messages.append({
+            "role": "user",
+            "content": [
+                {"type": "tool_result", "tool_use_id": call["id"], "content": output}
+                for call, output in zip(calls, outputs)
+            ]
+        })
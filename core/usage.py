@@ -0,0 +1,151 @@
+"""
+Comptabilité de l'usage réel des appels LLM (tokens, latence, coût)
+par étape, tâche, agent spécialisé et modèle
+"""
+
+import logging
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from .estimator import current_step_usage, record_llm_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class UsageTotals:
+    """
+    Cumul des appels: nombre, tokens, latence et coût
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.latency = 0.0
+        self.max_latency = 0.0
+        self.cost_usd = 0.0
+
+    def add(self, call: Dict[str, Any]):
+        self.calls += 1
+        self.prompt_tokens += call["prompt_tokens"]
+        self.completion_tokens += call["completion_tokens"]
+        self.cached_tokens += call["cached_tokens"]
+        self.latency += call["latency"]
+        self.max_latency = max(self.max_latency, call["latency"])
+        self.cost_usd += call["cost_usd"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "avg_latency": self.latency / self.calls if self.calls else 0.0,
+            "max_latency": self.max_latency,
+            "cost_usd": round(self.cost_usd, 6)
+        }
+
+
+class TaskUsage:
+    """
+    Usage d'une tâche, détaillé par étape, modèle et type d'appel
+    """
+
+    def __init__(self):
+        self.totals = UsageTotals()
+        self.by_step: Dict[str, UsageTotals] = defaultdict(UsageTotals)
+        self.by_model: Dict[str, UsageTotals] = defaultdict(UsageTotals)
+        self.by_call_type: Dict[str, UsageTotals] = defaultdict(UsageTotals)
+
+    def add(self, call: Dict[str, Any], step_id: Optional[str] = None):
+        self.totals.add(call)
+        self.by_step[step_id or "task"].add(call)
+        self.by_model[call["model"]].add(call)
+        self.by_call_type[call["call_type"]].add(call)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **self.totals.to_dict(),
+            "by_step": {key: value.to_dict() for key, value in self.by_step.items()},
+            "by_model": {key: value.to_dict() for key, value in self.by_model.items()},
+            "by_call_type": {key: value.to_dict() for key, value in self.by_call_type.items()}
+        }
+
+
+class UsageLedger:
+    """
+    Cumul de l'usage du processus par agent spécialisé, client, modèle et type d'appel
+    """
+
+    def __init__(self):
+        self.totals = UsageTotals()
+        self.tasks: Dict[str, int] = defaultdict(int)
+        self._groups: Dict[str, Dict[str, UsageTotals]] = {
+            "by_agent": defaultdict(UsageTotals),
+            "by_tenant": defaultdict(UsageTotals),
+            "by_model": defaultdict(UsageTotals),
+            "by_call_type": defaultdict(UsageTotals)
+        }
+
+    def record_call(self, call: Dict[str, Any]):
+        self.totals.add(call)
+        self._groups["by_agent"][call["agent"]].add(call)
+        self._groups["by_tenant"][call["tenant"]].add(call)
+        self._groups["by_model"][call["model"]].add(call)
+        self._groups["by_call_type"][call["call_type"]].add(call)
+
+    def record_task(self, agent: str):
+        self.tasks[agent] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot: Dict[str, Any] = {**self.totals.to_dict(), "tasks": dict(self.tasks)}
+        for name, group in self._groups.items():
+            snapshot[name] = {key: value.to_dict() for key, value in group.items()}
+        return snapshot
+
+
+# Usage de la tâche en cours (hérité par les sous-tâches asyncio)
+current_task_usage: ContextVar[Optional[TaskUsage]] = ContextVar("current_task_usage", default=None)
+
+# Partagé par tous les agents du processus
+usage_ledger = UsageLedger()
+
+
+def record_llm_call(
+    model: str,
+    call_type: Optional[str],
+    prompt_tokens: int,
+    completion_tokens: int,
+    latency: float,
+    cost_usd: float = 0.0,
+    cached_tokens: int = 0,
+    agent: str = "default",
+    tenant: str = "default"
+):
+    """
+    Enregistre l'usage réel d'un appel: étape en cours (estimations de
+    durée), tâche en cours et cumul du processus
+    """
+    call = {
+        "model": model,
+        "call_type": call_type or "default",
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cached_tokens": cached_tokens,
+        "latency": latency,
+        "cost_usd": cost_usd,
+        "agent": agent,
+        "tenant": tenant
+    }
+
+    record_llm_tokens(prompt_tokens, completion_tokens)
+
+    task_usage = current_task_usage.get()
+    if task_usage is not None:
+        step_usage = current_step_usage.get()
+        task_usage.add(call, step_usage.step_id if step_usage is not None else None)
+
+    usage_ledger.record_call(call)
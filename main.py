@@ -3,9 +3,12 @@ Sintra AI - Agent IA Autonome
 Point d'entrée principal
 """
 
+import argparse
 import asyncio
+import json
 import logging
 import os
+from typing import List
 from dotenv import load_dotenv
 
 from fastapi import FastAPI
@@ -15,6 +18,8 @@ import uvicorn
 from api.routes import router
 from api.integrations_routes import router as integrations_router
 from core import SintraAgent
+from core.batch import BatchRunner
+from core.replay import use_cassette
 
 # Configuration du logging
 logging.basicConfig(
@@ -145,6 +150,79 @@ async def demo_task():
     logger.info("="*60 + "\n")
 
 
+async def batch_tasks(input_path: str, output_path: str = None, local: bool = False):
+    """
+    Traite un fichier JSONL de tâches ({"description", "context", "profile",
+    "agent_id"} par ligne) via les API batch des fournisseurs
+    """
+    with open(input_path, encoding="utf-8") as f:
+        tasks = [json.loads(line) for line in f if line.strip()]
+    
+    runner = BatchRunner(
+        lambda: SintraAgent(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            anthropic_key=os.getenv("ANTHROPIC_API_KEY"),
+            model=os.getenv("AGENT_MODEL", "gpt-4-turbo-preview")
+        ),
+        local=local
+    )
+    results = await runner.run(tasks)
+    
+    output_path = output_path or f"{os.path.splitext(input_path)[0]}.results.jsonl"
+    with open(output_path, "w", encoding="utf-8") as f:
+        for result in results:
+            f.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+    
+    succeeded = sum(1 for result in results if result.get("success"))
+    logger.info(f"📦 {succeeded}/{len(results)} tâches réussies, résultats: {output_path}")
+
+
+async def cassette_task(mode: str, cassette_path: str, task_description: str, latency: float = None, strict: bool = False) -> bool:
+    """
+    Exécute une tâche en enregistrant ses appels LLM dans une cassette
+    ("record") ou en les rejouant hors ligne ("replay"), puis affiche sa
+    durée et son usage en JSON (mesures de performance, CI)
+    """
+    if mode == "record":
+        agent = SintraAgent(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            anthropic_key=os.getenv("ANTHROPIC_API_KEY"),
+            model=os.getenv("AGENT_MODEL", "gpt-4-turbo-preview")
+        )
+        provider = use_cassette(agent, cassette_path, "record")
+    else:
+        agent = SintraAgent(model=os.getenv("AGENT_MODEL", "gpt-4-turbo-preview"))
+        provider = use_cassette(agent, cassette_path, "replay", latency=latency, strict=strict)
+    
+    result = await agent.run_task(task_description)
+    print(json.dumps({
+        "mode": mode,
+        "cassette": cassette_path,
+        "success": result["success"],
+        "error": result.get("error"),
+        "duration": result.get("duration"),
+        "usage": result.get("usage"),
+        "provider": provider.stats
+    }, ensure_ascii=False, indent=2))
+    return result["success"]
+
+
+def parse_cassette_args(argv: List[str]) -> argparse.Namespace:
+    """
+    Arguments de python main.py record|replay (usage affiché si invalides)
+    """
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Exécute une tâche en enregistrant ou en rejouant ses appels LLM"
+    )
+    parser.add_argument("mode", choices=("record", "replay"))
+    parser.add_argument("cassette", help="Fichier JSONL de la cassette")
+    parser.add_argument("task", help="Description de la tâche")
+    parser.add_argument("--latency", type=float, help="Latence fixe simulée par appel rejoué (s, défaut: latence enregistrée)")
+    parser.add_argument("--strict", action="store_true", help="Échec si un prompt est absent de la cassette")
+    return parser.parse_args(argv)
+
+
 def main():
     """
     Point d'entrée principal
@@ -155,6 +233,15 @@ def main():
     if len(sys.argv) > 1 and sys.argv[1] == "demo":
         # Mode démonstration
         asyncio.run(demo_task())
+    elif len(sys.argv) > 2 and sys.argv[1] == "batch":
+        # Mode batch: python main.py batch taches.jsonl [resultats.jsonl] [--local]
+        args = [arg for arg in sys.argv[2:] if arg != "--local"]
+        asyncio.run(batch_tasks(args[0], args[1] if len(args) > 1 else None, local="--local" in sys.argv))
+    elif len(sys.argv) > 1 and sys.argv[1] in ("record", "replay"):
+        # Cassette: python main.py record|replay cassette.jsonl "tâche" [--latency 0.05] [--strict]
+        args = parse_cassette_args(sys.argv[1:])
+        success = asyncio.run(cassette_task(args.mode, args.cassette, args.task, args.latency, strict=args.strict))
+        sys.exit(0 if success else 1)
     else:
         # Mode serveur
         host = os.getenv("HOST", "0.0.0.0")
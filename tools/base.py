@@ -54,6 +54,20 @@ class BaseTool(ABC):
         self.usage_count += 1
         return await self.execute(**kwargs)
     
+    def get_json_schema(self) -> Dict[str, Any]:
+        """
+        Schéma JSON des paramètres (format function calling des fournisseurs)
+        """
+        properties = {}
+        required = []
+        for param_name, param_spec in self.parameters.items():
+            properties[param_name] = {
+                key: value for key, value in param_spec.items() if key != "required"
+            }
+            if param_spec.get("required", False):
+                required.append(param_name)
+        return {"type": "object", "properties": properties, "required": required}
+    
     def get_info(self) -> Dict[str, Any]:
         """
         Retourne les informations sur l'outil
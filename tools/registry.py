@@ -66,6 +66,20 @@ class ToolRegistry:
         """
         return list(self._tools.keys())
     
+    def get_function_schemas(self) -> List[Dict[str, Any]]:
+        """
+        Décrit les outils pour l'appel de fonctions des fournisseurs
+        (nom, description, schéma JSON des paramètres)
+        """
+        return [
+            {
+                "name": tool_name,
+                "description": tool.description,
+                "parameters": tool.get_json_schema()
+            }
+            for tool_name, tool in self._tools.items()
+        ]
+    
     async def execute_tool(self, tool_name: str, **kwargs) -> Any:
         """
         Exécute un outil par son nom